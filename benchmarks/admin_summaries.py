@@ -0,0 +1,151 @@
+"""
+Сводки табеля для администратора: get_admin_summaries против сводок по наставникам
+
+MENTORS наставников по STUDENTS студентов в TRAININGS тренингах по LESSONS
+уроков; примерно ANSWERED_SHARE пар студент-урок уже имеют первый ответ.
+Построчный вариант - build_mentor_overview на каждого наставника (как
+build_admin_overview до get_admin_summaries). БД - заглушка
+tests.fake_session.FakeSession с задержкой DB_DELAY на запрос. Печатает число
+запросов и время (отдельно - время бота без заглушки БД, которая на больших
+IN (...) сама тратит заметное время); сводки обоих вариантов сверяются.
+
+Запуск из корня репозитория:
+    python -m benchmarks.admin_summaries [DB_DELAY_MS]
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from bot.services import gradebook_service, reference_cache
+from bot.services.database import Lesson, Mapping, Mentor, Student, StudentLessonFirstAnswer
+from bot.services.gradebook_service import _build_students_summary, build_mentor_overview, get_admin_summaries
+from tests.fake_session import FakeSession, FakeTables
+
+MENTORS = 50
+STUDENTS = 100
+TRAININGS = 5
+LESSONS = 20
+ANSWERED_SHARE = 0.6
+
+
+def _tables():
+    random.seed(1)
+    now = datetime.now(pytz.UTC)
+    mapping = [
+        Mapping(
+            id=mentor_id * STUDENTS + number,
+            student_id=mentor_id * STUDENTS + number,
+            training_id=mentor_id % TRAININGS + 1,
+            mentor_id=mentor_id,
+        )
+        for mentor_id in range(1, MENTORS + 1)
+        for number in range(STUDENTS)
+    ]
+    lessons = [
+        Lesson(
+            id=training_id * 100 + number,
+            lesson_id=str(training_id * 100 + number),
+            training_id=str(training_id),
+            opening_date=now + timedelta(days=number - LESSONS + 2),
+            deadline_date=now + timedelta(days=number - LESSONS + 5),
+        )
+        for training_id in range(1, TRAININGS + 1)
+        for number in range(LESSONS)
+    ]
+    lessons_by_training = {}
+    for lesson in lessons:
+        lessons_by_training.setdefault(int(lesson.training_id), []).append(lesson)
+    return {
+        'mentors': [Mentor(id=mentor_id, mentor_id=mentor_id) for mentor_id in range(1, MENTORS + 1)],
+        'mapping': mapping,
+        'students': [
+            Student(
+                id=row.student_id,
+                student_id=row.student_id,
+                user_email=f"student{row.student_id}@example.com",
+                first_name='Студент',
+                last_name=str(row.student_id),
+            )
+            for row in mapping
+        ],
+        'lessons': lessons,
+        'student_lesson_first_answers': [
+            StudentLessonFirstAnswer(
+                user_email=f"student{row.student_id}@example.com",
+                answer_lesson_id=int(lesson.lesson_id),
+                first_answer_at=lesson.deadline_date + timedelta(days=random.choice((-2, 1))),
+            )
+            for row in mapping
+            for lesson in lessons_by_training[row.training_id]
+            if random.random() < ANSWERED_SHARE
+        ],
+    }
+
+
+class TimedTables:
+    """FakeTables с учетом времени, потраченного заглушкой на ответы"""
+
+    def __init__(self, tables: FakeTables):
+        self.tables = tables
+        self.elapsed = 0.0
+
+    def __call__(self, statement):
+        started = time.perf_counter()
+        try:
+            return self.tables(statement)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+
+def _comparable(summary):
+    overview = summary.overview
+    return (
+        {**overview, "items": sorted(overview["items"], key=lambda item: (item["student_id"], item["lesson_id"]))},
+        summary.per_student,
+        summary.ordered_ids,
+    )
+
+
+async def run(db_delay: float):
+    reference_cache.reference_cache = None
+    gradebook_service._summary_cache = None
+    directory = _tables()
+    tables = FakeTables(directory)
+
+    per_mentor_tables = TimedTables(tables)
+    session = FakeSession(per_mentor_tables, delay=db_delay)
+    started = time.perf_counter()
+    per_mentor = [
+        _build_students_summary(await build_mentor_overview(session, mentor_id=mentor.id))
+        for mentor in directory['mentors']
+    ]
+    per_mentor_time = time.perf_counter() - started
+    per_mentor_statements = len(session.statements)
+
+    bulk_tables = TimedTables(tables)
+    session = FakeSession(bulk_tables, delay=db_delay)
+    started = time.perf_counter()
+    summaries = await get_admin_summaries(session)
+    bulk_time = time.perf_counter() - started
+
+    same = [_comparable(summary) for _, summary in summaries] == [_comparable(summary) for summary in per_mentor]
+    print(
+        f"наставников {MENTORS} x студентов {STUDENTS}: "
+        f"по наставникам {per_mentor_statements} запросов, {per_mentor_time * 1000:.0f} мс "
+        f"(без заглушки {(per_mentor_time - per_mentor_tables.elapsed) * 1000:.0f} мс); "
+        f"get_admin_summaries {len(session.statements)} запросов, {bulk_time * 1000:.0f} мс "
+        f"(без заглушки {(bulk_time - bulk_tables.elapsed) * 1000:.0f} мс); "
+        f"сводки совпадают: {'да' if same else 'НЕТ'}"
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    db_delay_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    asyncio.run(run(db_delay_ms / 1000))
@@ -0,0 +1,111 @@
+"""
+Группировка студентов без ответов по наставникам: get_mentor_groups_bulk против построчного варианта
+
+LESSONS уроков с приближающимся дедлайном в TRAININGS тренингах, по
+STUDENTS студентов на тренинг и MENTORS наставников; ANSWERED_SHARE
+студентов уже ответили. Построчный вариант - get_students_without_answers
+и group_students_by_mentor на каждый урок (как при DEADLINE_BULK_ENABLED=false).
+БД - заглушка tests.fake_session.FakeSession с задержкой DB_DELAY на запрос.
+Печатает число запросов и время; результаты обоих вариантов сверяются.
+
+Запуск из корня репозитория:
+    python -m benchmarks.deadline_grouping [STUDENTS] [DB_DELAY_MS]
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+
+from bot.config import Config
+from bot.services import reference_cache
+from bot.services.database import Lesson, Mapping, Mentor, Student, Training, WebhookEvent
+from bot.services.deadline_checker import DeadlineCheckService
+from tests.fake_session import FakeSession, FakeTables
+
+LESSONS = 10
+TRAININGS = 5
+MENTORS = 50
+ANSWERED_SHARE = 0.2
+
+
+def _tables(students: int):
+    random.seed(1)
+    lessons = [
+        Lesson(id=number, lesson_id=str(1000 + number), training_id=str(number % TRAININGS + 1))
+        for number in range(LESSONS)
+    ]
+    mapping = [
+        Mapping(
+            id=training_id * students + number,
+            student_id=training_id * students + number,
+            training_id=training_id,
+            mentor_id=number % MENTORS + 1,
+        )
+        for training_id in range(1, TRAININGS + 1)
+        for number in range(students)
+    ]
+    return {
+        'trainings': [Training(id=training_id, training_id=str(training_id)) for training_id in range(1, TRAININGS + 1)],
+        'lessons': lessons,
+        'mapping': mapping,
+        'students': [
+            Student(
+                id=row.student_id,
+                student_id=row.student_id,
+                user_email=f"student{row.student_id}@example.com",
+                first_name='Студент',
+                last_name=str(row.student_id),
+            )
+            for row in mapping
+        ],
+        'mentors': [Mentor(id=mentor_id, mentor_id=mentor_id) for mentor_id in range(1, MENTORS + 1)],
+        'webhook_events': [
+            WebhookEvent(id=index, answer_lesson_id=int(lesson.lesson_id), user_id=row.student_id, answer_status='new')
+            for index, (lesson, row) in enumerate(
+                (lesson, row)
+                for lesson in lessons
+                for row in mapping
+                if str(row.training_id) == lesson.training_id and random.random() < ANSWERED_SHARE
+            )
+        ],
+    }
+
+
+async def run(students: int, db_delay: float):
+    reference_cache.reference_cache = None
+    service = DeadlineCheckService(Config())
+    tables = FakeTables(_tables(students))
+    lessons = tables.tables['lessons']
+
+    session = FakeSession(tables, delay=db_delay)
+    started = time.perf_counter()
+    per_lesson = {}
+    for lesson in lessons:
+        without_answers = await service.get_students_without_answers(session, lesson.lesson_id)
+        if without_answers:
+            groups = await service.group_students_by_mentor(session, without_answers, lesson.training_id)
+            if groups:
+                per_lesson[lesson.lesson_id] = groups
+    per_lesson_time = time.perf_counter() - started
+    per_lesson_statements = len(session.statements)
+
+    session = FakeSession(tables, delay=db_delay)
+    started = time.perf_counter()
+    bulk = await service.get_mentor_groups_bulk(session, lessons)
+    bulk_time = time.perf_counter() - started
+
+    print(
+        f"уроков {LESSONS}, студентов на тренинг {students}: "
+        f"построчно {per_lesson_statements} запросов, {per_lesson_time * 1000:.0f} мс; "
+        f"bulk {len(session.statements)} запросов, {bulk_time * 1000:.0f} мс; "
+        f"результаты совпадают: {'да' if per_lesson == bulk else 'НЕТ'}"
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    db_delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    asyncio.run(run(students, db_delay_ms / 1000))
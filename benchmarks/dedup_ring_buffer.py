@@ -0,0 +1,57 @@
+"""
+Стоимость добавления update_id в буфер дедупликации при заполненном буфере
+
+Сравнивает RecentIds (deque + set) с прежней схемой main.py: set, из которого
+при переполнении удалялись 100 произвольных id через list(set)[:100].
+
+Запуск из корня репозитория:
+    python -m benchmarks.dedup_ring_buffer [размер ...]
+"""
+
+import sys
+import time
+
+from bot.services.update_dedup import RecentIds
+
+INSERTS = 20000
+
+
+class LegacyTrimmedSet:
+    """Прежний кэш processed_updates из main.py"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._ids = set()
+
+    def add(self, item) -> bool:
+        if item in self._ids:
+            return False
+        self._ids.add(item)
+        if len(self._ids) > self.max_size:
+            for old_id in list(self._ids)[:100]:
+                self._ids.discard(old_id)
+        return True
+
+
+def measure(buffer, size: int, inserts: int) -> float:
+    """Среднее время добавления (нс) в заполненный буфер"""
+    for update_id in range(size):
+        buffer.add(update_id)
+
+    started = time.perf_counter()
+    for update_id in range(size, size + inserts):
+        buffer.add(update_id)
+    return (time.perf_counter() - started) / inserts * 1e9
+
+
+def main(sizes):
+    print(f"{'размер':>10} {'RecentIds':>12} {'set + trim':>12}")
+    for size in sizes:
+        inserts = min(INSERTS, max(1000, 20_000_000 // size))
+        ring = measure(RecentIds(size), size, inserts)
+        legacy = measure(LegacyTrimmedSet(size), size, inserts)
+        print(f"{size:>10} {ring:>9.0f} ns {legacy:>9.0f} ns")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,98 @@
+"""
+Пропускная способность приема вебхуков GetCourse
+
+Маршрут register_ingest_routes поднимается на локальном aiohttp-сервере
+(TestClient); БД заменена заглушкой tests.fake_session.FakeSession с
+задержкой DB_DELAY на запрос. CLIENTS клиентов в течение DURATION секунд
+шлют по одному вебхуку на запрос. Печатает принятые события в секунду,
+p50/p99 времени ответа и число ответов 503.
+
+Запуск из корня репозитория:
+    python -m benchmarks.ingest_throughput [CLIENTS] [DB_DELAY_MS]
+"""
+
+import asyncio
+import itertools
+import logging
+import sys
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.config import Config
+from bot.services import database
+from bot.services.webhook_ingest import register_ingest_routes
+from tests.fake_session import FakeResult, FakeSession
+
+DURATION = 5
+
+
+def _returning(statement):
+    """
+    Ответ INSERT ... RETURNING: все строки батча записаны
+
+    Строки берутся из компиляции запроса - с реальным драйвером SQLAlchemy
+    так же компилирует многострочный INSERT в процессе бота.
+    """
+    rows = statement.compile().params
+    answer_ids = [value for key, value in rows.items() if key.startswith('answer_id_m')]
+    statuses = [value for key, value in rows.items() if key.startswith('answer_status_m')]
+    dates = [value for key, value in rows.items() if key.startswith('event_date_m')]
+    return FakeResult([
+        (index + 1, answer_id, status, event_date)
+        for index, (answer_id, status, event_date) in enumerate(zip(answer_ids, statuses, dates))
+    ])
+
+
+async def run(clients: int, db_delay: float):
+    config = Config()
+    database.async_session = lambda: FakeSession(_returning, delay=db_delay)
+    app = web.Application()
+    buffer = register_ingest_routes(app, config)
+    answer_ids = itertools.count(1)
+    latencies = []
+    rejected = 0
+
+    async with TestClient(TestServer(app)) as client:
+        deadline = time.perf_counter() + DURATION
+
+        async def sender():
+            nonlocal rejected
+            while time.perf_counter() < deadline:
+                answer_id = next(answer_ids)
+                started = time.perf_counter()
+                response = await client.post(config.ingest_path, json={
+                    'eventDate': '2024-05-01T10:00:00',
+                    'userId': '42',
+                    'userEmail': 'student@example.com',
+                    'answerId': str(answer_id),
+                    'answerStatus': 'new',
+                })
+                await response.read()
+                if response.status == 200:
+                    latencies.append(time.perf_counter() - started)
+                elif response.status == 503:
+                    rejected += 1
+                else:
+                    raise RuntimeError(f"Неожиданный ответ {response.status}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(sender() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f"клиентов {clients}, задержка БД {db_delay * 1000:.0f} мс: "
+        f"{len(latencies) / elapsed:.0f} событий/с, "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс, "
+        f"503: {rejected}, батчей {buffer.flushes}"
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    db_delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(run(clients, db_delay_ms / 1000))
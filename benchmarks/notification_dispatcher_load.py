@@ -0,0 +1,132 @@
+"""
+Нагрузочный тест отправки уведомлений: NotificationSenderService с NotificationDispatcher
+
+В очереди PENDING уведомлений (1k/10k/50k) для MENTORS менторов; очередь
+разбирается так же, как WakeableJob: send_pending_notifications вызывается,
+пока батчи полные. БД - заглушка tests.fake_session.FakeSession, Bot -
+заглушка с задержкой BOT_LATENCY на запрос; FLOOD_SHARE запросов получают
+RetryAfter. Время сжато в SPEEDUP раз: лимиты (30 сообщений/с, 1 в секунду
+в чат), задержки Bot API и retry_with_backoff ускорены одинаково, поэтому
+пропускная способность печатается в сообщениях за секунду реального
+Telegram. Последовательная отправка с паузой 0.5 с давала около 2 сообщений/с.
+
+Печатает пропускную способность, число нарушений порядка внутри чата и
+минимальный интервал между запросами в один чат. Батч ждет свое последнее
+сообщение, поэтому при NOTIFICATION_BATCH_SIZE=20 очередь разбирается около
+16 сообщений/с, при 100 - около 29.
+
+Запуск из корня репозитория:
+    python -m benchmarks.notification_dispatcher_load [NOTIFICATION_BATCH_SIZE]
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from aiogram.utils.exceptions import RetryAfter
+
+from bot.config import Config
+from bot.services import notification_sender
+from bot.services.database import Mentor
+from bot.services.notification_sender import NotificationSenderService
+from tests.fake_session import FakeResult, FakeSession, compile_sql
+
+PENDING = (1000, 10000, 50000)
+MENTORS = 500
+SPEEDUP = 50
+BOT_LATENCY = 0.08
+FLOOD_SHARE = 0.002
+
+
+class FakeBot:
+    """Bot API: задержка запроса, случайный RetryAfter, журнал отправок по чатам"""
+
+    def __init__(self):
+        self.sent = {}
+        self.floods = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        requested = time.perf_counter()
+        await asyncio.sleep(BOT_LATENCY / SPEEDUP)
+        if random.random() < FLOOD_SHARE:
+            self.floods += 1
+            raise RetryAfter(1 / SPEEDUP)
+        self.sent.setdefault(chat_id, []).append((requested, int(text.split()[-1])))
+        return SimpleNamespace(message_id=sum(len(chat) for chat in self.sent.values()))
+
+
+async def run(pending: int, batch_size: int):
+    random.seed(1)
+    config = Config()
+    config.worker_id = "bench"
+    config.notification_batch_size = batch_size
+    config.notification_global_rate = 30 * SPEEDUP
+    config.notification_per_chat_interval = 1.0 / SPEEDUP
+    config.notification_retry_base_delay = 2.0 / SPEEDUP
+    config.notification_retry_max_delay = 60.0 / SPEEDUP
+
+    started_at = datetime(2024, 5, 1, 10, 0)
+    queue = [
+        SimpleNamespace(
+            id=notification_id,
+            mentor_id=random.randint(1, MENTORS),
+            message=f"Ответ {notification_id}",
+            created_at=started_at + timedelta(milliseconds=notification_id),
+        )
+        for notification_id in range(1, pending + 1)
+    ]
+    mentors = [
+        Mentor(id=mentor_id, mentor_id=mentor_id, email=f"mentor{mentor_id}@example.com", telegram_id=1000 + mentor_id)
+        for mentor_id in range(1, MENTORS + 1)
+    ]
+
+    def respond(statement):
+        sql = compile_sql(statement)
+        if sql.startswith("UPDATE") and "RETURNING" in sql:
+            batch = queue[:batch_size]
+            del queue[:batch_size]
+            return FakeResult(batch)
+        if sql.startswith("SELECT"):
+            return FakeResult(mentors)
+        return FakeResult()
+
+    async def get_session():
+        yield FakeSession(respond)
+
+    notification_sender.get_session = get_session
+    bot = FakeBot()
+    service = NotificationSenderService(config, bot)
+
+    started = time.perf_counter()
+    while await service.send_pending_notifications():
+        pass
+    elapsed = time.perf_counter() - started
+
+    delivered = sum(len(chat) for chat in bot.sent.values())
+    reordered = sum(
+        1
+        for chat in bot.sent.values()
+        for (_, previous), (_, current) in zip(chat, chat[1:])
+        if current < previous
+    )
+    min_gap = min(
+        (current - previous for chat in bot.sent.values() for (previous, _), (current, _) in zip(chat, chat[1:])),
+        default=0,
+    )
+    print(
+        f"pending {pending}: доставлено {delivered}, "
+        f"{delivered / elapsed / SPEEDUP:.1f} сообщений/с Telegram, "
+        f"RetryAfter {bot.floods}, нарушений порядка {reordered}, "
+        f"мин. интервал в чате {min_gap * SPEEDUP:.2f} с"
+    )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.ERROR)
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else Config().notification_batch_size
+    for pending in PENDING:
+        asyncio.run(run(pending, batch_size))
@@ -0,0 +1,110 @@
+"""
+Задержка обработки обновлений в режиме long polling: dp.start_polling против пула
+
+getUpdates подменяется заглушкой: MENTORS чатов присылают по ROUNDS сообщений
+с шагом 50 мс, 5% обработчиков работают 300 мс, остальные 10 мс; семафор
+на 30 мест изображает пул соединений БД. Печатает p50/p99 задержки от
+поступления до конца обработки и число одновременных обработок одного чата.
+
+Запуск из корня репозитория:
+    python -m benchmarks.update_pool_latency start_polling
+    python -m benchmarks.update_pool_latency pool [UPDATE_WORKERS]
+"""
+
+import asyncio
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from aiogram import Bot, Dispatcher, types
+
+from bot.services.update_workers import ChatOrderedWorkerPool
+
+MENTORS = 100
+ROUNDS = 20
+HEAVY_SHARE = 0.05
+DB_POOL_SIZE = 30
+
+
+async def run(mode: str, workers: int):
+    random.seed(1)
+    bot = Bot("123456:BENCH")
+    dp = Dispatcher(bot)
+    db_pool = asyncio.Semaphore(DB_POOL_SIZE)
+    arrivals = {}
+    latencies = []
+    incoming = []
+    active = {}
+    overlaps = 0
+
+    async def produce():
+        update_id = 0
+        for _ in range(ROUNDS):
+            for chat_id in range(1, MENTORS + 1):
+                update_id += 1
+                text = 'heavy' if random.random() < HEAVY_SHARE else 'light'
+                incoming.append(types.Update(**{
+                    'update_id': update_id,
+                    'message': {
+                        'message_id': update_id,
+                        'date': 0,
+                        'chat': {'id': chat_id, 'type': 'private'},
+                        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Ментор'},
+                        'text': text,
+                    },
+                }))
+                arrivals[update_id] = time.perf_counter()
+            await asyncio.sleep(0.05)
+
+    async def get_updates(offset=None, timeout=20, **kwargs):
+        while not incoming:
+            await asyncio.sleep(0.005)
+        batch = incoming[:100]
+        del incoming[:100]
+        return batch
+
+    async def handler(message: types.Message):
+        nonlocal overlaps
+        chat_id = message.chat.id
+        active[chat_id] = active.get(chat_id, 0) + 1
+        if active[chat_id] > 1:
+            overlaps += 1
+        async with db_pool:
+            await asyncio.sleep(0.3 if message.text == 'heavy' else 0.01)
+        active[chat_id] -= 1
+        latencies.append(time.perf_counter() - arrivals[message.message_id])
+
+    bot.get_updates = get_updates
+    dp.register_message_handler(handler)
+
+    producer = asyncio.create_task(produce())
+    if mode == 'pool':
+        config = SimpleNamespace(update_workers=workers, update_queue_size=1000)
+        runner = asyncio.create_task(ChatOrderedWorkerPool(config, dp, bot).run_polling(relax=0))
+    else:
+        dp.reset_webhook = lambda check=False: asyncio.sleep(0)
+        runner = asyncio.create_task(dp.start_polling(relax=0))
+
+    total = MENTORS * ROUNDS
+    deadline = time.perf_counter() + 30
+    while len(latencies) < total and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+    runner.cancel()
+    await asyncio.gather(producer, runner, return_exceptions=True)
+
+    latencies.sort()
+    label = f"pool({workers})" if mode == 'pool' else mode
+    print(
+        f"{label}: обработано {len(latencies)}/{total}, "
+        f"p50 {latencies[len(latencies) // 2] * 1000:.0f} мс, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} мс, "
+        f"пересечений в чате {overlaps}"
+    )
+
+
+if __name__ == '__main__':
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'pool'
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(run(mode, workers))
@@ -0,0 +1,166 @@
+"""
+Справочные данные батча вебхуков: load_batch_context против запросов на каждое событие
+
+Батч из BATCH_SIZES вебхуков (студенты STUDENTS, тренинги TRAININGS) проходит
+process_answer_to_lesson двумя путями: без контекста (студент, тренинг,
+mapping, ментор, урок и тренинг - отдельными запросами на каждое событие)
+и с контекстом load_batch_context (пять запросов IN (...) на батч). БД -
+заглушка tests.fake_session.FakeSession с задержкой DB_DELAY на запрос.
+Печатает число запросов и время на батч; уведомления обоих путей сверяются.
+
+Запуск из корня репозитория:
+    python -m benchmarks.webhook_batch_context [DB_DELAY_MS]
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from bot.config import Config
+from bot.services.database import Lesson, Mapping, Mentor, Student, Training
+from bot.services.webhook_processor import WebhookProcessingService
+from tests.fake_session import FakeResult, FakeSession
+
+BATCH_SIZES = (50, 500, 5000)
+STUDENTS = 20000
+TRAININGS = 10
+LESSONS_PER_TRAINING = 50
+MENTORS = 200
+
+# Таблица -> колонка, по которой ищут строки в обоих путях
+KEY_COLUMNS = {
+    'students': 'student_id',
+    'trainings': 'training_id',
+    'lessons': 'lesson_id',
+    'mapping': 'student_id',
+    'mentors': 'mentor_id',
+}
+
+
+def _reference_tables():
+    tables = {
+        'students': [
+            Student(id=student_id, student_id=student_id, user_email=f"student{student_id}@example.com")
+            for student_id in range(1, STUDENTS + 1)
+        ],
+        'trainings': [
+            Training(id=training_id, training_id=str(training_id), title=f"Тренинг {training_id}")
+            for training_id in range(1, TRAININGS + 1)
+        ],
+        'lessons': [
+            Lesson(
+                id=training_id * 1000 + number,
+                lesson_id=str(training_id * 1000 + number),
+                training_id=str(training_id),
+                module_title=f"Модуль {number // 10}",
+                lesson_title=f"Урок {number}",
+            )
+            for training_id in range(1, TRAININGS + 1)
+            for number in range(1, LESSONS_PER_TRAINING + 1)
+        ],
+        'mapping': [
+            Mapping(
+                id=student_id,
+                student_id=student_id,
+                training_id=student_id % TRAININGS + 1,
+                mentor_id=student_id % MENTORS + 1,
+            )
+            for student_id in range(1, STUDENTS + 1)
+        ],
+        'mentors': [
+            Mentor(id=mentor_id, mentor_id=mentor_id, email=f"mentor{mentor_id}@example.com")
+            for mentor_id in range(1, MENTORS + 1)
+        ],
+    }
+    # Индекс по колонке поиска: значения приводятся к строке (тренинги и уроки - VARCHAR)
+    return {
+        table: _index(rows, KEY_COLUMNS[table])
+        for table, rows in tables.items()
+    }
+
+
+def _index(rows, column):
+    index = {}
+    for row in rows:
+        index.setdefault(str(getattr(row, column)), []).append(row)
+    return index
+
+
+def _respond(tables):
+    def respond(statement):
+        table = statement.get_final_froms()[0].name
+        column = KEY_COLUMNS[table]
+        rows = []
+        for key, value in statement.compile().params.items():
+            if not key.startswith(column):
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                rows.extend(tables[table].get(str(item), []))
+        return FakeResult(rows)
+    return respond
+
+
+def _webhooks(batch_size: int):
+    random.seed(batch_size)
+    webhooks = []
+    for webhook_id in range(1, batch_size + 1):
+        student_id = random.randint(1, STUDENTS)
+        training_id = student_id % TRAININGS + 1
+        webhooks.append(SimpleNamespace(
+            id=webhook_id,
+            user_id=student_id,
+            user_email=f"student{student_id}@example.com",
+            user_first_name="Студент",
+            user_last_name=str(student_id),
+            answer_id=webhook_id,
+            answer_status='new',
+            answer_training_id=training_id,
+            answer_lesson_id=training_id * 1000 + random.randint(1, LESSONS_PER_TRAINING),
+            event_date=datetime(2024, 5, 1, 10, 0),
+        ))
+    return webhooks
+
+
+async def _process(service, tables, webhooks, db_delay: float, batch_context: bool):
+    session = FakeSession(_respond(tables), delay=db_delay)
+    rows = []
+    started = time.perf_counter()
+    context = await service.load_batch_context(session, webhooks) if batch_context else None
+    for webhook in webhooks:
+        await service.process_answer_to_lesson(session, webhook, context, pending_notifications=rows)
+    elapsed = time.perf_counter() - started
+    return rows, len(session.statements), elapsed
+
+
+async def run(db_delay: float):
+    service = WebhookProcessingService(Config())
+    tables = _reference_tables()
+
+    for batch_size in BATCH_SIZES:
+        webhooks = _webhooks(batch_size)
+        per_event_rows, per_event_statements, per_event_time = await _process(
+            service, tables, webhooks, db_delay, batch_context=False
+        )
+        batch_rows, batch_statements, batch_time = await _process(
+            service, tables, webhooks, db_delay, batch_context=True
+        )
+
+        def signature(rows):
+            return [(row['mentor_id'], row['message_hash'], row['message']) for row in rows]
+
+        same = signature(per_event_rows) == signature(batch_rows)
+        print(
+            f"батч {batch_size}: по событию {per_event_statements} запросов, {per_event_time * 1000:.0f} мс; "
+            f"load_batch_context {batch_statements} запросов, {batch_time * 1000:.0f} мс; "
+            f"уведомлений {len(batch_rows)}, совпадают: {'да' if same else 'НЕТ'}"
+        )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.ERROR)
+    db_delay_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    asyncio.run(run(db_delay_ms / 1000))
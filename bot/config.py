@@ -1,4 +1,5 @@
 import os
+import socket
 from pathlib import Path
 from urllib.parse import quote_plus
 
@@ -63,6 +64,8 @@ class Config:
                 "timezone": "UTC"
             }
         }
+        # Таймаут установки выделенных соединений asyncpg вне пула (лидер планировщика, LISTEN), секунды
+        self.db_connect_timeout = float(os.getenv("DB_CONNECT_TIMEOUT", "10"))
 
         # Сохраняем параметры для использования в других модулях
         self.postgres_host = postgres_host
@@ -86,6 +89,9 @@ class Config:
         # Фича-флаги
         # Включение функционала табеля (по умолчанию выключен для безопасного релиза)
         self.gradebook_enabled = os.getenv("GRADEBOOK_ENABLED", "false").lower() == "true"
+        # Кэш сводок табеля для пагинации (в секундах, 0 - выключен) и его размер
+        self.gradebook_cache_ttl_seconds = int(os.getenv("GRADEBOOK_CACHE_TTL_SECONDS", "120"))
+        self.gradebook_cache_max_size = int(os.getenv("GRADEBOOK_CACHE_MAX_SIZE", "1000"))
         # Включение ежедневных напоминаний о непроверенных ответах (по умолчанию включен)
         self.reminder_enabled = os.getenv("REMINDER_ENABLED", "true").lower() == "true"
 
@@ -95,8 +101,63 @@ class Config:
         self.deadline_check_interval_minutes = int(os.getenv("DEADLINE_CHECK_INTERVAL_MINUTES", "60"))
         self.notification_send_interval = int(os.getenv("NOTIFICATION_SEND_INTERVAL", "15"))
 
+        # Немедленный запуск обработки по NOTIFY из БД (интервальные задачи остаются страховкой)
+        self.db_notify_enabled = os.getenv("DB_NOTIFY_ENABLED", "false").lower() == "true"
+        self.db_notify_debounce_seconds = float(os.getenv("DB_NOTIFY_DEBOUNCE_SECONDS", "0.5"))
+        self.db_notify_reconnect_seconds = float(os.getenv("DB_NOTIFY_RECONNECT_SECONDS", "5"))
+        # Проверка соединения слушателя (SELECT 1): полуоткрытое TCP-соединение не сообщает об обрыве
+        self.db_notify_healthcheck_seconds = float(os.getenv("DB_NOTIFY_HEALTHCHECK_SECONDS", "30"))
+
+        # Прием вебхуков GetCourse напрямую ботом (вместо workflow n8n)
+        self.ingest_enabled = os.getenv("INGEST_ENABLED", "false").lower() == "true"
+        self.ingest_path = os.getenv("INGEST_PATH", "/getcoursebd")
+        self.ingest_flush_interval_ms = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "50"))
+        self.ingest_flush_max_rows = int(os.getenv("INGEST_FLUSH_MAX_ROWS", "500"))
+        self.ingest_max_pending = int(os.getenv("INGEST_MAX_PENDING", "10000"))
+
+        # Дедупликация повторных доставок обновлений Telegram в режиме webhook:
+        # memory - только в процессе, postgres - общая для реплик таблица telegram_processed_updates
+        self.update_dedup_backend = os.getenv("UPDATE_DEDUP_BACKEND", "memory").lower()
+        self.update_dedup_size = int(os.getenv("UPDATE_DEDUP_SIZE", "10000"))
+        self.update_dedup_ttl_hours = int(os.getenv("UPDATE_DEDUP_TTL_HOURS", "24"))
+
+        # Обработка обновлений Telegram пулом воркеров (webhook и long polling):
+        # обновления одного чата по порядку, разных чатов - параллельно
+        self.update_workers_enabled = os.getenv("UPDATE_WORKERS_ENABLED", "false").lower() == "true"
+        # Сколько чатов обрабатываются одновременно и сколько обновлений может ждать обработки.
+        # Больше пула соединений БД (10+20): хендлеры без БД не ждут за медленными с БД
+        self.update_workers = int(os.getenv("UPDATE_WORKERS", "50"))
+        self.update_queue_size = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+
+        # Хранилище состояний FSM: memory - в процессе, postgres - таблица fsm_states (общая для реплик)
+        self.fsm_storage = os.getenv("FSM_STORAGE", "memory").lower()
+        self.fsm_state_ttl_hours = int(os.getenv("FSM_STATE_TTL_HOURS", "24"))
+        # Кэш найденных состояний в процессе (изменения другой реплики видны не позже чем через TTL;
+        # отсутствие состояния не кэшируется)
+        self.fsm_cache_ttl_seconds = int(os.getenv("FSM_CACHE_TTL_SECONDS", "5"))
+        self.fsm_cache_max_size = int(os.getenv("FSM_CACHE_MAX_SIZE", "10000"))
+
+        # Выбор лидера среди реплик: задачи-одиночки (дедлайны, напоминания, очистки) выполняет только лидер
+        self.leader_election_enabled = os.getenv("LEADER_ELECTION_ENABLED", "false").lower() == "true"
+        self.leader_check_interval_seconds = int(os.getenv("LEADER_CHECK_INTERVAL_SECONDS", "10"))
+
+        # Кэш справочных таблиц (mentors, students, trainings, lessons, mapping)
+        self.reference_cache_enabled = os.getenv("REFERENCE_CACHE_ENABLED", "true").lower() == "true"
+        # Как часто проверять версию справочника (max(updated_at), count) в секундах
+        self.reference_cache_ttl_seconds = int(os.getenv("REFERENCE_CACHE_TTL_SECONDS", "60"))
+        # Справочники больше этого числа записей не кэшируются
+        self.reference_cache_max_rows = int(os.getenv("REFERENCE_CACHE_MAX_ROWS", "50000"))
+
+        # Кэш решений авторизации по telegram_id (AuthMiddleware / check_auth)
+        self.auth_cache_enabled = os.getenv("AUTH_CACHE_ENABLED", "true").lower() == "true"
+        self.auth_cache_ttl_seconds = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+        self.auth_cache_negative_ttl_seconds = int(os.getenv("AUTH_CACHE_NEGATIVE_TTL_SECONDS", "10"))
+        self.auth_cache_max_size = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+
         # Параметры дедлайнов
         self.deadline_warning_hours = int(os.getenv("DEADLINE_WARNING_HOURS", "36"))
+        # Bulk-режим проверки дедлайнов (фиксированное число запросов на все уроки)
+        self.deadline_bulk_enabled = os.getenv("DEADLINE_BULK_ENABLED", "true").lower() == "true"
 
         # Параметры напоминаний
         self.reminder_trigger_hour = int(os.getenv("REMINDER_TRIGGER_HOUR", "12"))
@@ -104,4 +165,22 @@ class Config:
 
         # Лимиты обработки
         self.webhook_batch_size = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
-        self.notification_batch_size = int(os.getenv("NOTIFICATION_BATCH_SIZE", "20"))
\ No newline at end of file
+
+        # Идентификатор экземпляра бота (для аренды вебхуков несколькими репликами)
+        self.worker_id = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+        # Срок аренды батча вебхуков (в секундах); должен превышать время обработки батча
+        self.webhook_lease_seconds = int(os.getenv("WEBHOOK_LEASE_SECONDS", "300"))
+        # Повторные попытки обработки вебхука с ошибкой: задержка base * 2^(попытка-1), не больше max;
+        # после max_attempts неудачных попыток вебхук уходит в карантин
+        self.webhook_max_attempts = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+        self.webhook_retry_base_seconds = int(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "60"))
+        self.webhook_retry_max_seconds = int(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "3600"))
+        self.notification_batch_size = int(os.getenv("NOTIFICATION_BATCH_SIZE", "20"))
+        # Срок аренды батча уведомлений (в секундах); должен превышать время отправки батча с повторами
+        self.notification_lease_seconds = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "300"))
+
+        # Лимиты отправки в Telegram (около 30 сообщений/с суммарно, 1 сообщение/с в чат)
+        self.notification_global_rate = float(os.getenv("NOTIFICATION_GLOBAL_RATE", "30"))
+        self.notification_per_chat_interval = float(os.getenv("NOTIFICATION_PER_CHAT_INTERVAL", "1.0"))
+        # Число чатов, в которые уведомления отправляются параллельно
+        self.notification_send_concurrency = int(os.getenv("NOTIFICATION_SEND_CONCURRENCY", "30"))
\ No newline at end of file
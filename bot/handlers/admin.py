@@ -6,6 +6,11 @@ from bot.utils.markdown import bold, escape_markdown_v2
 from datetime import datetime, timedelta
 from sqlalchemy import select, func
 import bot.services.database as db
+from bot.services.reference_cache import get_reference_cache
+from bot.services.update_workers import get_update_workers
+import bot.handlers.auth as auth_handlers
+import bot.utils.logger as app_logger
+from bot.services.webhook_processor import WebhookProcessingService
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +29,7 @@ async def cmd_alerts(message: types.Message, config):
     keyboard.add(
         types.InlineKeyboardButton("📊 Последние ошибки", callback_data="alerts_errors"),
         types.InlineKeyboardButton("ℹ️ Статус системы", callback_data="alerts_status"),
+        types.InlineKeyboardButton("☣️ Карантин вебхуков", callback_data="alerts_quarantine"),
     )
 
     await message.answer(
@@ -123,19 +129,127 @@ async def callback_alerts_status(callback_query: types.CallbackQuery, config):
             lines.append("")
         body = "\n".join(lines).rstrip()
 
+    body = f"{body}\n\n{_format_cache_stats()}\n\n{_format_auth_cache_stats()}\n\n{_format_db_log_stats()}"
+    body = f"{body}\n\n{_format_update_workers_stats()}"
+
     await callback_alerts_menu_render(
         callback_query,
         title=f"ℹ️ {bold('Статус системы за последние сутки')}\n\n",
         body=body,
     )
 
+def _format_cache_stats() -> str:
+    """Статистика кэша справочников для экрана статуса"""
+    cache = get_reference_cache()
+    if cache is None:
+        return "Кэш справочников: выключен"
+
+    lines = ["Кэш справочников (попадания / запросы в БД / перезагрузки):", ""]
+    for table, stats in cache.get_stats().items():
+        rows = f"{stats['rows']} записей" if stats['cached'] else "не в кэше"
+        lines.append(
+            f"{table}: {stats['hits']} / {stats['misses']} / {stats['reloads']} ({rows})"
+        )
+    return "\n".join(lines)
+
+def _format_auth_cache_stats() -> str:
+    """Статистика кэша авторизации для экрана статуса"""
+    cache = auth_handlers.auth_cache
+    if cache is None:
+        return "Кэш авторизации: выключен"
+
+    return (
+        f"Кэш авторизации: попаданий {cache.hits}, промахов {cache.misses} "
+        f"(hit ratio {cache.hit_ratio:.0%}), записей {len(cache)}"
+    )
+
+def _format_db_log_stats() -> str:
+    """Статистика записи логов в БД для экрана статуса"""
+    handler = app_logger.db_log_handler
+    if handler is None:
+        return "Запись логов в БД: выключена"
+
+    stats = handler.get_stats()
+    return (
+        f"Запись логов в БД: записано {stats['written']}, вытеснено {stats['dropped']}, "
+        f"ошибок записи {stats['failed']}, в очереди {stats['queued']} из {stats['max_queue_size']}"
+    )
+
+def _format_update_workers_stats() -> str:
+    """Метрики пула обработки обновлений Telegram для экрана статуса"""
+    pool = get_update_workers()
+    if pool is None:
+        return "Пул обработки обновлений: выключен"
+
+    stats = pool.get_stats()
+    return (
+        f"Пул обработки обновлений (до {stats['concurrency']} чатов параллельно): "
+        f"в очереди {stats['queue_depth']} ({stats['active_chats']} чатов), "
+        f"обработано {stats['processed']} (ошибок {stats['failed']}, в запросе {stats['inline']}), "
+        f"время обработки: среднее {stats['avg_ms']:.0f} мс, максимум {stats['max_ms']:.0f} мс"
+    )
+
+# Обработчик для просмотра вебхуков в карантине (обработка падала WEBHOOK_MAX_ATTEMPTS раз)
+async def callback_alerts_quarantine(callback_query: types.CallbackQuery, config, notice: str = None):
+    service = WebhookProcessingService(config)
+
+    async with db.async_session() as session:
+        total, webhooks = await service.get_dead_lettered_webhooks(session, limit=10)
+
+    keyboard = types.InlineKeyboardMarkup(row_width=1)
+
+    if not webhooks:
+        body = "Вебхуков в карантине нет"
+    else:
+        lines = [f"Вебхуков в карантине: {total} (показаны последние {len(webhooks)})", ""]
+        for webhook in webhooks:
+            event_date = webhook.event_date.strftime('%Y-%m-%d %H:%M:%S') if webhook.event_date else ""
+            lines.append(
+                f"#{webhook.id} — ответ {webhook.answer_id}, {webhook.user_email}, {event_date}, "
+                f"попыток: {webhook.attempts}"
+            )
+            lines.append(f"{(webhook.error_message or '')[:200]}")
+            lines.append("")
+            keyboard.add(
+                types.InlineKeyboardButton(
+                    f"🔁 Вернуть #{webhook.id}", callback_data=f"alerts_requeue:{webhook.id}"
+                )
+            )
+        body = "\n".join(lines).rstrip()
+        keyboard.add(types.InlineKeyboardButton("🔁 Вернуть все в очередь", callback_data="alerts_requeue:all"))
+
+    keyboard.add(types.InlineKeyboardButton("◀️ Назад", callback_data="alerts_menu"))
+
+    await callback_query.message.edit_text(
+        f"☣️ {bold('Карантин вебхуков')}\n\n{escape_markdown_v2(body)}",
+        reply_markup=keyboard,
+        parse_mode='MarkdownV2'
+    )
+    await callback_query.answer(notice)
+
+# Обработчик возврата вебхуков из карантина в очередь
+async def callback_alerts_requeue(callback_query: types.CallbackQuery, config):
+    target = callback_query.data.split(":", 1)[1]
+    webhook_ids = None if target == "all" else [int(target)]
+
+    service = WebhookProcessingService(config)
+    async with db.async_session() as session:
+        requeued = await service.requeue_dead_lettered_webhooks(session, webhook_ids)
+
+    logger.info(
+        f"Администратор {callback_query.from_user.id} вернул в очередь вебхуков из карантина: {requeued}"
+    )
+
+    await callback_alerts_quarantine(callback_query, config, notice=f"Возвращено в очередь: {requeued}")
+
 # Обработчик для возврата в меню алертов
 async def callback_alerts_menu(callback_query: types.CallbackQuery):
     """Возвращает в главное меню алертов"""
     keyboard = types.InlineKeyboardMarkup(row_width=1)
     keyboard.add(
         types.InlineKeyboardButton("📊 Последние ошибки", callback_data="alerts_errors"),
-        types.InlineKeyboardButton("ℹ️ Статус системы", callback_data="alerts_status")
+        types.InlineKeyboardButton("ℹ️ Статус системы", callback_data="alerts_status"),
+        types.InlineKeyboardButton("☣️ Карантин вебхуков", callback_data="alerts_quarantine")
     )
 
     await callback_query.message.edit_text(
@@ -203,6 +317,20 @@ def register_admin_handlers(dp: Dispatcher, config):
         state="*"
     )
 
+    dp.register_callback_query_handler(
+        lambda c: callback_alerts_quarantine(c, config),
+        admin_filter,
+        lambda c: c.data == "alerts_quarantine",
+        state="*"
+    )
+
+    dp.register_callback_query_handler(
+        lambda c: callback_alerts_requeue(c, config),
+        admin_filter,
+        lambda c: c.data.startswith("alerts_requeue:"),
+        state="*"
+    )
+
     dp.register_callback_query_handler(
         callback_alerts_menu,
         admin_filter,
@@ -1,6 +1,7 @@
 import logging
 import re
 from datetime import datetime
+from typing import Optional
 
 import pytz
 from aiogram import Dispatcher, types
@@ -9,10 +10,17 @@ from aiogram.dispatcher.filters.state import State, StatesGroup
 from sqlalchemy import select
 
 from bot.services.database import Mentor, get_session
+from bot.services.reference_cache import find_actual_first, get_reference_cache
+from bot.utils.cache import TTLCache
 from bot.utils.markdown import bold
 
 logger = logging.getLogger(__name__)
 
+# Кэш решений авторизации по telegram_id (создается в register_auth_handlers)
+auth_cache: Optional[TTLCache] = None
+auth_cache_ttl = 60
+auth_cache_negative_ttl = 10
+
 # Состояния для регистрации
 class Registration(StatesGroup):
     waiting_for_email = State()
@@ -63,6 +71,14 @@ async def process_email(message: types.Message, state: FSMContext, config):
 
             await session.commit()
 
+            # telegram_id изменился - кэш справочника менторов нужно перечитать
+            cache = get_reference_cache()
+            if cache is not None:
+                cache.invalidate(Mentor)
+            # Сбрасываем кэшированные решения авторизации (в т.ч. отрицательное для этого пользователя)
+            if auth_cache is not None:
+                auth_cache.clear()
+
             await state.finish()
             await message.answer(
                 f"{bold('Вы успешно зарегистрированы в системе оповещений как наставник!')}\n\n"
@@ -82,23 +98,28 @@ async def process_email(message: types.Message, state: FSMContext, config):
 
 # Проверка авторизации пользователя
 async def check_auth(telegram_id):
-    """Проверка авторизации через PostgreSQL"""
+    """Проверка авторизации через PostgreSQL (с кэшированием решений по telegram_id)"""
+    if auth_cache is not None:
+        found, is_authorized = auth_cache.get(telegram_id)
+        if found:
+            return is_authorized
+
     try:
         async for session in get_session():
-            # Текущая дата в UTC для проверки актуальности записи
-            now_utc = datetime.now(pytz.UTC)
-
-            # Проверяем, что ментор существует и запись актуальна:
-            # - текущая дата >= valid_from
-            # - текущая дата <= valid_to
-            mentor_query = select(Mentor).where(
-                Mentor.telegram_id == telegram_id,
-                Mentor.valid_from <= now_utc,
-                Mentor.valid_to >= now_utc
-            )
-            result = await session.execute(mentor_query)
-            mentor = result.scalars().first()
-            return mentor is not None
+            # Проверяем, что ментор существует и запись актуальна
+            # (valid_from <= текущая дата <= valid_to); читаем через кэш справочников
+            mentor = await find_actual_first(session, Mentor, telegram_id=telegram_id)
+            is_authorized = mentor is not None
+
+            # Отрицательный результат кэшируем на меньшее время,
+            # чтобы новый ментор из DBeaver быстрее получил доступ
+            if auth_cache is not None:
+                auth_cache.set(
+                    telegram_id,
+                    is_authorized,
+                    auth_cache_ttl if is_authorized else auth_cache_negative_ttl
+                )
+            return is_authorized
     except Exception as e:
         logger.error(f"Ошибка при проверке авторизации пользователя {telegram_id}: {e}")
         return False
@@ -111,6 +132,13 @@ def register_auth_handlers(dp: Dispatcher, config):
         dp: Диспетчер бота
         config: Конфигурация бота
     """
+    global auth_cache, auth_cache_ttl, auth_cache_negative_ttl
+
+    if config.auth_cache_enabled:
+        auth_cache = TTLCache(max_size=config.auth_cache_max_size)
+        auth_cache_ttl = config.auth_cache_ttl_seconds
+        auth_cache_negative_ttl = config.auth_cache_negative_ttl_seconds
+
     dp.register_message_handler(
         lambda msg, state: process_email(msg, state, config),
         state=Registration.waiting_for_email
@@ -10,14 +10,15 @@ from bot.services.database import get_session
 logger = logging.getLogger(__name__)
 
 from bot.services.gradebook_service import (
-    build_mentor_overview,
+    get_students_summary,
+    get_admin_summaries,
+    setup_gradebook_cache,
     STATUS_ON_TIME,
     STATUS_LATE,
     STATUS_NO_BEFORE_DEADLINE,
     STATUS_NO_AFTER_DEADLINE,
     STATUS_HAS_ANSWER,
     STATUS_NO_ANSWER,
-    simplify_status,
     get_status_emoji,
     get_lesson_state,
 )
@@ -131,36 +132,12 @@ async def cb_progress_router(call: CallbackQuery, config):
                     page = 1
 
             try:
-                summary = await build_mentor_overview(session, mentor_id=mentor.id, training_id=training_id, lesson_id=lesson_id)
-
-                students = summary.get("students", {})
-
-                # Инициализируем счетчики для всех студентов нулевыми значениями
-                per_student = {
-                    sid: {
-                        STATUS_HAS_ANSWER: 0,
-                        STATUS_NO_ANSWER: 0,
-                    }
-                    for sid in students.keys()
-                }
-
-                # Обновляем счетчики из items (активные/завершенные уроки)
-                for it in summary.get("items", []):
-                    sid = it.get("student_id") if isinstance(it, dict) else it.student_id
-                    st = it.get("status") if isinstance(it, dict) else it.status
-                    simplified_status = simplify_status(st)
-                    if simplified_status is None:
-                        continue  # Пропускаем STATUS_OPTIONAL и другие
-                    if sid in per_student:  # Проверяем, что студент еще в списке
-                        per_student[sid][simplified_status] += 1
-
-                # Сортировка по фамилии, затем имени
-                def sort_key(sid):
-                    info = students.get(sid, {})
-                    last = (info.get("last_name") or "").lower()
-                    first = (info.get("first_name") or "").lower()
-                    return (last, first, sid)
-                ordered_ids = sorted(per_student.keys(), key=sort_key)
+                # Сводка из кэша: при листании страниц пересчет не выполняется
+                summary = await get_students_summary(session, mentor_id=mentor.id, training_id=training_id, lesson_id=lesson_id)
+
+                students = summary.students
+                per_student = summary.per_student
+                ordered_ids = summary.ordered_ids
 
                 # Пагинация: группируем карточки целиком (строка = одна карточка)
                 page_size = 20
@@ -347,6 +324,7 @@ async def cb_progress_router(call: CallbackQuery, config):
 
 
 def register_gradebook_handlers(dp: Dispatcher, config):
+    setup_gradebook_cache(config)
     dp.register_message_handler(lambda msg: cmd_progress(msg, config), commands=["progress"], state="*")
     dp.register_message_handler(lambda msg: cmd_progress_admin(msg, config), commands=["progress_admin"], state="*")
     dp.register_callback_query_handler(lambda c: cb_progress_router(c, config), lambda c: c.data and c.data.startswith("gb:"), state="*")
@@ -361,10 +339,14 @@ async def _build_header_with_legend(session, training_id: Optional[int], lesson_
     if lesson_id is None:
         lesson_line = escape_markdown_v2("по всем активным и завершенным урокам")
     else:
-        from sqlalchemy import select
         from bot.services.database import Lesson
-        lr = await session.execute(select(Lesson).where(Lesson.id == lesson_id))
-        l = lr.scalars().first()
+        from bot.services.reference_cache import find_actual_first
+        # Через кэш справочников: при листании страниц урок не запрашивается из БД.
+        # Кэш хранит только актуальные записи; заголовок показывается и для
+        # урока с истекшим valid_to, поэтому при промахе - поиск по id без фильтра
+        l = await find_actual_first(session, Lesson, id=lesson_id)
+        if l is None:
+            l = await session.get(Lesson, lesson_id)
         if l:
             # ВАЖНО: В модели Lesson поле называется lesson_title, а не title
             title_text = l.lesson_title if l.lesson_title else str(lesson_id)
@@ -466,38 +448,12 @@ async def _render_lessons_list(message: types.Message, session, mentor_id: Optio
 
 
 async def _render_students_list(message: types.Message, session, mentor_id: int, training_id: Optional[int], lesson_id: Optional[int], page: int, *, edit: bool = False):
-    from bot.services.gradebook_service import build_mentor_overview
-    summary = await build_mentor_overview(session, mentor_id=mentor_id, training_id=training_id, lesson_id=lesson_id, include_not_started=False)
-
-    students = summary.get("students", {})
-
-    # Инициализируем счетчики для всех студентов нулевыми значениями
-    per_student = {
-        sid: {
-            STATUS_HAS_ANSWER: 0,
-            STATUS_NO_ANSWER: 0,
-        }
-        for sid in students.keys()
-    }
+    # Сводка из кэша (общего с пагинацией и админским режимом)
+    summary = await get_students_summary(session, mentor_id=mentor_id, training_id=training_id, lesson_id=lesson_id, include_not_started=False)
 
-    # Обновляем счетчики из items (активные/завершенные уроки)
-    for it in summary.get("items", []):
-        sid = it.get("student_id") if isinstance(it, dict) else it.student_id
-        st = it.get("status") if isinstance(it, dict) else it.status
-        simplified_status = simplify_status(st)
-        if simplified_status is None:
-            continue  # Пропускаем STATUS_OPTIONAL и другие
-        if sid in per_student:  # Проверяем, что студент еще в списке
-            per_student[sid][simplified_status] += 1
-
-    # order students
-    students = summary.get("students", {})
-    def sort_key(sid):
-        info = students.get(sid, {})
-        last = (info.get("last_name") or "").lower()
-        first = (info.get("first_name") or "").lower()
-        return (last, first, sid)
-    ordered_ids = sorted(per_student.keys(), key=sort_key)
+    students = summary.students
+    per_student = summary.per_student
+    ordered_ids = summary.ordered_ids
 
     # Проверка наличия студентов
     if not ordered_ids:
@@ -564,23 +520,6 @@ async def _render_students_list(message: types.Message, session, mentor_id: int,
 
 
 async def _render_admin_list(message: types.Message, session, training_id: Optional[int], lesson_id: Optional[int], page: int, *, edit: bool = False):
-    from sqlalchemy import select, and_
-    from bot.services.database import Mentor
-    from datetime import datetime
-    import pytz
-    now_utc = datetime.now(pytz.UTC)
-
-    # Все наставники с проверкой актуальности
-    mentors_res = await session.execute(
-        select(Mentor).where(
-            and_(
-                Mentor.valid_from <= now_utc,
-                Mentor.valid_to >= now_utc
-            )
-        )
-    )
-    mentors = mentors_res.scalars().all()
-
     # Показываем индикатор загрузки для пользователя
     if edit:
         try:
@@ -588,34 +527,14 @@ async def _render_admin_list(message: types.Message, session, training_id: Optio
         except Exception:
             pass  # Игнорируем ошибки при обновлении сообщения
 
+    # Сводки всех наставников одним набором запросов (общий кэш с режимом наставника)
+    summaries = await get_admin_summaries(session, training_id=training_id, lesson_id=lesson_id, include_not_started=False)
+
     blocks = []  # [(mentor_display, [(student_display, counters_dict), ...])]
-    from bot.services.gradebook_service import build_mentor_overview
-    for m in mentors:
-        summary = await build_mentor_overview(session, mentor_id=m.id, training_id=training_id, lesson_id=lesson_id, include_not_started=False)
-        students = summary.get("students", {})
-
-        # Инициализируем счетчики для всех студентов нулевыми значениями
-        per_student = {
-            sid: {
-                STATUS_HAS_ANSWER: 0,
-                STATUS_NO_ANSWER: 0,
-            }
-            for sid in students.keys()
-        }
-
-        # Обновляем счетчики из items (активные/завершенные уроки)
-        for it in summary.get("items", []):
-            sid = it.get("student_id") if isinstance(it, dict) else it.student_id
-            st = it.get("status") if isinstance(it, dict) else it.status
-            simplified_status = simplify_status(st)
-            if simplified_status is None:
-                continue  # Пропускаем STATUS_OPTIONAL и другие
-            if sid in per_student:  # Проверяем, что студент еще в списке
-                per_student[sid][simplified_status] += 1
-        def s_key(sid):
-            info = students.get(sid, {})
-            return ((info.get("last_name") or "").lower(), (info.get("first_name") or "").lower(), sid)
-        ordered_ids = sorted(per_student.keys(), key=s_key)
+    for m, summary in summaries:
+        students = summary.students
+        per_student = summary.per_student
+        ordered_ids = summary.ordered_ids
         student_rows = []
         for sid in ordered_ids:
             info = students.get(sid, {})
@@ -8,7 +8,7 @@ SQLAlchemy модели и конфигурация базы данных для
 
 import logging
 
-from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, TIMESTAMP
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, TIMESTAMP, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
@@ -161,6 +161,14 @@ class WebhookEvent(Base):
     Обрабатывается ботом через WebhookProcessingService
     """
     __tablename__ = "webhook_events"
+    __table_args__ = (
+        # Естественный ключ события: повторы GetCourse/n8n отбрасываются ON CONFLICT DO NOTHING
+        Index(
+            "uq_webhook_events_natural_key",
+            "answer_id", text("(COALESCE(answer_status, ''))"), "event_date",
+            unique=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True)
 
@@ -184,6 +192,16 @@ class WebhookEvent(Base):
     processed_at = Column(TIMESTAMP(timezone=True), nullable=True)
     error_message = Column(Text, nullable=True)
 
+    # Аренда (lease) вебхука обработчиком: несколько реплик бота
+    # забирают разные вебхуки через FOR UPDATE SKIP LOCKED
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    # Повторные попытки с экспоненциальной задержкой и карантин (dead letter)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    dead_lettered = Column(Boolean, default=False, nullable=False)
+
     # Аудит
     created_at = Column(TIMESTAMP(timezone=True), nullable=False,
                        server_default=func.now(), index=True)
@@ -196,6 +214,15 @@ class Notification(Base):
     Отправляется через NotificationSenderService
     """
     __tablename__ = "notifications"
+    __table_args__ = (
+        # Идемпотентное создание: INSERT ... ON CONFLICT (message_hash) DO NOTHING
+        Index(
+            "uq_notifications_message_hash",
+            "message_hash",
+            unique=True,
+            postgresql_where=text("message_hash IS NOT NULL")
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True)
     mentor_id = Column(BigInteger, nullable=False, index=True)
@@ -207,7 +234,7 @@ class Notification(Base):
     webhook_event_id = Column(BigInteger, nullable=True, index=True)
 
     # Метаданные для дедупликации
-    message_hash = Column(String(64), nullable=True, index=True)
+    message_hash = Column(String(64), nullable=True)
 
     # Даты
     created_at = Column(TIMESTAMP(timezone=True), nullable=False,
@@ -217,6 +244,84 @@ class Notification(Base):
     # Telegram метаданные
     telegram_message_id = Column(String(50), nullable=True)
 
+    # Аренда при отправке несколькими экземплярами бота (status = 'sending')
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(TIMESTAMP(timezone=True), nullable=True)
+
+
+class DeadlineNotificationLedger(Base):
+    """
+    Журнал дедупликации уведомлений о дедлайнах
+    Одна запись = студент, о котором наставник уже уведомлен
+    по конкретному уроку и дедлайну
+    Заполняется DeadlineCheckService при создании уведомлений
+    """
+    __tablename__ = "deadline_notification_ledger"
+    __table_args__ = (
+        Index(
+            "uq_deadline_ledger_key",
+            "mentor_id", "lesson_id", "student_id", "deadline_date",
+            unique=True
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    mentor_id = Column(BigInteger, nullable=False)  # mentors.id
+    lesson_id = Column(String(50), nullable=False)  # lessons.lesson_id (GetCourse ID)
+    student_id = Column(BigInteger, nullable=False)  # students.student_id (GetCourse ID)
+    deadline_date = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    # Уведомление, в котором студент был упомянут
+    notification_id = Column(BigInteger, nullable=True)
+
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+
+class StudentLessonFirstAnswer(Base):
+    """
+    Самый ранний ответ студента на урок (для табеля)
+    Материализованный min(event_date) по webhook_events со статусами new/accepted
+    Обновляется WebhookProcessingService при обработке батча вебхуков
+    """
+    __tablename__ = "student_lesson_first_answers"
+
+    user_email = Column(String(255), primary_key=True)  # webhook_events.user_email
+    answer_lesson_id = Column(Integer, primary_key=True)  # GetCourse ID урока
+    first_answer_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False,
+                       server_default=func.now(), onupdate=func.now())
+
+
+class TelegramProcessedUpdate(Base):
+    """
+    Обновления Telegram, принятые одной из реплик бота (общая дедупликация webhook)
+    Записи старше UPDATE_DEDUP_TTL_HOURS удаляются UpdateDeduplicator.cleanup
+    """
+    __tablename__ = "telegram_processed_updates"
+    __table_args__ = (
+        Index("idx_telegram_processed_updates_processed_at", "processed_at"),
+    )
+
+    update_id = Column(BigInteger, primary_key=True)
+    processed_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+
+class FsmState(Base):
+    """
+    Состояния FSM aiogram (FSM_STORAGE=postgres)
+    Используется PostgresStorage; брошенные записи удаляются по FSM_STATE_TTL_HOURS
+    """
+    __tablename__ = "fsm_states"
+    __table_args__ = (
+        Index("idx_fsm_states_updated_at", "updated_at"),
+    )
+
+    chat_id = Column(BigInteger, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
 
 # ============================================
 # СЛУЖЕБНЫЕ МОДЕЛИ
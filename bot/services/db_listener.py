@@ -0,0 +1,227 @@
+"""
+Слушатель событий PostgreSQL (LISTEN/NOTIFY)
+
+Триггеры на вставку в webhook_events и notifications отправляют NOTIFY
+(см. db/migrations/004_notify_triggers.sql). Слушатель держит отдельное
+asyncpg-соединение вне пула SQLAlchemy и по уведомлению вызывает
+зарегистрированный обработчик канала (обычно - запуск задачи планировщика).
+
+- уведомления одного канала в пределах debounce секунд схлопываются в один вызов;
+- при обрыве соединения выполняется переподключение с паузой reconnect_delay;
+- раз в healthcheck_interval соединение проверяется запросом SELECT 1: полуоткрытое
+  TCP-соединение не сообщает об обрыве, и без проверки уведомления пропали бы молча;
+- интервальные задачи планировщика остаются страховкой на случай потери NOTIFY.
+
+Задачи, которые будит слушатель, оборачиваются в WakeableJob: пробуждение
+во время выполнения задачи не теряется, а вызывает повторный запуск сразу
+после текущего.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Каналы NOTIFY (должны совпадать с аргументами триггеров в schema.sql)
+CHANNEL_WEBHOOK_EVENTS = "webhook_events_inserted"
+CHANNEL_NOTIFICATIONS = "notifications_inserted"
+
+
+class WakeableJob:
+    """
+    Задача-очередь, которую можно разбудить в любой момент
+
+    APScheduler пропускает запуск уже выполняющейся задачи, поэтому
+    job.modify(next_run_time=...) во время выполнения ничего не дает.
+    Вместо этого пробуждение во время выполнения запоминается, и задача
+    запускается повторно сразу по завершении. Задача повторяется и пока
+    возвращает True (батч был полным - очередь еще не разобрана).
+    Одновременно выполняется не более одного запуска.
+    """
+
+    def __init__(self, job: Callable[[], Awaitable[Optional[bool]]]):
+        """
+        Args:
+            job: Асинхронная задача; True - нужно повторить сразу
+        """
+        self.job = job
+        self._running = False
+        self._rerun = False
+        self._tasks: Set[asyncio.Task] = set()
+        # Статистика
+        self.runs = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def run(self):
+        """Запуск задачи (для планировщика); во время выполнения - только отметка о повторе"""
+        if self._running:
+            self._rerun = True
+            return
+
+        self._running = True
+        try:
+            while True:
+                self._rerun = False
+                self.runs += 1
+                has_more = await self.job()
+                if not (has_more or self._rerun):
+                    return
+        finally:
+            self._running = False
+
+    def wake(self):
+        """Немедленный запуск задачи или повтор после текущего выполнения"""
+        if self._running:
+            self._rerun = True
+            return
+
+        task = asyncio.get_running_loop().create_task(self.run())
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка задачи, запущенной по событию БД: {task.exception()}")
+
+
+class DbEventListener:
+    """Слушатель NOTIFY на выделенном соединении с debounce и переподключением"""
+
+    def __init__(self, config):
+        self.config = config
+        self.debounce = config.db_notify_debounce_seconds
+        self.reconnect_delay = config.db_notify_reconnect_seconds
+        self.healthcheck_interval = config.db_notify_healthcheck_seconds
+        # asyncpg принимает DSN без указания драйвера SQLAlchemy
+        self.dsn = config.db_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self._callbacks: Dict[str, Callable[[], None]] = {}
+        self._pending: Dict[str, asyncio.TimerHandle] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._connection: Optional[asyncpg.Connection] = None
+        self._stopping = False
+
+    def register(self, channel: str, callback: Callable[[], None]):
+        """
+        Регистрация обработчика канала
+
+        Args:
+            channel: Имя канала NOTIFY
+            callback: Синхронный обработчик без аргументов
+        """
+        self._callbacks[channel] = callback
+
+    def start(self):
+        """Запуск фоновой задачи прослушивания"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка прослушивания и закрытие соединения"""
+        self._stopping = True
+
+        for handle in self._pending.values():
+            handle.cancel()
+        self._pending.clear()
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self._close_connection()
+
+    async def _close_connection(self):
+        if self._connection is not None:
+            try:
+                await self._connection.close(timeout=5)
+            except Exception:
+                pass
+            self._connection = None
+
+    async def _run(self):
+        """Цикл подключения: LISTEN на всех каналах и ожидание обрыва соединения"""
+        while not self._stopping:
+            try:
+                self._connection = await asyncpg.connect(
+                    self.dsn,
+                    server_settings=self.config.db_connect_args.get("server_settings"),
+                    timeout=self.config.db_connect_timeout
+                )
+
+                lost = asyncio.get_running_loop().create_future()
+                self._connection.add_termination_listener(
+                    lambda _conn: lost.done() or lost.set_result(None)
+                )
+
+                for channel in self._callbacks:
+                    await self._connection.add_listener(channel, self._on_notify)
+
+                logger.info(f"Подписка на события БД: {', '.join(self._callbacks)}")
+
+                # Пока соединение было разорвано, могли появиться записи - будим все задачи
+                for channel in self._callbacks:
+                    self._schedule(channel)
+
+                await self._watch(lost)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка слушателя событий БД: {e}")
+
+            await self._close_connection()
+
+            if not self._stopping:
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def _watch(self, lost: asyncio.Future):
+        """Ожидание обрыва соединения с периодической проверкой SELECT 1"""
+        while True:
+            done, _ = await asyncio.wait({lost}, timeout=self.healthcheck_interval)
+            if done:
+                logger.warning("Соединение слушателя событий БД закрыто")
+                return
+
+            try:
+                await self._connection.fetchval("SELECT 1", timeout=self.healthcheck_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Соединение слушателя событий БД не отвечает, переподключение: {e}")
+                # Вежливое закрытие зависшего соединения тоже зависнет
+                self._connection.terminate()
+                return
+
+    def _on_notify(self, connection, pid, channel, payload):
+        """Обработчик NOTIFY от asyncpg"""
+        self._schedule(channel)
+
+    def _schedule(self, channel: str):
+        """Отложенный вызов обработчика канала (повторные уведомления схлопываются)"""
+        if channel in self._pending:
+            return
+
+        loop = asyncio.get_running_loop()
+        self._pending[channel] = loop.call_later(self.debounce, self._fire, channel)
+
+    def _fire(self, channel: str):
+        self._pending.pop(channel, None)
+        callback = self._callbacks.get(channel)
+        if callback is None:
+            return
+
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Ошибка обработчика события БД {channel}: {e}", exc_info=True)
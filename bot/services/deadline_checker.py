@@ -16,9 +16,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.services.database import (
     get_session, Lesson, Training, Student, Mapping,
-    WebhookEvent, Notification, Mentor
+    WebhookEvent, Mentor
 )
 from bot.services.notification_calculator import NotificationCalculationService
+from bot.services.reference_cache import find_actual_in
 
 logger = logging.getLogger(__name__)
 
@@ -64,6 +65,17 @@ class DeadlineCheckService:
                 logger.info(f"Найдено {len(approaching_lessons)} уроков с приближающимися дедлайнами")
 
                 notifications_created = 0
+                # (уведомление, урок, студенты) для записи в журнал дедупликации
+                created_notifications = []
+
+                # Bulk-режим: студенты без ответов по всем урокам сразу,
+                # сгруппированные по наставникам, за фиксированное число запросов
+                mentor_groups_by_lesson = None
+                if self.config.deadline_bulk_enabled:
+                    mentor_groups_by_lesson = await self.get_mentor_groups_bulk(
+                        session,
+                        approaching_lessons
+                    )
 
                 # 3. Обработать каждый урок
                 for lesson in approaching_lessons:
@@ -76,34 +88,47 @@ class DeadlineCheckService:
                     #     f"deadline МСК={lesson_deadline_moscow}"
                     # )
                     try:
-                        # Получить студентов без ответов
-                        students_without_answers = await self.get_students_without_answers(
-                            session,
-                            lesson.lesson_id
-                        )
+                        if mentor_groups_by_lesson is not None:
+                            mentor_groups = mentor_groups_by_lesson.get(lesson.lesson_id, {})
+                            if not mentor_groups:
+                                continue
+                        else:
+                            # Получить студентов без ответов
+                            students_without_answers = await self.get_students_without_answers(
+                                session,
+                                lesson.lesson_id
+                            )
 
-                        # убрать\закомментировать логирование после тестирования
-                        # logger.info(
-                        #     f"[DEBUG] Урок {lesson.lesson_id}: найдено студентов без ответов: {len(students_without_answers)}"
-                        # )
-
-                        if not students_without_answers:
                             # убрать\закомментировать логирование после тестирования
-                            # logger.info(f"[DEBUG] Урок {lesson.lesson_id}: нет студентов без ответов, пропускаем")
-                            continue
+                            # logger.info(
+                            #     f"[DEBUG] Урок {lesson.lesson_id}: найдено студентов без ответов: {len(students_without_answers)}"
+                            # )
 
-                        # Сгруппировать студентов по наставникам
-                        mentor_groups = await self.group_students_by_mentor(
-                            session,
-                            students_without_answers,
-                            lesson.training_id
-                        )
+                            if not students_without_answers:
+                                # убрать\закомментировать логирование после тестирования
+                                # logger.info(f"[DEBUG] Урок {lesson.lesson_id}: нет студентов без ответов, пропускаем")
+                                continue
+
+                            # Сгруппировать студентов по наставникам
+                            mentor_groups = await self.group_students_by_mentor(
+                                session,
+                                students_without_answers,
+                                lesson.training_id
+                            )
 
                         # убрать\закомментировать логирование после тестирования
                         # logger.info(
                         #     f"[DEBUG] Урок {lesson.lesson_id}: студентов сгруппировано по {len(mentor_groups)} менторам"
                         # )
 
+                        # Студенты, о которых уже уведомляли по этому уроку и дедлайну
+                        # (один запрос к журналу дедупликации на урок)
+                        already_notified = await self.notification_calculator.get_notified_deadline_students(
+                            session,
+                            lesson_id=lesson.lesson_id,
+                            deadline_date=lesson.deadline_date
+                        )
+
                         # Создать уведомления для каждого ментора
                         for mentor_id, students in mentor_groups.items():
                             # убрать\закомментировать логирование после тестирования
@@ -114,14 +139,7 @@ class DeadlineCheckService:
                             # Проверить дубликаты для каждого студента
                             filtered_students = []
                             for student in students:
-                                is_duplicate = await self.notification_calculator.check_duplicate_notification(
-                                    session,
-                                    mentor_id=mentor_id,
-                                    notification_type='deadlineApproaching',
-                                    lesson_title=lesson.lesson_title,
-                                    student_name=f"{student['first_name']} {student['last_name']}",
-                                    deadline_date=lesson.deadline_date
-                                )
+                                is_duplicate = (mentor_id, student['student_id']) in already_notified
 
                                 if not is_duplicate:
                                     filtered_students.append(student)
@@ -140,16 +158,27 @@ class DeadlineCheckService:
                                     students=filtered_students
                                 )
 
-                                notification = Notification(
-                                    mentor_id=mentor_id,
-                                    type='deadlineApproaching',
-                                    message=message,
-                                    status='pending',
-                                    created_at=now_utc
-                                )
+                                # Сигнатура: урок, дедлайн и состав студентов
+                                student_ids = sorted(str(student['student_id']) for student in filtered_students)
+                                message_hash = self.notification_calculator.calculate_message_signature({
+                                    'mentor_id': mentor_id,
+                                    'type': 'deadlineApproaching',
+                                    'lesson_id': lesson.lesson_id,
+                                    'training_id': lesson.training_id,
+                                    'event_key': f"{lesson.deadline_date.isoformat()}|{','.join(student_ids)}",
+                                })
+
+                                notification_row = {
+                                    'mentor_id': mentor_id,
+                                    'type': 'deadlineApproaching',
+                                    'message': message,
+                                    'status': 'pending',
+                                    'message_hash': message_hash,
+                                    'created_at': now_utc,
+                                }
 
-                                session.add(notification)
                                 notifications_created += 1
+                                created_notifications.append((notification_row, lesson, filtered_students))
 
                                 logger.info(
                                     f"Создано уведомление о дедлайне для ментора {mentor_id}, "
@@ -160,6 +189,32 @@ class DeadlineCheckService:
                         logger.error(f"Ошибка обработки урока {lesson.lesson_id}: {e}", exc_info=True)
                         continue
 
+                # Вставляем уведомления одним multi-row INSERT и записываем студентов
+                # в журнал дедупликации (нужны id уведомлений)
+                if created_notifications:
+                    notification_ids = await self.notification_calculator.insert_notifications(
+                        session,
+                        [notification_row for notification_row, _, _ in created_notifications]
+                    )
+                    ledger_entries = [
+                        {
+                            'mentor_id': notification_row['mentor_id'],
+                            'lesson_id': lesson.lesson_id,
+                            'student_id': student['student_id'],
+                            'deadline_date': lesson.deadline_date,
+                            'notification_id': notification_id,
+                        }
+                        for (notification_row, lesson, students), notification_id
+                        in zip(created_notifications, notification_ids)
+                        # None - такое уведомление уже было создано ранее
+                        if notification_id is not None
+                        for student in students
+                    ]
+                    await self.notification_calculator.record_deadline_notifications(
+                        session,
+                        ledger_entries
+                    )
+
                 # Коммитим все уведомления
                 await session.commit()
 
@@ -496,3 +551,139 @@ class DeadlineCheckService:
         except Exception as e:
             logger.error(f"Ошибка при группировке студентов: {e}", exc_info=True)
             return {}
+
+    async def get_mentor_groups_bulk(
+        self,
+        session: AsyncSession,
+        lessons: List[Lesson]
+    ) -> Dict[str, Dict[int, List[Dict]]]:
+        """
+        Bulk-вариант связки get_students_without_answers + group_students_by_mentor
+        сразу для всех уроков
+
+        Выполняет фиксированное число запросов (ответы, тренинги, mapping,
+        студенты, наставники) независимо от количества уроков и студентов.
+        Результат для каждого урока совпадает с mentor_groups из
+        построчного варианта.
+
+        Args:
+            session: Сессия БД
+            lessons: Уроки с приближающимися дедлайнами
+
+        Returns:
+            Словарь {lesson_id (GetCourse): {mentor_id: [список студентов с данными]}}
+        """
+        try:
+            # GetCourse ID уроков и тренингов в числовом виде
+            # (webhook_events.answer_lesson_id и mapping.training_id - Integer)
+            lesson_training = {}
+            for lesson in lessons:
+                try:
+                    lesson_training[lesson.lesson_id] = (
+                        int(lesson.lesson_id),
+                        int(lesson.training_id)
+                    )
+                except (ValueError, TypeError):
+                    logger.error(
+                        f"Не удалось преобразовать lesson_id '{lesson.lesson_id}' или "
+                        f"training_id '{lesson.training_id}' в int"
+                    )
+
+            if not lesson_training:
+                return {}
+
+            lesson_ids_int = {lid for lid, _ in lesson_training.values()}
+            training_ids_int = {tid for _, tid in lesson_training.values()}
+
+            # 1. Студенты, ответившие на уроки (new/accepted)
+            answers_result = await session.execute(
+                select(WebhookEvent.answer_lesson_id, WebhookEvent.user_id).where(
+                    and_(
+                        WebhookEvent.answer_lesson_id.in_(lesson_ids_int),
+                        WebhookEvent.answer_status.in_(['new', 'accepted'])
+                    )
+                ).distinct()
+            )
+            answered = defaultdict(set)
+            for lesson_id_int, user_id in answers_result.all():
+                answered[lesson_id_int].add(user_id)
+
+            # Справочники (шаги 2-5) читаются через кэш, если он включен
+
+            # 2. Актуальные тренинги (Training.training_id - строка)
+            trainings = await find_actual_in(
+                session, Training, 'training_id', [str(tid) for tid in training_ids_int]
+            )
+            active_trainings = {training.training_id for training in trainings}
+
+            # 3. Mapping по всем тренингам
+            mappings = await find_actual_in(session, Mapping, 'training_id', training_ids_int)
+
+            mappings_by_training = defaultdict(list)
+            # Первый mapping для пары (студент, тренинг) - как .first() в построчном варианте
+            mapping_by_student_training = {}
+            for mapping in mappings:
+                mappings_by_training[mapping.training_id].append(mapping)
+                mapping_by_student_training.setdefault(
+                    (mapping.student_id, mapping.training_id),
+                    mapping
+                )
+
+            # 4. Студенты по GetCourse ID
+            students_by_gc_id = {}
+            for student in await find_actual_in(
+                session, Student, 'student_id', {m.student_id for m in mappings}
+            ):
+                students_by_gc_id.setdefault(student.student_id, student)
+
+            # 5. Наставники по GetCourse mentor_id
+            mentors_by_gc_id = {}
+            for mentor in await find_actual_in(
+                session, Mentor, 'mentor_id', {m.mentor_id for m in mappings}
+            ):
+                mentors_by_gc_id.setdefault(mentor.mentor_id, mentor)
+
+            # Сборка результата в памяти
+            result = {}
+            for lesson in lessons:
+                if lesson.lesson_id not in lesson_training:
+                    continue
+                lesson_id_int, training_id_int = lesson_training[lesson.lesson_id]
+
+                if str(training_id_int) not in active_trainings:
+                    continue
+
+                students_with_answers = answered.get(lesson_id_int, set())
+                mentor_groups = defaultdict(list)
+
+                for mapping in mappings_by_training.get(training_id_int, []):
+                    student = students_by_gc_id.get(mapping.student_id)
+                    if not student or student.student_id in students_with_answers:
+                        continue
+
+                    student_mapping = mapping_by_student_training.get(
+                        (student.student_id, training_id_int)
+                    )
+                    if not student_mapping:
+                        continue
+
+                    mentor = mentors_by_gc_id.get(student_mapping.mentor_id)
+                    if not mentor:
+                        continue
+
+                    mentor_groups[mentor.id].append({
+                        'id': student.id,
+                        'student_id': student.student_id,
+                        'email': student.user_email,
+                        'first_name': student.first_name or '',
+                        'last_name': student.last_name or ''
+                    })
+
+                if mentor_groups:
+                    result[lesson.lesson_id] = dict(mentor_groups)
+
+            return result
+
+        except Exception as e:
+            logger.error(f"Ошибка при bulk-группировке студентов по урокам: {e}", exc_info=True)
+            return {}
@@ -0,0 +1,177 @@
+"""
+Хранилище состояний FSM aiogram в PostgreSQL
+
+Состояние и данные диалога хранятся в таблице fsm_states (ключ - чат и
+пользователь), поэтому регистрация переживает перезапуск бота и видна
+всем репликам. Запись - UPSERT по ключу, обновление данных - слияние JSONB
+на стороне БД. Пустые записи удаляются, брошенные (без изменений дольше
+FSM_STATE_TTL_HOURS) - задачей планировщика.
+
+Прочитанные состояния кэшируются в процессе на FSM_CACHE_TTL_SECONDS
+(AuthMiddleware проверяет состояние на каждом сообщении). Кэшируются только
+найденные записи: отсутствие записи всегда проверяется в БД, иначе реплика
+отдавала бы "нет состояния" пользователю, которому другая реплика только что
+его назначила. Записи этой реплики сразу обновляют кэш; изменения и удаления,
+сделанные другой репликой, становятся видны не позже чем через
+FSM_CACHE_TTL_SECONDS.
+"""
+
+import copy
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import pytz
+from aiogram.dispatcher.storage import BaseStorage
+from sqlalchemy import and_, delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.sql import func
+
+from bot.services import database
+from bot.services.database import FsmState
+from bot.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+Address = Union[str, int, None]
+
+
+class PostgresStorage(BaseStorage):
+    """Хранилище FSM в таблице fsm_states с кэшем чтения в процессе"""
+
+    def __init__(self, config):
+        self.config = config
+        self.state_ttl_hours = config.fsm_state_ttl_hours
+        self.cache_ttl = config.fsm_cache_ttl_seconds
+        self._cache = TTLCache(max_size=config.fsm_cache_max_size)
+
+    def _key(self, chat: Address, user: Address) -> Tuple[int, int]:
+        chat, user = self.check_address(chat=chat, user=user)
+        return int(chat), int(user)
+
+    def _where(self, key: Tuple[int, int]):
+        return and_(FsmState.chat_id == key[0], FsmState.user_id == key[1])
+
+    def _remember(self, key: Tuple[int, int], state: Optional[str], data: Dict):
+        """Кэширование записи; пустая (нет записи в БД) убирается из кэша"""
+        if self.cache_ttl <= 0:
+            return
+        if state is None and not data:
+            self._cache.delete(key)
+        else:
+            self._cache.set(key, (state, copy.deepcopy(data)), self.cache_ttl)
+
+    async def _load(self, key: Tuple[int, int]) -> Tuple[Optional[str], Dict]:
+        """Состояние и данные из кэша или из БД"""
+        if self.cache_ttl > 0:
+            found, value = self._cache.get(key)
+            if found:
+                return value
+
+        async with database.async_session() as session:
+            row = (await session.execute(
+                select(FsmState.state, FsmState.data).where(self._where(key))
+            )).first()
+
+        state, data = (row.state, row.data or {}) if row else (None, {})
+        self._remember(key, state, data)
+        return state, data
+
+    async def _upsert(self, key: Tuple[int, int], state: Optional[str], data: Dict,
+                      update: Callable[[Any], Dict]):
+        """
+        UPSERT записи; запись без состояния и данных удаляется
+
+        Args:
+            key: (chat_id, user_id)
+            state: Состояние для новой записи
+            data: Данные для новой записи
+            update: Построитель SET для существующей записи по excluded
+        """
+        statement = pg_insert(FsmState).values(chat_id=key[0], user_id=key[1], state=state, data=data)
+        statement = statement.on_conflict_do_update(
+            index_elements=[FsmState.chat_id, FsmState.user_id],
+            set_={**update(statement.excluded), 'updated_at': func.now()}
+        ).returning(FsmState.state, FsmState.data)
+
+        async with database.async_session() as session:
+            state, data = (await session.execute(statement)).one()
+            if state is None and not data:
+                await session.execute(delete(FsmState).where(self._where(key)))
+            await session.commit()
+
+        self._remember(key, state, data or {})
+
+    async def get_state(self, *, chat: Address = None, user: Address = None,
+                        default: Optional[str] = None) -> Optional[str]:
+        state, _ = await self._load(self._key(chat, user))
+        return state if state is not None else self.resolve_state(default)
+
+    async def get_data(self, *, chat: Address = None, user: Address = None,
+                       default: Optional[Dict] = None) -> Dict:
+        _, data = await self._load(self._key(chat, user))
+        return copy.deepcopy(data) if data else copy.deepcopy(default or {})
+
+    async def set_state(self, *, chat: Address = None, user: Address = None,
+                        state: Optional[str] = None):
+        await self._upsert(
+            self._key(chat, user), self.resolve_state(state), {},
+            lambda excluded: {'state': excluded['state']}
+        )
+
+    async def set_data(self, *, chat: Address = None, user: Address = None,
+                       data: Dict = None):
+        await self._upsert(
+            self._key(chat, user), None, copy.deepcopy(data or {}),
+            lambda excluded: {'data': excluded['data']}
+        )
+
+    async def update_data(self, *, chat: Address = None, user: Address = None,
+                          data: Dict = None, **kwargs):
+        # Слияние JSONB в БД: параллельные update_data не затирают ключи друг друга
+        await self._upsert(
+            self._key(chat, user), None, dict(data or {}, **kwargs),
+            lambda excluded: {'data': FsmState.data.op('||')(excluded['data'])}
+        )
+
+    async def reset_state(self, *, chat: Address = None, user: Address = None,
+                          with_data: Optional[bool] = True):
+        key = self._key(chat, user)
+        if not with_data:
+            await self._upsert(key, None, {}, lambda excluded: {'state': None})
+            return
+
+        async with database.async_session() as session:
+            await session.execute(delete(FsmState).where(self._where(key)))
+            await session.commit()
+        self._remember(key, None, {})
+
+    async def cleanup(self) -> int:
+        """
+        Удаление брошенных состояний (без изменений дольше state_ttl_hours)
+
+        Returns:
+            Количество удаленных записей
+        """
+        cutoff = datetime.now(pytz.UTC) - timedelta(hours=self.state_ttl_hours)
+        try:
+            async with database.async_session() as session:
+                result = await session.execute(
+                    delete(FsmState).where(FsmState.updated_at < cutoff)
+                )
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Ошибка очистки fsm_states: {e}")
+            return 0
+
+        if result.rowcount:
+            # Удаленные записи могли остаться в кэше
+            self._cache.clear()
+            logger.info(f"Удалено брошенных состояний FSM: {result.rowcount}")
+        return result.rowcount
+
+    async def close(self):
+        self._cache.clear()
+
+    async def wait_closed(self):
+        pass
@@ -7,7 +7,7 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Iterable, Set
 
 import pytz
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.services.database import (
@@ -16,8 +16,10 @@ from bot.services.database import (
     Mapping,
     Training,
     Lesson,
-    WebhookEvent,
+    StudentLessonFirstAnswer,
 )
+from bot.services.reference_cache import find_actual_first, find_actual_in
+from bot.utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -161,19 +163,10 @@ async def _fetch_students_for_mentor(session: AsyncSession, mentor_id: int) -> D
     Returns:
         Словарь {внутренний Student.id: Student}
     """
-    # Текущее время для проверки актуальности записей
-    now_utc = datetime.now(pytz.UTC)
+    # Справочники читаются через кэш (если включен) с проверкой актуальности записей
 
     # Находим ментора по внутреннему ID, чтобы получить GetCourse ID
-    mentor_query = select(Mentor).where(
-        and_(
-            Mentor.id == mentor_id,
-            Mentor.valid_from <= now_utc,
-            Mentor.valid_to >= now_utc
-        )
-    )
-    mentor_result = await session.execute(mentor_query)
-    mentor = mentor_result.scalars().first()
+    mentor = await find_actual_first(session, Mentor, id=mentor_id)
 
     if not mentor:
         # убрать\закомментировать логирование после тестирования
@@ -185,16 +178,8 @@ async def _fetch_students_for_mentor(session: AsyncSession, mentor_id: int) -> D
 
     # ВАЖНО: Mapping.mentor_id хранит GetCourse ID ментора (Mentor.mentor_id), а не внутренний Mentor.id
     # Mapping.student_id хранит GetCourse ID студента (Student.student_id), а не внутренний Student.id
-    mapping_rows = await session.execute(
-        select(Mapping.student_id).where(
-            and_(
-                Mapping.mentor_id == mentor.mentor_id,  # GetCourse ID ментора
-                Mapping.valid_from <= now_utc,
-                Mapping.valid_to >= now_utc
-            )
-        )
-    )
-    student_getcourse_ids = [row[0] for row in mapping_rows.fetchall()]
+    mappings = await find_actual_in(session, Mapping, 'mentor_id', [mentor.mentor_id])  # GetCourse ID ментора
+    student_getcourse_ids = [m.student_id for m in mappings]
 
     # убрать\закомментировать логирование после тестирования
     # logger.debug(f"[DEBUG] _fetch_students_for_mentor: найдено mappings с GetCourse ID студентов: {student_getcourse_ids}")
@@ -203,16 +188,7 @@ async def _fetch_students_for_mentor(session: AsyncSession, mentor_id: int) -> D
         return {}
 
     # Ищем студентов по GetCourse ID (Student.student_id), а не по внутреннему Student.id
-    students_res = await session.execute(
-        select(Student).where(
-            and_(
-                Student.student_id.in_(student_getcourse_ids),
-                Student.valid_from <= now_utc,
-                Student.valid_to >= now_utc
-            )
-        )
-    )
-    students: List[Student] = students_res.scalars().all()
+    students: List[Student] = await find_actual_in(session, Student, 'student_id', student_getcourse_ids)
 
     # убрать\закомментировать логирование после тестирования
     # logger.debug(f"[DEBUG] _fetch_students_for_mentor: найдено студентов: {len(students)}")
@@ -233,19 +209,10 @@ async def _fetch_trainings_for_mentor(session: AsyncSession, mentor_id: int) ->
     Returns:
         Множество GetCourse ID тренингов (Training.training_id как String)
     """
-    # Текущее время для проверки актуальности записей
-    now_utc = datetime.now(pytz.UTC)
+    # Справочники читаются через кэш (если включен) с проверкой актуальности записей
 
     # Находим ментора по внутреннему ID, чтобы получить GetCourse ID
-    mentor_query = select(Mentor).where(
-        and_(
-            Mentor.id == mentor_id,
-            Mentor.valid_from <= now_utc,
-            Mentor.valid_to >= now_utc
-        )
-    )
-    mentor_result = await session.execute(mentor_query)
-    mentor = mentor_result.scalars().first()
+    mentor = await find_actual_first(session, Mentor, id=mentor_id)
 
     if not mentor:
         # убрать\закомментировать логирование после тестирования
@@ -257,16 +224,8 @@ async def _fetch_trainings_for_mentor(session: AsyncSession, mentor_id: int) ->
 
     # ВАЖНО: Mapping.mentor_id хранит GetCourse ID ментора (Mentor.mentor_id)
     # Mapping.training_id хранит GetCourse ID тренинга (BigInteger, но Training.training_id - String)
-    mapping_rows = await session.execute(
-        select(Mapping.training_id).where(
-            and_(
-                Mapping.mentor_id == mentor.mentor_id,  # GetCourse ID ментора
-                Mapping.valid_from <= now_utc,
-                Mapping.valid_to >= now_utc
-            )
-        )
-    )
-    training_getcourse_ids = {str(row[0]) for row in mapping_rows.fetchall()}  # Преобразуем в String для Training.training_id
+    mappings = await find_actual_in(session, Mapping, 'mentor_id', [mentor.mentor_id])  # GetCourse ID ментора
+    training_getcourse_ids = {str(m.training_id) for m in mappings}  # Преобразуем в String для Training.training_id
 
     # убрать\закомментировать логирование после тестирования
     # logger.debug(f"[DEBUG] _fetch_trainings_for_mentor: найдено GetCourse ID тренингов: {training_getcourse_ids}")
@@ -288,25 +247,14 @@ async def _fetch_lessons_for_trainings(session: AsyncSession, training_ids: Iter
     if not training_ids:
         return []
 
-    # Текущее время для проверки актуальности записей
-    now_utc = datetime.now(pytz.UTC)
-
     training_ids_list = list(set(training_ids))
 
     # убрать\закомментировать логирование после тестирования
     # logger.debug(f"[DEBUG] _fetch_lessons_for_trainings: поиск уроков для тренингов с GetCourse ID: {training_ids_list}")
 
     # ВАЖНО: Lesson.training_id имеет тип String и хранит GetCourse ID тренинга (Training.training_id)
-    result = await session.execute(
-        select(Lesson).where(
-            and_(
-                Lesson.training_id.in_(training_ids_list),
-                Lesson.valid_from <= now_utc,
-                Lesson.valid_to >= now_utc
-            )
-        )
-    )
-    lessons = result.scalars().all()
+    # Читаем через кэш справочников (если включен)
+    lessons = await find_actual_in(session, Lesson, 'training_id', training_ids_list)
 
     # убрать\закомментировать логирование после тестирования
     # logger.debug(f"[DEBUG] _fetch_lessons_for_trainings: найдено уроков: {len(lessons)}")
@@ -433,7 +381,8 @@ async def _fetch_logs_earliest_by_student_lesson(
     """
     Возвращает (student_id, lesson_getcourse_id) -> earliest_answer_date по email студента и GetCourse ID урока.
 
-    ВАЖНО: Использует таблицу WebhookEvent (не DEPRECATED Log).
+    ВАЖНО: Читает материализованную таблицу student_lesson_first_answers
+    (min(event_date) по WebhookEvent со статусами new/accepted), а не агрегирует сырые события.
     ВАЖНО: lesson_getcourse_ids - это GetCourse ID уроков (Integer), а не внутренние Lesson.id.
     ВАЖНО: Возвращает ключи с GetCourse ID урока для сопоставления с Lesson.lesson_id.
 
@@ -446,7 +395,7 @@ async def _fetch_logs_earliest_by_student_lesson(
         Словарь {(внутренний Student.id, GetCourse ID урока): earliest_answer_date}
     """
     emails = list({e for e in student_id_to_email.values() if e})
-    lesson_ids_list = [int(lid) for lid in lesson_getcourse_ids]  # Преобразуем в int для WebhookEvent.answer_lesson_id
+    lesson_ids_list = [int(lid) for lid in lesson_getcourse_ids]  # Преобразуем в int для answer_lesson_id
 
     # убрать\закомментировать логирование после тестирования
     # logger.debug(f"[DEBUG] _fetch_logs_earliest_by_student_lesson: emails={emails}, lesson_getcourse_ids={lesson_ids_list}")
@@ -456,19 +405,20 @@ async def _fetch_logs_earliest_by_student_lesson(
         # logger.debug(f"[DEBUG] _fetch_logs_earliest_by_student_lesson: пустые emails или lesson_ids, возвращаем пустой словарь")
         return {}
 
-    # ВАЖНО: Используем WebhookEvent вместо DEPRECATED Log
-    # WebhookEvent.answer_lesson_id хранит GetCourse ID урока (Integer)
-    # Фильтруем по статусам 'new' и 'accepted' (как в deadline_checker и reminder_service)
+    # Таблица поддерживается WebhookProcessingService (статусы 'new' и 'accepted',
+    # как в deadline_checker и reminder_service); answer_lesson_id - GetCourse ID урока (Integer)
     res = await session.execute(
-        select(WebhookEvent.user_email, WebhookEvent.answer_lesson_id, func.min(WebhookEvent.event_date))
+        select(
+            StudentLessonFirstAnswer.user_email,
+            StudentLessonFirstAnswer.answer_lesson_id,
+            StudentLessonFirstAnswer.first_answer_at
+        )
         .where(
             and_(
-                WebhookEvent.user_email.in_(emails),
-                WebhookEvent.answer_lesson_id.in_(lesson_ids_list),
-                WebhookEvent.answer_status.in_(['new', 'accepted'])  # Только актуальные ответы
+                StudentLessonFirstAnswer.user_email.in_(emails),
+                StudentLessonFirstAnswer.answer_lesson_id.in_(lesson_ids_list)
             )
         )
-        .group_by(WebhookEvent.user_email, WebhookEvent.answer_lesson_id)
     )
 
     email_to_student = {email: sid for sid, email in student_id_to_email.items() if email}
@@ -532,9 +482,6 @@ async def build_mentor_overview(
     Returns:
         Словарь с агрегированными данными
     """
-    # Текущее время для проверки актуальности записей
-    now_utc = datetime.now(pytz.UTC)
-
     # убрать\закомментировать логирование после тестирования
     # logger.debug(f"[DEBUG] build_mentor_overview: mentor_id (внутренний)={mentor_id}, training_id={training_id}, lesson_id={lesson_id}")
 
@@ -576,42 +523,77 @@ async def build_mentor_overview(
 
     earliest = await _fetch_logs_earliest_by_student_lesson(session, student_id_to_email, lesson_getcourse_ids)
 
+    return _compute_overview(students, lessons, earliest, training_id, lesson_id, status_filter, include_not_started)
+
+
+def _compute_overview(
+    students: Dict[int, Student],
+    lessons: List[Lesson],
+    earliest: Dict[Tuple[int, int], datetime],
+    training_id: Optional[int],
+    lesson_id: Optional[int],
+    status_filter: Optional[str],
+    include_not_started: bool,
+) -> Dict[str, object]:
+    """
+    Считает сводку наставника по уже загруженным данным (без запросов к БД).
+
+    Общая часть build_mentor_overview и build_admin_overview.
+
+    Args:
+        students: Студенты наставника {внутренний Student.id: Student}
+        lessons: Уроки тренингов наставника (уже отфильтрованные по lesson_id)
+        earliest: {(внутренний Student.id, GetCourse ID урока): дата первого ответа}
+        training_id: Внутренний ID тренинга (Training.id) - для applied_filters
+        lesson_id: Внутренний ID урока (Lesson.id) - опционально
+        status_filter: Фильтр по статусу (один из STATUS_*) - опционально
+        include_not_started: Включать ли уроки в состоянии not_started
+
+    Returns:
+        Словарь с агрегированными данными (формат build_mentor_overview)
+    """
     # ВАЖНО: Используем UTC timezone-aware datetime для корректного сравнения с данными из БД
     now_utc = datetime.now(pytz.UTC)
 
     # убрать\закомментировать логирование после тестирования
     # logger.debug(f"[DEBUG] build_mentor_overview: текущее время UTC={now_utc}")
 
+    # Дедлайн, GetCourse ID и состояние урока не зависят от студента - считаем один раз на урок
+    lesson_rows: List[Tuple[Lesson, Optional[datetime], int]] = []
+    for lesson in lessons:
+        deadline = _resolve_deadline(lesson)
+        # ВАЖНО: Используем GetCourse ID урока для поиска в словаре earliest
+        # Безопасное преобразование с обработкой ошибок для нечисловых lesson_id
+        lesson_getcourse_id = _safe_int_lesson_id(lesson.lesson_id)
+        if lesson_getcourse_id is None:
+            logger.warning(f"Пропущен урок с некорректным lesson_id '{lesson.lesson_id}' (id={lesson.id})")
+            continue
+
+        # Исключаем уроки в состоянии not_started, если не требуется включать
+        # ВАЖНО: Передаем UTC datetime для корректного определения состояния
+        lesson_state = get_lesson_state(lesson, now_utc)
+
+        # убрать\закомментировать логирование после тестирования
+        # logger.debug(f"[DEBUG] build_mentor_overview: урок {lesson.lesson_id} (id={lesson.id}): состояние={lesson_state}, "
+        #             f"deadline={deadline}")
+
+        if not include_not_started and lesson_state == "not_started":
+            # убрать\закомментировать логирование после тестирования
+            # logger.debug(f"[DEBUG] build_mentor_overview: пропущен урок {lesson.lesson_id} (not_started)")
+            continue
+
+        lesson_rows.append((lesson, deadline, lesson_getcourse_id))
+
     items: List[LessonStatus] = []
     lessons_filtered: List[Lesson] = []
     for sid in students.keys():
-        for lesson in lessons:
-            deadline = _resolve_deadline(lesson)
-            # ВАЖНО: Используем GetCourse ID урока для поиска в словаре earliest
-            # Безопасное преобразование с обработкой ошибок для нечисловых lesson_id
-            lesson_getcourse_id = _safe_int_lesson_id(lesson.lesson_id)
-            if lesson_getcourse_id is None:
-                logger.warning(f"Пропущен урок с некорректным lesson_id '{lesson.lesson_id}' (id={lesson.id})")
-                continue
+        for lesson, deadline, lesson_getcourse_id in lesson_rows:
             answer_date = earliest.get((sid, lesson_getcourse_id))
 
             # убрать\закомментировать логирование после тестирования
             # if answer_date:
             #     logger.debug(f"[DEBUG] build_mentor_overview: студент {sid}, урок {lesson.lesson_id} (id={lesson.id}): найден ответ {answer_date}")
 
-            # Исключаем уроки в состоянии not_started, если не требуется включать
-            # ВАЖНО: Передаем UTC datetime для корректного определения состояния
-            lesson_state = get_lesson_state(lesson, now_utc)
-
-            # убрать\закомментировать логирование после тестирования
-            # logger.debug(f"[DEBUG] build_mentor_overview: студент {sid}, урок {lesson.lesson_id} (id={lesson.id}): состояние={lesson_state}, "
-            #             f"deadline={deadline}, answer_date={answer_date}")
-
-            if not include_not_started and lesson_state == "not_started":
-                # убрать\закомментировать логирование после тестирования
-                # logger.debug(f"[DEBUG] build_mentor_overview: пропущен урок {lesson.lesson_id} (not_started)")
-                continue
-
             # ВАЖНО: Передаем UTC datetime для корректного сравнения с дедлайнами из БД
             status = categorize_status(deadline, answer_date, now_utc)
 
@@ -657,6 +639,151 @@ async def build_mentor_overview(
     }
 
 
+async def _fetch_admin_dataset(session: AsyncSession):
+    """
+    Загружает данные табеля сразу для всех наставников фиксированным числом запросов.
+
+    Returns:
+        (наставники, mapping, студенты {GetCourse ID: Student}, уроки,
+         {(email, GetCourse ID урока): дата первого ответа})
+    """
+    # Текущее время для проверки актуальности записей
+    now_utc = datetime.now(pytz.UTC)
+
+    # 1. Все актуальные наставники
+    mentors_res = await session.execute(
+        select(Mentor).where(
+            and_(
+                Mentor.valid_from <= now_utc,
+                Mentor.valid_to >= now_utc
+            )
+        ).order_by(Mentor.id)
+    )
+    mentors: List[Mentor] = mentors_res.scalars().all()
+    if not mentors:
+        return [], [], {}, [], {}
+
+    # 2. Все актуальные mapping этих наставников (GetCourse ID ментора/студента/тренинга)
+    mappings: List[Mapping] = await find_actual_in(session, Mapping, 'mentor_id', [m.mentor_id for m in mentors])
+
+    # 3. Студенты по GetCourse ID
+    students_by_gc_id: Dict[int, Student] = {}
+    for st in await find_actual_in(session, Student, 'student_id', {mp.student_id for mp in mappings}):
+        students_by_gc_id[st.student_id] = st
+
+    # 4. Уроки всех тренингов (Lesson.training_id - String)
+    lessons = await _fetch_lessons_for_trainings(session, {str(mp.training_id) for mp in mappings})
+
+    # 5. Первые ответы по всем студентам и урокам
+    emails = list({st.user_email for st in students_by_gc_id.values() if st.user_email})
+    lesson_ids_list = [lid for lid in (_safe_int_lesson_id(l.lesson_id) for l in lessons) if lid is not None]
+    earliest_by_email: Dict[Tuple[str, int], datetime] = {}
+    if emails and lesson_ids_list:
+        res = await session.execute(
+            select(
+                StudentLessonFirstAnswer.user_email,
+                StudentLessonFirstAnswer.answer_lesson_id,
+                StudentLessonFirstAnswer.first_answer_at
+            )
+            .where(
+                and_(
+                    StudentLessonFirstAnswer.user_email.in_(emails),
+                    StudentLessonFirstAnswer.answer_lesson_id.in_(lesson_ids_list)
+                )
+            )
+        )
+        for user_email, lesson_getcourse_id, first_answer_at in res.fetchall():
+            earliest_by_email[(user_email, lesson_getcourse_id)] = first_answer_at
+
+    return mentors, mappings, students_by_gc_id, lessons, earliest_by_email
+
+
+async def get_admin_summaries(
+    session: AsyncSession,
+    training_id: Optional[int] = None,
+    lesson_id: Optional[int] = None,
+    include_not_started: bool = False,
+) -> List[Tuple[Mentor, StudentsSummary]]:
+    """
+    Сводки всех актуальных наставников для администратора.
+
+    Данные всех наставников загружаются одним набором запросов (_fetch_admin_dataset),
+    сводки считаются в памяти тем же _compute_overview, что и для наставника,
+    и кладутся в общий кэш сводок (используется get_students_summary).
+
+    Args:
+        session: Сессия БД
+        training_id: Внутренний ID тренинга (Training.id) - опционально
+        lesson_id: Внутренний ID урока (Lesson.id) - опционально
+        include_not_started: Включать ли уроки в состоянии not_started
+
+    Returns:
+        Список (наставник, сводка) в порядке Mentor.id
+    """
+    mentors, mappings, students_by_gc_id, lessons, earliest_by_email = await _fetch_admin_dataset(session)
+
+    mappings_by_mentor: Dict[int, List[Mapping]] = defaultdict(list)
+    for mp in mappings:
+        mappings_by_mentor[mp.mentor_id].append(mp)
+
+    lessons_by_training: Dict[str, List[Lesson]] = defaultdict(list)
+    for l in lessons:
+        lessons_by_training[l.training_id].append(l)
+
+    result: List[Tuple[Mentor, StudentsSummary]] = []
+    for m in mentors:
+        key = (m.id, training_id, lesson_id, include_not_started)
+        if _summary_cache is not None:
+            found, cached = _summary_cache.get(key)
+            if found:
+                result.append((m, cached))
+                continue
+
+        mentor_mappings = mappings_by_mentor.get(m.mentor_id, [])
+
+        # Студенты наставника {внутренний Student.id: Student}
+        students: Dict[int, Student] = {}
+        for mp in mentor_mappings:
+            st = students_by_gc_id.get(mp.student_id)
+            if st is not None:
+                students[st.id] = st
+
+        # Уроки всех тренингов наставника
+        mentor_lessons: List[Lesson] = []
+        for tr_id in {str(mp.training_id) for mp in mentor_mappings}:
+            mentor_lessons.extend(lessons_by_training.get(tr_id, []))
+        if lesson_id is not None:
+            mentor_lessons = [l for l in mentor_lessons if l.id == lesson_id]
+
+        if not students:
+            summary = {"total_students": 0, "counts": {}, "by_lesson": {}, "by_student": {}, "items": []}
+        elif not mentor_lessons:
+            summary = {"total_students": len(students), "counts": {}, "by_lesson": {}, "by_student": {}, "items": []}
+        else:
+            # (Student.id, GetCourse ID урока) -> дата первого ответа, как в _fetch_logs_earliest_by_student_lesson
+            email_to_student = {st.user_email: sid for sid, st in students.items() if st.user_email}
+            earliest: Dict[Tuple[int, int], datetime] = {}
+            for l in mentor_lessons:
+                lesson_getcourse_id = _safe_int_lesson_id(l.lesson_id)
+                if lesson_getcourse_id is None:
+                    continue
+                for email, sid in email_to_student.items():
+                    answer_date = earliest_by_email.get((email, lesson_getcourse_id))
+                    if answer_date is not None:
+                        earliest[(sid, lesson_getcourse_id)] = answer_date
+
+            summary = _compute_overview(
+                students, mentor_lessons, earliest, training_id, lesson_id, None, include_not_started
+            )
+
+        students_summary = _build_students_summary(summary)
+        if _summary_cache is not None:
+            _summary_cache.set(key, students_summary, _summary_cache_ttl)
+        result.append((m, students_summary))
+
+    return result
+
+
 async def build_admin_overview(
     session: AsyncSession,
     training_id: Optional[int] = None,
@@ -666,6 +793,9 @@ async def build_admin_overview(
     """
     Возвращает агрегаты по наставникам и урокам для администратора.
 
+    Счетчики by_mentor и by_lesson собираются за один проход по сводкам
+    get_admin_summaries (фиксированное число запросов на всех наставников).
+
     Args:
         session: Сессия БД
         training_id: Внутренний ID тренинга (Training.id) - опционально
@@ -675,44 +805,21 @@ async def build_admin_overview(
     Returns:
         Словарь с агрегированными данными по наставникам и урокам
     """
-    # Текущее время для проверки актуальности записей
-    now_utc = datetime.now(pytz.UTC)
-
-    # убрать\закомментировать логирование после тестирования
-    # logger.debug(f"[DEBUG] build_admin_overview: training_id={training_id}, lesson_id={lesson_id}")
-
-    # Все наставники с проверкой актуальности
-    mentors_res = await session.execute(
-        select(Mentor).where(
-            and_(
-                Mentor.valid_from <= now_utc,
-                Mentor.valid_to >= now_utc
-            )
-        )
+    summaries = await get_admin_summaries(
+        session,
+        training_id=training_id,
+        lesson_id=lesson_id,
+        include_not_started=include_not_started,
     )
-    mentors: List[Mentor] = mentors_res.scalars().all()
-
-    # убрать\закомментировать логирование после тестирования
-    # logger.debug(f"[DEBUG] build_admin_overview: найдено активных наставников: {len(mentors)}")
 
-    if not mentors:
+    if not summaries:
         return {"mentors": {}, "lessons": {}}
 
     result_by_mentor: Dict[int, Dict[str, object]] = {}
     global_lesson_counts: Dict[int, Counter] = defaultdict(Counter)
 
-    for m in mentors:
-        # убрать\закомментировать логирование после тестирования
-        # logger.debug(f"[DEBUG] build_admin_overview: обработка наставника id={m.id}, mentor_id (GetCourse)={m.mentor_id}")
-
-        # Для каждого наставника строим локальную сводку (с учётом фильтров)
-        mentor_summary = await build_mentor_overview(
-            session=session,
-            mentor_id=m.id,
-            training_id=training_id,
-            lesson_id=lesson_id,
-            include_not_started=include_not_started,
-        )
+    for m, students_summary in summaries:
+        mentor_summary = students_summary.overview
         result_by_mentor[m.id] = {
             "counts": mentor_summary.get("counts", {}),
             "total_students": mentor_summary.get("total_students", 0),
@@ -724,10 +831,143 @@ async def build_admin_overview(
 
     lessons_agg = {lid: dict(cnt) for lid, cnt in global_lesson_counts.items()}
 
-    # убрать\закомментировать логирование после тестирования
-    # logger.debug(f"[DEBUG] build_admin_overview: итоговые данные - наставников: {len(result_by_mentor)}, уроков: {len(lessons_agg)}")
-
     return {
         "mentors": result_by_mentor,
         "lessons": lessons_agg,
     }
+
+
+# ============================================
+# КЭШ СВОДОК ТАБЕЛЯ
+# ============================================
+
+@dataclass
+class StudentsSummary:
+    """Сводка наставника, подготовленная для постраничного вывода"""
+    overview: Dict[str, object]  # Результат build_mentor_overview
+    students: Dict[int, Dict[str, Optional[str]]]  # {Student.id: {"first_name", "last_name"}}
+    per_student: Dict[int, Dict[str, int]]  # {Student.id: {STATUS_HAS_ANSWER: N, STATUS_NO_ANSWER: M}}
+    ordered_ids: List[int]  # Student.id, отсортированные по фамилии и имени
+
+
+# Кэш сводок: (mentor_id, training_id, lesson_id, include_not_started) -> StudentsSummary
+# Создается в setup_gradebook_cache; None - кэш выключен
+_summary_cache: Optional[TTLCache] = None
+_summary_cache_ttl = 120
+
+
+def setup_gradebook_cache(config):
+    """
+    Создание кэша сводок табеля
+
+    Args:
+        config: Конфигурация бота
+    """
+    global _summary_cache, _summary_cache_ttl
+
+    if config.gradebook_cache_ttl_seconds > 0:
+        _summary_cache = TTLCache(max_size=config.gradebook_cache_max_size)
+        _summary_cache_ttl = config.gradebook_cache_ttl_seconds
+    else:
+        _summary_cache = None
+
+
+def invalidate_mentor_summaries(mentor_ids: Iterable[int]):
+    """
+    Сброс закэшированных сводок наставников (например, после обработки новых ответов)
+
+    Args:
+        mentor_ids: Внутренние ID наставников (Mentor.id)
+    """
+    if _summary_cache is None:
+        return
+
+    mentor_ids = set(mentor_ids)
+    if not mentor_ids:
+        return
+
+    for key in _summary_cache.keys():
+        if key[0] in mentor_ids:
+            _summary_cache.delete(key)
+
+
+def _build_students_summary(summary: Dict[str, object]) -> StudentsSummary:
+    """Счетчики ✅/❌ по студентам и порядок вывода по сводке build_mentor_overview"""
+    students = summary.get("students", {})
+
+    # Инициализируем счетчики для всех студентов нулевыми значениями
+    per_student = {
+        sid: {
+            STATUS_HAS_ANSWER: 0,
+            STATUS_NO_ANSWER: 0,
+        }
+        for sid in students.keys()
+    }
+
+    # Обновляем счетчики из items (активные/завершенные уроки)
+    for it in summary.get("items", []):
+        sid = it.get("student_id")
+        simplified_status = simplify_status(it.get("status"))
+        if simplified_status is None:
+            continue  # Пропускаем STATUS_OPTIONAL и другие
+        if sid in per_student:  # Проверяем, что студент еще в списке
+            per_student[sid][simplified_status] += 1
+
+    # Сортировка по фамилии, затем имени
+    def sort_key(sid):
+        info = students.get(sid, {})
+        last = (info.get("last_name") or "").lower()
+        first = (info.get("first_name") or "").lower()
+        return (last, first, sid)
+
+    return StudentsSummary(
+        overview=summary,
+        students=students,
+        per_student=per_student,
+        ordered_ids=sorted(per_student.keys(), key=sort_key),
+    )
+
+
+async def get_students_summary(
+    session: AsyncSession,
+    mentor_id: int,
+    training_id: Optional[int] = None,
+    lesson_id: Optional[int] = None,
+    include_not_started: bool = False,
+) -> StudentsSummary:
+    """
+    Сводка наставника для постраничного вывода (через кэш).
+
+    Страницы 2..N берут срез из уже отсортированного ordered_ids
+    без повторного построения build_mentor_overview.
+
+    Args:
+        session: Сессия БД
+        mentor_id: Внутренний ID наставника (Mentor.id)
+        training_id: Внутренний ID тренинга (Training.id) - опционально
+        lesson_id: Внутренний ID урока (Lesson.id) - опционально
+        include_not_started: Включать ли уроки в состоянии not_started
+
+    Returns:
+        StudentsSummary
+    """
+    key = (mentor_id, training_id, lesson_id, include_not_started)
+
+    if _summary_cache is not None:
+        found, cached = _summary_cache.get(key)
+        if found:
+            return cached
+
+    summary = await build_mentor_overview(
+        session,
+        mentor_id=mentor_id,
+        training_id=training_id,
+        lesson_id=lesson_id,
+        include_not_started=include_not_started,
+    )
+    result = _build_students_summary(summary)
+
+    if _summary_cache is not None:
+        _summary_cache.set(key, result, _summary_cache_ttl)
+
+    return result
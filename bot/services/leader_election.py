@@ -0,0 +1,135 @@
+"""
+Выбор лидера среди реплик бота (advisory lock PostgreSQL)
+
+Задачи-одиночки (проверка дедлайнов, напоминания, очистки) должны
+выполняться одной репликой, иначе наставники получат N копий дайджеста.
+Лидер - реплика, удерживающая сессионный pg_advisory_lock на выделенном
+asyncpg-соединении вне пула SQLAlchemy. Остальные реплики периодически
+пытаются захватить блокировку (pg_try_advisory_lock); при обрыве
+соединения лидера PostgreSQL снимает блокировку и лидером становится
+другая реплика.
+
+Задачи-очереди (вебхуки, отправка уведомлений) выполняются всеми
+репликами: строки разбираются через FOR UPDATE SKIP LOCKED.
+"""
+
+import asyncio
+import functools
+import logging
+from typing import Awaitable, Callable, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock лидера планировщика (произвольная константа проекта)
+LEADER_LOCK_KEY = 7_315_204_001
+
+
+class LeaderElector:
+    """Удержание лидерства через сессионный advisory lock"""
+
+    def __init__(self, config):
+        self.config = config
+        self.worker_id = config.worker_id
+        self.check_interval = config.leader_check_interval_seconds
+        # asyncpg принимает DSN без указания драйвера SQLAlchemy
+        self.dsn = config.db_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+        self._connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._leader = False
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader
+
+    def start(self):
+        """Запуск фоновой задачи выборов"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка и освобождение лидерства (закрытие соединения снимает блокировку)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        self._set_leader(False, "остановка реплики")
+        await self._close_connection()
+
+    def guard(self, job_id: str, job: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+        """
+        Обертка задачи-одиночки: выполняется только на лидере
+
+        Args:
+            job_id: Идентификатор задачи (для логов)
+            job: Асинхронная задача без аргументов
+
+        Returns:
+            Асинхронная обертка для планировщика
+        """
+        @functools.wraps(job)
+        async def _guarded():
+            if not self._leader:
+                logger.debug(f"Задача {job_id} пропущена: реплика {self.worker_id} не лидер")
+                return
+            return await job()
+
+        return _guarded
+
+    def _set_leader(self, leader: bool, reason: str):
+        if leader == self._leader:
+            return
+        self._leader = leader
+        if leader:
+            logger.info(f"Реплика {self.worker_id} стала лидером планировщика ({reason})")
+        else:
+            logger.warning(f"Реплика {self.worker_id} больше не лидер планировщика ({reason})")
+
+    async def _close_connection(self):
+        if self._connection is not None:
+            try:
+                await self._connection.close(timeout=5)
+            except Exception:
+                pass
+            self._connection = None
+
+    def _on_connection_lost(self, connection):
+        # Блокировка жила в сессии: вместе с соединением потеряно и лидерство
+        if connection is self._connection:
+            self._set_leader(False, "соединение с БД закрыто")
+
+    async def _run(self):
+        """Цикл: подключение, попытка захвата блокировки, проверка соединения лидера"""
+        while True:
+            try:
+                if self._connection is None or self._connection.is_closed():
+                    self._set_leader(False, "переподключение к БД")
+                    await self._close_connection()
+                    self._connection = await asyncpg.connect(
+                        self.dsn,
+                        server_settings=self.config.db_connect_args.get("server_settings"),
+                        timeout=self.config.db_connect_timeout
+                    )
+                    self._connection.add_termination_listener(self._on_connection_lost)
+
+                if self._leader:
+                    # Проверка, что соединение (а с ним и блокировка) живо
+                    await self._connection.fetchval("SELECT 1", timeout=self.check_interval)
+                elif await self._connection.fetchval(
+                    "SELECT pg_try_advisory_lock($1)", LEADER_LOCK_KEY, timeout=self.check_interval
+                ):
+                    self._set_leader(True, "блокировка захвачена")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка выбора лидера планировщика: {e}")
+                self._set_leader(False, "ошибка соединения с БД")
+                await self._close_connection()
+
+            await asyncio.sleep(self.check_interval)
@@ -9,14 +9,15 @@
 
 import logging
 import hashlib
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Set, Tuple
 from datetime import datetime, timedelta
 
 import pytz
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.services.database import Notification
+from bot.services.database import DeadlineNotificationLedger, Notification
 
 logger = logging.getLogger(__name__)
 
@@ -28,63 +29,115 @@ class NotificationCalculationService:
         self.config = config
         self.moscow_tz = pytz.timezone('Europe/Moscow')
 
-    async def check_duplicate_notification(
+    async def get_notified_deadline_students(
         self,
         session: AsyncSession,
-        mentor_id: int,
-        notification_type: str,
-        lesson_title: Optional[str] = None,
-        student_name: Optional[str] = None,
-        deadline_date: Optional[datetime] = None
-    ) -> bool:
+        lesson_id: str,
+        deadline_date: datetime
+    ) -> Set[Tuple[int, int]]:
         """
-        Проверка дубликатов уведомлений
+        Получение студентов, о которых уже отправлялись уведомления о дедлайне
+
+        Один запрос к журналу deadline_notification_ledger на урок
+        (по уникальному индексу mentor_id, lesson_id, student_id, deadline_date)
 
         Args:
             session: Сессия БД
-            mentor_id: ID ментора
-            notification_type: Тип уведомления
-            lesson_title: Название урока (для дедлайнов)
-            student_name: Имя студента (для дедлайнов)
-            deadline_date: Дата дедлайна
+            lesson_id: GetCourse ID урока (Lesson.lesson_id)
+            deadline_date: Дата дедлайна урока
 
         Returns:
-            True если дубликат найден, False если нет
+            Множество пар (mentor_id, GetCourse ID студента)
         """
         try:
-            # Базовый запрос
-            query = select(Notification).where(
-                Notification.mentor_id == mentor_id,
-                Notification.type == notification_type
+            result = await session.execute(
+                select(
+                    DeadlineNotificationLedger.mentor_id,
+                    DeadlineNotificationLedger.student_id
+                ).where(
+                    DeadlineNotificationLedger.lesson_id == str(lesson_id),
+                    DeadlineNotificationLedger.deadline_date == deadline_date
+                )
             )
-
-            # Для дедлайнов проверяем содержимое сообщения
-            if notification_type == 'deadlineApproaching' and lesson_title and student_name and deadline_date:
-                # Форматируем дату как в GAS (dd-MM-yyyy HH:mm)
-                deadline_moscow = deadline_date.astimezone(self.moscow_tz)
-                deadline_str = deadline_moscow.strftime('%d-%m-%Y %H:%M')
-
-                # Ищем уведомление с такими же параметрами
-                result = await session.execute(query)
-                notifications = result.scalars().all()
-
-                for notif in notifications:
-                    # Проверяем наличие ключевых фраз в сообщении
-                    if (student_name in notif.message and
-                        lesson_title in notif.message and
-                        deadline_str in notif.message):
-                        logger.info(
-                            f"Найден дубликат уведомления для ментора {mentor_id}: "
-                            f"тип={notification_type}, урок={lesson_title}, студент={student_name}"
-                        )
-                        return True
-
-            return False
+            return {(mentor_id, student_id) for mentor_id, student_id in result.all()}
 
         except Exception as e:
             logger.error(f"Ошибка при проверке дубликатов: {e}")
-            # В случае ошибки считаем что дубликата нет (безопаснее отправить лишнее)
-            return False
+            # В случае ошибки считаем что дубликатов нет (безопаснее отправить лишнее)
+            return set()
+
+    async def record_deadline_notifications(
+        self,
+        session: AsyncSession,
+        entries: List[Dict]
+    ):
+        """
+        Запись студентов из созданных уведомлений о дедлайне в журнал дедупликации
+
+        Вставка одним multi-row INSERT ... ON CONFLICT DO NOTHING.
+        Не коммитит - коммит в вызывающем методе.
+
+        Args:
+            session: Сессия БД
+            entries: Список словарей с ключами mentor_id, lesson_id, student_id,
+                deadline_date, notification_id
+        """
+        # Пачками, чтобы не упереться в лимит параметров запроса asyncpg (32767)
+        chunk_size = 1000
+        for start in range(0, len(entries), chunk_size):
+            stmt = pg_insert(DeadlineNotificationLedger).values(
+                entries[start:start + chunk_size]
+            ).on_conflict_do_nothing(
+                index_elements=['mentor_id', 'lesson_id', 'student_id', 'deadline_date']
+            )
+            await session.execute(stmt)
+
+    async def insert_notifications(
+        self,
+        session: AsyncSession,
+        rows: List[Dict]
+    ) -> List[Optional[int]]:
+        """
+        Вставка новых уведомлений multi-row INSERT ... ON CONFLICT DO NOTHING
+
+        Уведомление с уже существующим message_hash (см. calculate_message_signature)
+        не создается повторно - дедупликация стоит одной проверки уникального индекса.
+        Не коммитит - коммит в вызывающем методе.
+
+        Args:
+            session: Сессия БД
+            rows: Список словарей с колонками notifications
+                (mentor_id, type, message, status, created_at, message_hash, ...)
+
+        Returns:
+            ID созданных уведомлений в порядке rows (None - дубликат, не создано)
+        """
+        ids_by_hash: Dict[str, int] = {}
+        # Пачками, чтобы не упереться в лимит параметров запроса asyncpg (32767)
+        chunk_size = 1000
+        for start in range(0, len(rows), chunk_size):
+            result = await session.execute(
+                pg_insert(Notification)
+                .values(rows[start:start + chunk_size])
+                .on_conflict_do_nothing(
+                    index_elements=['message_hash'],
+                    index_where=Notification.message_hash.isnot(None)
+                )
+                .returning(Notification.id, Notification.message_hash)
+            )
+            for notification_id, message_hash in result.fetchall():
+                ids_by_hash[message_hash] = notification_id
+
+        ids: List[Optional[int]] = []
+        for row in rows:
+            # Одинаковые сигнатуры внутри батча: уведомление создается только для первой
+            ids.append(ids_by_hash.pop(row['message_hash'], None))
+
+        duplicates = ids.count(None)
+        if duplicates:
+            logger.info(f"Пропущено дубликатов уведомлений: {duplicates}")
+
+        return ids
 
     def format_answer_notification(
         self,
@@ -235,8 +288,13 @@ class NotificationCalculationService:
         """
         Создание хэша для дедупликации уведомлений
 
+        Хэш хранится в notifications.message_hash (уникальный индекс),
+        повторное уведомление с той же сигнатурой не создается.
+
         Args:
-            notification_data: Данные уведомления
+            notification_data: Данные уведомления: mentor_id, type и ключи события
+                (lesson_id, student_id, training_id, event_key - то, что отличает
+                события одного типа, например ID и статус ответа или дата дедлайна)
 
         Returns:
             SHA256 хэш от ключевых полей
@@ -248,9 +306,10 @@ class NotificationCalculationService:
             str(notification_data.get('lesson_id', '')),
             str(notification_data.get('student_id', '')),
             str(notification_data.get('training_id', '')),
+            str(notification_data.get('event_key', '')),
         ]
 
         signature_string = '|'.join(signature_parts)
 
         # Создаем SHA256 хэш
-        return hashlib.sha256(signature_string.encode()).hexdigest()
\ No newline at end of file
+        return hashlib.sha256(signature_string.encode()).hexdigest()
@@ -0,0 +1,169 @@
+"""
+Диспетчер отправки уведомлений с учетом лимитов Telegram
+
+Лимиты Bot API: около 30 сообщений в секунду суммарно
+и не более 1 сообщения в секунду в один чат.
+
+- Глобальный token bucket ограничивает общий поток сообщений
+- Сообщения одного чата отправляются последовательно (порядок сохраняется)
+  с минимальным интервалом между ними
+- Разные чаты обрабатываются параллельно; одновременно выполняется
+  не более max_concurrency запросов к Bot API (слот занимается только
+  на время самого запроса, ожидание паузы чата слот не держит)
+- RetryAfter от Telegram приостанавливает только затронутый чат
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Token bucket для ограничения общего числа сообщений в секунду"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Args:
+            rate: Скорость пополнения (токенов в секунду)
+            capacity: Емкость корзины (по умолчанию равна rate)
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Ожидание и получение одного токена"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class NotificationDispatcher:
+    """Параллельная отправка сообщений по чатам с учетом лимитов Telegram"""
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        per_chat_interval: float = 1.0,
+        max_concurrency: int = 10
+    ):
+        """
+        Args:
+            global_rate: Максимум сообщений в секунду суммарно
+            per_chat_interval: Минимальный интервал между сообщениями в один чат (секунды)
+            max_concurrency: Максимальное число одновременных запросов к Bot API
+        """
+        self.bucket = TokenBucket(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        # Момент (time.monotonic), раньше которого нельзя писать в чат
+        self._chat_ready_at: Dict[Hashable, float] = {}
+
+    def _prune(self):
+        """Удаление чатов, пауза и интервал которых уже истекли"""
+        now = time.monotonic()
+        expired = [chat_id for chat_id, ready_at in self._chat_ready_at.items() if ready_at <= now]
+        for chat_id in expired:
+            del self._chat_ready_at[chat_id]
+
+    def pause_chat(self, chat_id: Hashable, seconds: float):
+        """
+        Приостановка отправки в чат (например, после RetryAfter)
+
+        Args:
+            chat_id: Telegram ID чата
+            seconds: Длительность паузы в секундах
+        """
+        ready_at = time.monotonic() + seconds
+        if ready_at > self._chat_ready_at.get(chat_id, 0):
+            self._chat_ready_at[chat_id] = ready_at
+        logger.warning(f"Отправка в чат {chat_id} приостановлена на {seconds:.1f}с")
+
+    async def acquire(self, chat_id: Hashable):
+        """
+        Ожидание права на отправку сообщения в чат
+
+        Учитывает паузу чата и интервал между сообщениями в чат,
+        затем берет токен из глобального bucket.
+
+        Args:
+            chat_id: Telegram ID чата
+        """
+        while True:
+            delay = self._chat_ready_at.get(chat_id, 0) - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        await self.bucket.acquire()
+        self._chat_ready_at[chat_id] = time.monotonic() + self.per_chat_interval
+
+    @asynccontextmanager
+    async def slot(self, chat_id: Hashable = None):
+        """
+        Слот на время одного запроса к Bot API (после acquire)
+
+        Args:
+            chat_id: Telegram ID чата; интервал до следующего сообщения в чат
+                отсчитывается от момента получения слота, а не от acquire -
+                ожидание слота не сокращает паузу между запросами в чат
+        """
+        async with self._slots:
+            if chat_id is not None:
+                ready_at = time.monotonic() + self.per_chat_interval
+                if ready_at > self._chat_ready_at.get(chat_id, 0):
+                    self._chat_ready_at[chat_id] = ready_at
+            yield
+
+    async def dispatch(
+        self,
+        items: List[Tuple[Hashable, T]],
+        send: Callable[[Hashable, T], Awaitable[None]]
+    ):
+        """
+        Отправка элементов с группировкой по чатам
+
+        Элементы одного чата передаются в send строго по порядку списка.
+        Исключения из send не прерывают обработку - send должен
+        обрабатывать ошибки сам (статус уведомления и т.п.).
+
+        Args:
+            items: Список пар (chat_id, элемент) в порядке отправки
+            send: Корутина отправки одного элемента; перед каждым вызовом
+                Bot API внутри нее должен вызываться acquire(chat_id),
+                а сам вызов - выполняться внутри slot(chat_id)
+        """
+        lanes: Dict[Hashable, List[T]] = {}
+        for chat_id, item in items:
+            lanes.setdefault(chat_id, []).append(item)
+
+        self._prune()
+        if not lanes:
+            return
+
+        async def _run_lane(chat_id: Hashable, lane_items: List[T]):
+            for item in lane_items:
+                try:
+                    await send(chat_id, item)
+                except Exception as e:
+                    logger.error(f"Ошибка отправки в чат {chat_id}: {e}", exc_info=True)
+
+        await asyncio.gather(*(_run_lane(chat_id, lane) for chat_id, lane in lanes.items()))
@@ -6,16 +6,18 @@
 """
 
 import logging
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
 
 import pytz
 from aiogram import Bot
-from aiogram.utils.exceptions import TelegramAPIError
-from sqlalchemy import select, and_
+from aiogram.utils.exceptions import TelegramAPIError, RetryAfter
+from sqlalchemy import select, update, values, column, and_, or_, BigInteger, String, TIMESTAMP
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.services.database import get_session, Notification, Mentor
+from bot.services.notification_dispatcher import NotificationDispatcher
 from bot.utils.retry import retry_with_backoff
 from bot.utils.markdown import convert_pseudo_markdown_to_v2
 
@@ -28,86 +30,105 @@ class NotificationSenderService:
     def __init__(self, config, bot: Bot):
         self.config = config
         self.bot = bot
-
-    async def send_pending_notifications(self):
+        # Общий для всех запусков: паузы чатов после RetryAfter сохраняются между батчами
+        self.dispatcher = NotificationDispatcher(
+            global_rate=config.notification_global_rate,
+            per_chat_interval=config.notification_per_chat_interval,
+            max_concurrency=config.notification_send_concurrency
+        )
+
+    async def send_pending_notifications(self) -> bool:
         """
         Главный метод отправки необработанных уведомлений
 
-        Читает уведомления со статусом 'pending' и отправляет их
+        Забирает в аренду батч уведомлений со статусом 'pending', отправляет их
+        и записывает итоги. Аренда коммитится до отправки, итоги - отдельной
+        транзакцией после нее: во время отправки (с паузами лимитов Telegram)
+        транзакция не открыта и строки не заблокированы.
+
+        Returns:
+            True, если батч был полным и в очереди могут остаться уведомления
         """
         try:
             async for session in get_session():
-                # Получаем pending уведомления (батчами)
-                batch_size = self.config.notification_batch_size
-
-                query = select(Notification).where(
-                    Notification.status == 'pending'
-                ).order_by(Notification.created_at).limit(batch_size)
-
-                result = await session.execute(query)
-                notifications = result.scalars().all()
+                notifications = await self.claim_pending_notifications(session)
 
                 if not notifications:
+                    await session.commit()
                     logger.debug("Нет pending уведомлений")
-                    return
+                    return False
 
                 logger.info(f"Найдено {len(notifications)} pending уведомлений")
 
-                # Обрабатываем каждое уведомление
+                # Менторы всех уведомлений батча одним запросом
+                mentors = await self.get_mentors_by_ids(
+                    session,
+                    {notification.mentor_id for notification in notifications}
+                )
+
+                # Коммит аренды до отправки
+                await session.commit()
+
                 sent_count = 0
                 failed_count = 0
                 no_telegram_count = 0
 
+                # Итоги отправки: записываются в БД пакетно после отправки
+                sent: List[Tuple[int, datetime, str]] = []  # (id, sent_at, telegram_message_id)
+                failed_ids: List[int] = []
+                no_telegram_ids: List[int] = []
+
+                # Уведомления, которые можно отправить: (telegram_id, (уведомление, ментор))
+                to_send = []
+
                 for notification in notifications:
-                    try:
-                        # Получаем ментора
-                        mentor = await self.get_mentor_by_id(session, notification.mentor_id)
-
-                        if not mentor:
-                            logger.warning(
-                                f"Ментор {notification.mentor_id} не найден "
-                                f"для уведомления {notification.id}"
-                            )
-                            notification.status = 'failed'
-                            failed_count += 1
-                            continue
-
-                        if not mentor.telegram_id:
-                            logger.info(
-                                f"У ментора {notification.mentor_id} нет telegram_id. "
-                                f"Уведомление {notification.id} отложено."
-                            )
-                            notification.status = 'no_telegram_id'
-                            no_telegram_count += 1
-                            continue
+                    mentor = mentors.get(notification.mentor_id)
+
+                    if not mentor:
+                        logger.warning(
+                            f"Ментор {notification.mentor_id} не найден "
+                            f"для уведомления {notification.id}"
+                        )
+                        failed_ids.append(notification.id)
+                        failed_count += 1
+                        continue
 
+                    if not mentor.telegram_id:
+                        logger.info(
+                            f"У ментора {notification.mentor_id} нет telegram_id. "
+                            f"Уведомление {notification.id} отложено."
+                        )
+                        no_telegram_ids.append(notification.id)
+                        no_telegram_count += 1
+                        continue
+
+                    to_send.append((mentor.telegram_id, (notification, mentor)))
+
+                async def _send_one(telegram_id, item):
+                    nonlocal sent_count, failed_count
+                    notification, mentor = item
+                    try:
                         # Отправляем уведомление в Telegram
                         message_id = await self.send_notification_to_telegram(
-                            telegram_id=mentor.telegram_id,
+                            telegram_id=telegram_id,
                             message=notification.message
                         )
 
-                        # Обновляем статус
-                        notification.status = 'sent'
-                        notification.sent_at = datetime.now(pytz.UTC)
-                        notification.telegram_message_id = str(message_id)
+                        # Запоминаем результат
+                        sent.append((notification.id, datetime.now(pytz.UTC), str(message_id)))
                         sent_count += 1
 
                         logger.info(
                             f"Уведомление {notification.id} отправлено "
-                            f"ментору {mentor.email} (TG: {mentor.telegram_id})"
+                            f"ментору {mentor.email} (TG: {telegram_id})"
                         )
 
-                        # Небольшая задержка между отправками
-                        import asyncio
-                        await asyncio.sleep(0.5)
-
                     except TelegramAPIError as e:
                         logger.error(
                             f"Ошибка Telegram API при отправке уведомления {notification.id}: {e}",
                             exc_info=True
                         )
-                        notification.status = 'failed'
+                        failed_ids.append(notification.id)
                         failed_count += 1
 
                     except Exception as e:
@@ -115,10 +136,17 @@ class NotificationSenderService:
                             f"Ошибка при отправке уведомления {notification.id}: {e}",
                             exc_info=True
                         )
-                        notification.status = 'failed'
+                        failed_ids.append(notification.id)
                         failed_count += 1
 
-                # Коммитим все изменения
+                # Параллельно по чатам, по порядку внутри чата, с учетом лимитов Telegram
+                await self.dispatcher.dispatch(to_send, _send_one)
+
+                # Статусы - по одному UPDATE на вид результата, отдельной транзакцией
+                await self.mark_sent(session, sent)
+                await self.mark_status(session, failed_ids, 'failed')
+                await self.mark_status(session, no_telegram_ids, 'no_telegram_id')
+
                 await session.commit()
 
                 logger.info(
@@ -126,41 +154,176 @@ class NotificationSenderService:
                     f"ошибок={failed_count}, без telegram_id={no_telegram_count}"
                 )
 
+                return len(notifications) >= self.config.notification_batch_size
+
         except Exception as e:
             logger.error(f"Критическая ошибка при отправке уведомлений: {e}", exc_info=True)
 
-    async def get_mentor_by_id(
+        return False
+
+    async def claim_pending_notifications(self, session: AsyncSession) -> List[Row]:
+        """
+        Аренда батча уведомлений для отправки текущим экземпляром бота
+
+        Строки выбираются через FOR UPDATE SKIP LOCKED и переводятся в статус
+        'sending' одним UPDATE ... RETURNING, поэтому параллельные реплики
+        получают непересекающиеся батчи. Уведомления в статусе 'sending'
+        с истекшим сроком аренды (экземпляр упал во время отправки) снова
+        доступны для выбора и могут быть отправлены повторно.
+        Не коммитит - коммит в вызывающем методе (до начала отправки).
+
+        Args:
+            session: Сессия БД
+
+        Returns:
+            Строки (id, mentor_id, message) арендованных уведомлений в порядке создания
+        """
+        now_utc = datetime.now(pytz.UTC)
+
+        candidates = select(Notification.id).where(
+            or_(
+                Notification.status == 'pending',
+                and_(
+                    Notification.status == 'sending',
+                    Notification.locked_until < now_utc,
+                ),
+            )
+        ).order_by(
+            Notification.created_at
+        ).limit(
+            self.config.notification_batch_size
+        ).with_for_update(skip_locked=True)
+
+        result = await session.execute(
+            update(Notification)
+            .where(Notification.id.in_(candidates.scalar_subquery()))
+            .values(
+                status='sending',
+                locked_by=self.config.worker_id,
+                locked_until=now_utc + timedelta(seconds=self.config.notification_lease_seconds),
+            )
+            .returning(Notification.id, Notification.mentor_id, Notification.message, Notification.created_at)
+            .execution_options(synchronize_session=False)
+        )
+
+        # RETURNING не гарантирует порядок: уведомления чата отправляются в порядке создания
+        return sorted(result.all(), key=lambda row: (row.created_at, row.id))
+
+    def _leased(self):
+        """Условие: уведомление еще в аренде у этого экземпляра"""
+        return and_(
+            Notification.status == 'sending',
+            Notification.locked_by == self.config.worker_id,
+        )
+
+    def _warn_lost_leases(self, expected: int, updated: int, status: str):
+        if updated != expected:
+            logger.warning(
+                f"Потеряна аренда {expected - updated} из {expected} уведомлений "
+                f"со статусом '{status}': их забрала другая реплика"
+            )
+
+    async def mark_sent(
+        self,
+        session: AsyncSession,
+        sent: List[Tuple[int, datetime, str]]
+    ):
+        """
+        Отметка отправленных уведомлений одним UPDATE ... FROM (VALUES ...)
+
+        Обновляются только уведомления, аренда которых еще у этого экземпляра;
+        аренда снимается. Не коммитит - коммит в вызывающем методе.
+
+        Args:
+            session: Сессия БД
+            sent: Список (id уведомления, время отправки, ID сообщения Telegram)
+        """
+        if not sent:
+            return
+
+        sent_rows = values(
+            column('id', BigInteger),
+            column('sent_at', TIMESTAMP(timezone=True)),
+            column('telegram_message_id', String),
+            name='sent_notifications'
+        ).data(sent)
+
+        result = await session.execute(
+            update(Notification)
+            .where(Notification.id == sent_rows.c.id, self._leased())
+            .values(
+                status='sent',
+                sent_at=sent_rows.c.sent_at,
+                telegram_message_id=sent_rows.c.telegram_message_id,
+                locked_by=None,
+                locked_until=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self._warn_lost_leases(len(sent), result.rowcount, 'sent')
+
+    async def mark_status(
         self,
         session: AsyncSession,
-        mentor_id: int
-    ) -> Optional[Mentor]:
+        notification_ids: List[int],
+        status: str
+    ):
         """
-        Получение ментора по ID
+        Установка статуса уведомлениям одним UPDATE ... WHERE id IN
+
+        Обновляются только уведомления, аренда которых еще у этого экземпляра;
+        аренда снимается. Не коммитит - коммит в вызывающем методе.
 
         Args:
             session: Сессия БД
-            mentor_id: ID ментора (BIGINT из таблицы mentors)
+            notification_ids: ID уведомлений
+            status: Новый статус
+        """
+        if not notification_ids:
+            return
+
+        result = await session.execute(
+            update(Notification)
+            .where(Notification.id.in_(notification_ids), self._leased())
+            .values(status=status, locked_by=None, locked_until=None)
+            .execution_options(synchronize_session=False)
+        )
+        self._warn_lost_leases(len(notification_ids), result.rowcount, status)
+
+    async def get_mentors_by_ids(
+        self,
+        session: AsyncSession,
+        mentor_ids: Set[int]
+    ) -> Dict[int, Mentor]:
+        """
+        Получение актуальных менторов по списку ID одним запросом
+
+        Args:
+            session: Сессия БД
+            mentor_ids: ID менторов (BIGINT из таблицы mentors)
 
         Returns:
-            Объект Mentor или None
+            Словарь {mentor.id: Mentor}
         """
+        if not mentor_ids:
+            return {}
+
         try:
-            # Текущая дата в UTC для проверки актуальности записи
             now_utc = datetime.now(pytz.UTC)
 
             query = select(Mentor).where(
                 and_(
-                    Mentor.id == mentor_id,
+                    Mentor.id.in_(mentor_ids),
                     Mentor.valid_from <= now_utc,
                     Mentor.valid_to >= now_utc,
                 )
             )
             result = await session.execute(query)
-            return result.scalars().first()
+            return {mentor.id: mentor for mentor in result.scalars().all()}
 
         except Exception as e:
-            logger.error(f"Ошибка при получении ментора: {e}", exc_info=True)
-            return None
+            logger.error(f"Ошибка при получении менторов: {e}", exc_info=True)
+            return {}
 
     async def send_notification_to_telegram(
         self,
@@ -177,16 +340,25 @@ class NotificationSenderService:
         Returns:
             ID отправленного сообщения
         """
+        # Конвертируем псевдо-markdown в MarkdownV2
+        formatted_message = convert_pseudo_markdown_to_v2(message)
+
         async def _send():
-            # Конвертируем псевдо-markdown в MarkdownV2
-            formatted_message = convert_pseudo_markdown_to_v2(message)
-
-            # Отправляем сообщение
-            sent_message = await self.bot.send_message(
-                chat_id=telegram_id,
-                text=formatted_message,
-                parse_mode="MarkdownV2"
-            )
+            # Ждем окно отправки: глобальный лимит, интервал и пауза чата
+            await self.dispatcher.acquire(telegram_id)
+
+            try:
+                # Слот пула запросов занимается только на время вызова Bot API
+                async with self.dispatcher.slot(telegram_id):
+                    sent_message = await self.bot.send_message(
+                        chat_id=telegram_id,
+                        text=formatted_message,
+                        parse_mode="MarkdownV2"
+                    )
+            except RetryAfter as e:
+                # Приостанавливаем только этот чат; повтор - через retry_with_backoff
+                self.dispatcher.pause_chat(telegram_id, e.timeout)
+                raise
 
             return sent_message.message_id
 
@@ -0,0 +1,366 @@
+"""
+Кэш справочных таблиц (mentors, students, trainings, lessons, mapping)
+
+Справочники редактируются вручную через DBeaver и меняются редко,
+поэтому их снимки хранятся в памяти процесса:
+- снимок таблицы содержит все незакрытые записи (valid_to >= момента загрузки),
+  актуальность valid_from/valid_to проверяется при каждом поиске;
+- не чаще раза в ttl секунд выполняется проверка версии таблицы
+  (max(updated_at), count(*)), снимок перезагружается только при изменении;
+- таблица больше max_rows записей не кэшируется - поиск идет в БД;
+- при ошибке загрузки поиск также выполняется запросом к БД.
+
+Поиск возможен только по индексированным колонкам (INDEXED_COLUMNS).
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import pytz
+from sqlalchemy import select, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.services import database
+from bot.services.database import Mentor, Student, Training, Lesson, Mapping
+
+logger = logging.getLogger(__name__)
+
+# Колонки, по которым строятся индексы снимков
+INDEXED_COLUMNS = {
+    Mentor: ("id", "mentor_id", "telegram_id", "email"),
+    Student: ("id", "student_id", "user_email"),
+    Training: ("id", "training_id"),
+    Lesson: ("id", "lesson_id", "training_id"),
+    Mapping: ("student_id", "mentor_id", "training_id"),
+}
+
+
+class _TableSnapshot:
+    """Снимок одной справочной таблицы"""
+
+    def __init__(self):
+        self.version = None
+        self.checked_at = 0.0
+        # False - таблица не помещается в max_rows или не загрузилась, поиск идет в БД
+        self.available = False
+        self.rows_count = 0
+        self.indexes: Dict[str, Dict[Any, List[Any]]] = {}
+        self.lock = asyncio.Lock()
+
+
+class ReferenceCache:
+    """Кэш справочных таблиц с TTL-проверкой версии"""
+
+    def __init__(self, config):
+        self.config = config
+        self.ttl = config.reference_cache_ttl_seconds
+        self.max_rows = config.reference_cache_max_rows
+        self._snapshots: Dict[type, _TableSnapshot] = {
+            model: _TableSnapshot() for model in INDEXED_COLUMNS
+        }
+        # Счетчики по таблицам
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.reloads: Dict[str, int] = defaultdict(int)
+
+    def invalidate(self, model: Optional[type] = None):
+        """
+        Принудительная проверка версии при следующем обращении
+
+        Args:
+            model: Модель справочника (если None - все справочники)
+        """
+        models = [model] if model is not None else list(self._snapshots)
+        for m in models:
+            self._snapshots[m].checked_at = 0.0
+
+    async def _get_snapshot(self, model: type) -> Optional[_TableSnapshot]:
+        """
+        Получение актуального снимка таблицы (с проверкой версии раз в ttl секунд)
+
+        Returns:
+            Снимок или None, если таблицу нужно читать из БД
+        """
+        snapshot = self._snapshots[model]
+
+        if time.monotonic() - snapshot.checked_at < self.ttl:
+            return snapshot if snapshot.available else None
+
+        async with snapshot.lock:
+            # Снимок мог обновить другой запрос, пока мы ждали блокировку
+            if time.monotonic() - snapshot.checked_at >= self.ttl:
+                try:
+                    await self._refresh(model, snapshot)
+                except Exception as e:
+                    logger.error(
+                        f"Ошибка обновления кэша справочника {model.__tablename__}: {e}",
+                        exc_info=True
+                    )
+                    snapshot.available = False
+                    snapshot.version = None
+                # При ошибке следующая попытка - через ttl, чтобы не нагружать БД
+                snapshot.checked_at = time.monotonic()
+
+        return snapshot if snapshot.available else None
+
+    async def _refresh(self, model: type, snapshot: _TableSnapshot):
+        """Проверка версии таблицы и перезагрузка снимка при изменении"""
+        table = model.__tablename__
+
+        # Отдельная сессия: объекты снимка не должны попадать в сессии вызывающего кода
+        async with database.async_session() as session:
+            version_result = await session.execute(
+                select(func.max(model.updated_at), func.count()).select_from(model)
+            )
+            version = tuple(version_result.one())
+
+            if snapshot.version == version:
+                return
+
+            rows_count = version[1]
+            if rows_count > self.max_rows:
+                if snapshot.available or snapshot.version is None:
+                    logger.warning(
+                        f"Справочник {table} ({rows_count} записей) больше лимита кэша "
+                        f"{self.max_rows}, поиск будет выполняться в БД"
+                    )
+                snapshot.available = False
+                snapshot.indexes = {}
+                snapshot.version = version
+                return
+
+            now_utc = datetime.now(pytz.UTC)
+            result = await session.execute(
+                select(model).where(model.valid_to >= now_utc).order_by(model.id)
+            )
+            rows = result.scalars().all()
+
+        indexes: Dict[str, Dict[Any, List[Any]]] = {}
+        for column in INDEXED_COLUMNS[model]:
+            index = defaultdict(list)
+            for row in rows:
+                index[getattr(row, column)].append(row)
+            indexes[column] = dict(index)
+
+        snapshot.indexes = indexes
+        snapshot.rows_count = len(rows)
+        snapshot.version = version
+        snapshot.available = True
+        self.reloads[table] += 1
+
+        logger.info(f"Кэш справочника {table} загружен: {len(rows)} записей")
+
+    @staticmethod
+    def _is_actual(row, now_utc: datetime) -> bool:
+        return row.valid_from <= now_utc <= row.valid_to
+
+    async def find(self, session: AsyncSession, model: type, **filters) -> List[Any]:
+        """
+        Поиск актуальных записей справочника по равенству колонок
+
+        Первая колонка фильтра должна быть в INDEXED_COLUMNS,
+        остальные проверяются в памяти.
+
+        Args:
+            session: Сессия БД (для запроса, если таблица не в кэше)
+            model: Модель справочника
+            **filters: Колонка=значение
+
+        Returns:
+            Список актуальных записей в порядке id
+        """
+        (column, value), *rest = filters.items()
+        rows = await self.find_in(session, model, column, [value])
+        return [row for row in rows if all(getattr(row, c) == v for c, v in rest)]
+
+    async def first(self, session: AsyncSession, model: type, **filters) -> Optional[Any]:
+        """
+        Первая актуальная запись справочника (аналог .scalars().first())
+
+        Args:
+            session: Сессия БД (для запроса, если таблица не в кэше)
+            model: Модель справочника
+            **filters: Колонка=значение
+
+        Returns:
+            Запись или None
+        """
+        rows = await self.find(session, model, **filters)
+        return rows[0] if rows else None
+
+    async def find_in(
+        self,
+        session: AsyncSession,
+        model: type,
+        column: str,
+        values: Iterable[Any]
+    ) -> List[Any]:
+        """
+        Поиск актуальных записей справочника по списку значений колонки (аналог IN)
+
+        Args:
+            session: Сессия БД (для запроса, если таблица не в кэше)
+            model: Модель справочника
+            column: Индексированная колонка
+            values: Значения колонки
+
+        Returns:
+            Список актуальных записей в порядке id
+        """
+        if column not in INDEXED_COLUMNS[model]:
+            raise ValueError(f"Колонка {model.__tablename__}.{column} не индексируется кэшем")
+
+        values = list(set(values))
+        if not values:
+            return []
+
+        now_utc = datetime.now(pytz.UTC)
+        table = model.__tablename__
+        snapshot = await self._get_snapshot(model)
+
+        if snapshot is not None:
+            self.hits[table] += 1
+            index = snapshot.indexes[column]
+            rows = [row for value in values for row in index.get(value, [])]
+            rows.sort(key=lambda row: row.id)
+            return [row for row in rows if self._is_actual(row, now_utc)]
+
+        self.misses[table] += 1
+        return await _query_actual_in(session, model, column, values)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Статистика кэша по таблицам
+
+        Returns:
+            {таблица: {hits, misses, reloads, rows, cached}}
+        """
+        stats = {}
+        for model, snapshot in self._snapshots.items():
+            table = model.__tablename__
+            stats[table] = {
+                'hits': self.hits[table],
+                'misses': self.misses[table],
+                'reloads': self.reloads[table],
+                'rows': snapshot.rows_count if snapshot.available else 0,
+                'cached': snapshot.available,
+            }
+        return stats
+
+
+async def _query_actual_in(
+    session: AsyncSession,
+    model: type,
+    column: str,
+    values: List[Any]
+) -> List[Any]:
+    """Запрос актуальных записей справочника из БД (колонка IN values)"""
+    now_utc = datetime.now(pytz.UTC)
+    result = await session.execute(
+        select(model).where(
+            and_(
+                getattr(model, column).in_(values),
+                model.valid_from <= now_utc,
+                model.valid_to >= now_utc,
+            )
+        ).order_by(model.id)
+    )
+    return result.scalars().all()
+
+
+async def find_actual_in(
+    session: AsyncSession,
+    model: type,
+    column: str,
+    values: Iterable[Any]
+) -> List[Any]:
+    """
+    Актуальные записи справочника по списку значений колонки
+
+    Читает через кэш, если он включен, иначе запросом к БД.
+
+    Args:
+        session: Сессия БД
+        model: Модель справочника
+        column: Колонка из INDEXED_COLUMNS
+        values: Значения колонки
+
+    Returns:
+        Список актуальных записей в порядке id
+    """
+    if reference_cache is not None:
+        return await reference_cache.find_in(session, model, column, values)
+
+    values = list(set(values))
+    if not values:
+        return []
+    return await _query_actual_in(session, model, column, values)
+
+
+async def find_actual_first(session: AsyncSession, model: type, **filters) -> Optional[Any]:
+    """
+    Первая актуальная запись справочника по равенству колонок
+
+    Читает через кэш, если он включен, иначе запросом к БД.
+    Первая колонка фильтра должна быть в INDEXED_COLUMNS.
+
+    Args:
+        session: Сессия БД
+        model: Модель справочника
+        **filters: Колонка=значение
+
+    Returns:
+        Запись или None
+    """
+    if reference_cache is not None:
+        return await reference_cache.first(session, model, **filters)
+
+    now_utc = datetime.now(pytz.UTC)
+    result = await session.execute(
+        select(model).where(
+            and_(
+                *[getattr(model, column) == value for column, value in filters.items()],
+                model.valid_from <= now_utc,
+                model.valid_to >= now_utc,
+            )
+        ).order_by(model.id)
+    )
+    return result.scalars().first()
+
+
+# Глобальный экземпляр кэша (None - кэш выключен)
+reference_cache: Optional[ReferenceCache] = None
+
+
+def setup_reference_cache(config) -> Optional[ReferenceCache]:
+    """
+    Создание глобального кэша справочников
+
+    Args:
+        config: Конфигурация бота
+
+    Returns:
+        Экземпляр ReferenceCache или None, если кэш выключен
+    """
+    global reference_cache
+
+    if config.reference_cache_enabled:
+        reference_cache = ReferenceCache(config)
+        logger.info(
+            f"Кэш справочников включен (ttl={config.reference_cache_ttl_seconds}с, "
+            f"max_rows={config.reference_cache_max_rows})"
+        )
+    else:
+        reference_cache = None
+        logger.info("Кэш справочников выключен")
+
+    return reference_cache
+
+
+def get_reference_cache() -> Optional[ReferenceCache]:
+    """Глобальный кэш справочников или None, если он выключен"""
+    return reference_cache
@@ -7,7 +7,7 @@
 
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Tuple
 from collections import defaultdict
 
 import pytz
@@ -15,9 +15,10 @@ from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.services.database import (
-    get_session, WebhookEvent, Mentor, Student, Training, Mapping, Notification
+    get_session, WebhookEvent, Mentor, Student, Training, Mapping
 )
 from bot.services.notification_calculator import NotificationCalculationService
+from bot.services.reference_cache import find_actual_in
 
 logger = logging.getLogger(__name__)
 
@@ -81,7 +82,7 @@ class ReminderService:
                 logger.info(f"Найдено {len(relevant_answers)} ответов за {analysis_date.date()}")
 
                 # 3. Сгруппировать по наставникам
-                mentor_groups = await self.group_answers_by_mentor(
+                mentor_groups, mentor_names = await self.group_answers_by_mentor(
                     session,
                     relevant_answers
                 )
@@ -92,6 +93,7 @@ class ReminderService:
 
                 # 4. Создать напоминания для каждого ментора
                 reminders_created = 0
+                notification_rows = []
 
                 for mentor_id, students in mentor_groups.items():
                     try:
@@ -105,28 +107,26 @@ class ReminderService:
                             students=students
                         )
 
-                        # Создание уведомления
-                        notification = Notification(
-                            mentor_id=mentor_id,
-                            type='reminderUncheckedAnswers',
-                            message=message,
-                            status='pending',
-                            created_at=datetime.now(pytz.UTC)
-                        )
-
-                        session.add(notification)
+                        # Создание уведомления (вставка одним INSERT после цикла)
+                        # Одно напоминание ментору за дату анализа (повторный запуск не дублирует)
+                        message_hash = self.notification_calculator.calculate_message_signature({
+                            'mentor_id': mentor_id,
+                            'type': 'reminderUncheckedAnswers',
+                            'event_key': analysis_date.date().isoformat(),
+                        })
+
+                        notification_rows.append({
+                            'mentor_id': mentor_id,
+                            'type': 'reminderUncheckedAnswers',
+                            'message': message,
+                            'status': 'pending',
+                            'message_hash': message_hash,
+                            'created_at': datetime.now(pytz.UTC),
+                        })
                         reminders_created += 1
 
-                        # Получаем ментора для логирования
-                        mentor = await session.get(Mentor, mentor_id)
-                        if mentor:
-                            mentor_name = f"{mentor.first_name or ''} {mentor.last_name or ''}".strip()
-                        else:
-                            mentor_name = str(mentor_id)
-                            # убрать\закомментировать логирование после тестирования
-                            # logger.debug(
-                            #     f"[DEBUG] Ментор с ID {mentor_id} не найден в БД при логировании"
-                            # )
+                        # Имя ментора для логирования (получено при группировке)
+                        mentor_name = mentor_names.get(mentor_id, str(mentor_id))
 
                         logger.info(
                             f"Создано напоминание для наставника {mentor_name} ({mentor_id}), "
@@ -140,6 +140,10 @@ class ReminderService:
                         )
                         continue
 
+                # Вставляем все напоминания одним multi-row INSERT
+                if notification_rows:
+                    await self.notification_calculator.insert_notifications(session, notification_rows)
+
                 # Коммитим все изменения
                 await session.commit()
 
@@ -209,20 +213,22 @@ class ReminderService:
         self,
         session: AsyncSession,
         answers: List[Dict]
-    ) -> Dict[int, List[Dict]]:
+    ) -> Tuple[Dict[int, List[Dict]], Dict[int, str]]:
         """
         Группировка ответов по наставникам
 
+        Менторы для всех ответов ищутся одним набором запросов (resolve_mentors_for_answers).
+
         Args:
             session: Сессия БД
             answers: Список ответов студентов
 
         Returns:
-            Словарь {mentor_id: [список студентов с ответами]}
+            (словарь {mentor_id: [список студентов с ответами]}, словарь {mentor_id: имя ментора})
         """
         try:
-            mentor_groups = defaultdict(list)
-
+            # Пары (студент, тренинг) для ответов с answer_training_id
+            answer_pairs = []
             for answer in answers:
                 # Проверяем наличие answer_training_id
                 if answer.get('answer_training_id') is None:
@@ -244,24 +250,28 @@ class ReminderService:
                     # )
                     continue
 
-                # Находим наставника для этого студента и тренинга
-                mentor_id = await self._find_mentor_for_answer(
-                    session,
-                    answer['user_id'],
-                    training_id_str
-                )
+                answer_pairs.append((answer, (answer['user_id'], training_id_str)))
+
+            # Находим наставников для всех пар студент/тренинг
+            resolved = await self.resolve_mentors_for_answers(
+                session,
+                (pair for _, pair in answer_pairs)
+            )
 
-                if mentor_id:
+            mentor_groups = defaultdict(list)
+            mentor_names: Dict[int, str] = {}
+
+            for answer, pair in answer_pairs:
+                found = resolved.get(pair)
+
+                if found:
+                    mentor_id, mentor_name = found
                     mentor_groups[mentor_id].append(answer)
-                    # убрать\закомментировать логирование после тестирования
-                    # logger.debug(
-                    #     f"[DEBUG] Найден ментор {mentor_id} для студента {answer['user_id']} "
-                    #     f"в тренинге {training_id_str}"
-                    # )
+                    mentor_names[mentor_id] = mentor_name
                 else:
                     logger.warning(
-                        f"Не найден наставник для студента {answer['user_id']} "
-                        f"в тренинге {training_id_str}"
+                        f"Не найден наставник для студента {pair[0]} "
+                        f"в тренинге {pair[1]}"
                     )
 
             # убрать\закомментировать логирование после тестирования
@@ -270,147 +280,84 @@ class ReminderService:
             #     f"найдено менторов {len(mentor_groups)}"
             # )
 
-            return dict(mentor_groups)
+            return dict(mentor_groups), mentor_names
 
         except Exception as e:
             logger.error(f"Ошибка при группировке ответов: {e}", exc_info=True)
-            return {}
+            return {}, {}
 
-    async def _find_mentor_for_answer(
+    async def resolve_mentors_for_answers(
         self,
         session: AsyncSession,
-        student_getcourse_id: int,
-        training_getcourse_id: str
-    ) -> Optional[int]:
+        pairs: Iterable[Tuple[int, str]]
+    ) -> Dict[Tuple[int, str], Tuple[int, str]]:
         """
-        Поиск ID ментора для студента в тренинге
+        Поиск менторов сразу для всех пар (студент, тренинг)
+
+        Выполняет фиксированное число запросов независимо от количества пар:
+        студенты, тренинги, mapping и менторы (через кэш справочников, если включен).
 
         Args:
             session: Сессия БД
-            student_getcourse_id: GetCourse ID студента
-            training_getcourse_id: GetCourse ID тренинга (строка)
+            pairs: Пары (GetCourse ID студента, GetCourse ID тренинга - строка)
 
         Returns:
-            ID ментора (из таблицы mentors) или None
+            Словарь {(student_getcourse_id, training_getcourse_id): (mentors.id, имя ментора)}.
+            Пары, для которых ментор не найден, в словарь не попадают
         """
         try:
-            # Текущее время для проверки актуальности записей
-            now_utc = datetime.now(pytz.UTC)
-
-            # убрать\закомментировать логирование после тестирования
-            # logger.debug(
-            #     f"[DEBUG] _find_mentor_for_answer: student_getcourse_id={student_getcourse_id}, "
-            #     f"training_getcourse_id={training_getcourse_id}, now_utc={now_utc}"
-            # )
-
-            # Находим студента по GetCourse ID с проверкой актуальности
-            student_query = select(Student).where(
-                and_(
-                    Student.student_id == student_getcourse_id,
-                    Student.valid_from <= now_utc,
-                    Student.valid_to >= now_utc
-                )
-            )
-            student_result = await session.execute(student_query)
-            student = student_result.scalars().first()
-
-            if not student:
-                # убрать\закомментировать логирование после тестирования
-                # logger.debug(
-                #     f"[DEBUG] Студент с GetCourse ID {student_getcourse_id} не найден или неактуален"
-                # )
-                return None
-
-            # убрать\закомментировать логирование после тестирования
-            # logger.debug(
-            #     f"[DEBUG] Найден студент: id={student.id}, student_id={student.student_id}, "
-            #     f"valid_from={student.valid_from}, valid_to={student.valid_to}"
-            # )
-
-            # Находим тренинг по GetCourse ID с проверкой актуальности
-            training_query = select(Training).where(
-                and_(
-                    Training.training_id == training_getcourse_id,
-                    Training.valid_from <= now_utc,
-                    Training.valid_to >= now_utc
-                )
-            )
-            training_result = await session.execute(training_query)
-            training = training_result.scalars().first()
+            pairs = set(pairs)
+            if not pairs:
+                return {}
 
-            if not training:
-                # убрать\закомментировать логирование после тестирования
-                # logger.debug(
-                #     f"[DEBUG] Тренинг с GetCourse ID {training_getcourse_id} не найден или неактуален"
-                # )
-                return None
+            # Актуальные студенты и тренинги по GetCourse ID
+            students = await find_actual_in(session, Student, 'student_id', {student_id for student_id, _ in pairs})
+            student_ids = {student.student_id for student in students}
 
-            # убрать\закомментировать логирование после тестирования
-            # logger.debug(
-            #     f"[DEBUG] Найден тренинг: id={training.id}, training_id={training.training_id}, "
-            #     f"valid_from={training.valid_from}, valid_to={training.valid_to}"
-            # )
+            trainings = await find_actual_in(session, Training, 'training_id', {training_id for _, training_id in pairs})
+            training_ids = {training.training_id for training in trainings}
 
-            # Находим mapping по GetCourse ID с проверкой актуальности
             # ВАЖНО: mapping.student_id и mapping.training_id хранят GetCourse ID
-            # (как в webhook_processor и deadline_checker)
-            # Приводим training_getcourse_id к int для сравнения
-            try:
-                training_gc_id_int = int(training_getcourse_id)
-            except (ValueError, TypeError):
-                logger.error(
-                    f"Не удалось преобразовать training_getcourse_id '{training_getcourse_id}' в int"
-                )
-                return None
-
-            mapping_query = select(Mapping).where(
-                and_(
-                    Mapping.student_id == student.student_id,  # GetCourse ID студента
-                    Mapping.training_id == training_gc_id_int,  # GetCourse ID тренинга
-                    Mapping.valid_from <= now_utc,
-                    Mapping.valid_to >= now_utc
-                )
-            )
-            mapping_result = await session.execute(mapping_query)
-            mapping = mapping_result.scalars().first()
+            # (как в webhook_processor и deadline_checker).
+            # Первый по id mapping для пары (студент, тренинг)
+            mappings = await find_actual_in(session, Mapping, 'student_id', student_ids)
+            mapping_by_pair: Dict[Tuple[int, int], Mapping] = {}
+            for mapping in mappings:
+                mapping_by_pair.setdefault((mapping.student_id, mapping.training_id), mapping)
+
+            # Менторы по GetCourse mentor_id (первый по id)
+            mentors = await find_actual_in(session, Mentor, 'mentor_id', {m.mentor_id for m in mapping_by_pair.values()})
+            mentor_by_gc_id: Dict[int, Mentor] = {}
+            for mentor in mentors:
+                mentor_by_gc_id.setdefault(mentor.mentor_id, mentor)
+
+            resolved = {}
+            for student_getcourse_id, training_getcourse_id in pairs:
+                if student_getcourse_id not in student_ids or training_getcourse_id not in training_ids:
+                    continue
 
-            if not mapping:
-                # убрать\закомментировать логирование после тестирования
-                # logger.debug(
-                #     f"[DEBUG] Mapping не найден для student.student_id={student.student_id}, "
-                #     f"training.training_id={training.training_id}"
-                # )
-                return None
+                try:
+                    training_gc_id_int = int(training_getcourse_id)
+                except (ValueError, TypeError):
+                    logger.error(
+                        f"Не удалось преобразовать training_getcourse_id '{training_getcourse_id}' в int"
+                    )
+                    continue
 
-            # убрать\закомментировать логирование после тестирования
-            # logger.debug(
-            #     f"[DEBUG] Найден mapping: id={mapping.id}, student_id={mapping.student_id}, "
-            #     f"training_id={mapping.training_id}, mentor_id={mapping.mentor_id}, "
-            #     f"valid_from={mapping.valid_from}, valid_to={mapping.valid_to}"
-            # )
+                mapping = mapping_by_pair.get((student_getcourse_id, training_gc_id_int))
+                if not mapping:
+                    continue
 
-            # Находим ментора по его GetCourse mentor_id,
-            # чтобы вернуть внутренний mentors.id (как в webhook_processor и deadline_checker)
-            mentor_query = select(Mentor).where(
-                and_(
-                    Mentor.mentor_id == mapping.mentor_id,  # mapping.mentor_id - это GetCourse ID
-                    Mentor.valid_from <= now_utc,
-                    Mentor.valid_to >= now_utc,
-                )
-            )
-            mentor_result = await session.execute(mentor_query)
-            mentor = mentor_result.scalars().first()
+                mentor = mentor_by_gc_id.get(mapping.mentor_id)
+                if not mentor:
+                    continue
 
-            if not mentor:
-                # убрать\закомментировать логирование после тестирования
-                # logger.debug(
-                #     f"[DEBUG] Ментор с GetCourse ID {mapping.mentor_id} не найден или неактуален"
-                # )
-                return None
+                # Внутренний ID ментора (mentors.id) нужен для notifications.mentor_id
+                mentor_name = f"{mentor.first_name or ''} {mentor.last_name or ''}".strip()
+                resolved[(student_getcourse_id, training_getcourse_id)] = (mentor.id, mentor_name)
 
-            # Возвращаем внутренний ID ментора (mentors.id), который нужен для notifications.mentor_id
-            return mentor.id
+            return resolved
 
         except Exception as e:
-            logger.error(f"Ошибка при поиске ментора: {e}", exc_info=True)
-            return None
\ No newline at end of file
+            logger.error(f"Ошибка при поиске менторов: {e}", exc_info=True)
+            return {}
@@ -0,0 +1,140 @@
+"""
+Дедупликация обновлений Telegram в режиме webhook
+
+Telegram повторяет доставку обновления, если не получил ответ 200 вовремя.
+Последние update_id хранятся в кольцевом буфере фиксированного размера:
+добавление и вытеснение самого старого id - O(1).
+
+При UPDATE_DEDUP_BACKEND=postgres обновление дополнительно "захватывается"
+в таблице telegram_processed_updates (INSERT ... ON CONFLICT DO NOTHING),
+поэтому несколько реплик бота за одним webhook не обработают его дважды.
+Записи старше UPDATE_DEDUP_TTL_HOURS удаляются задачей планировщика.
+"""
+
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Hashable
+
+import pytz
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from bot.services import database
+from bot.services.database import TelegramProcessedUpdate
+
+logger = logging.getLogger(__name__)
+
+
+class RecentIds:
+    """Множество последних max_size идентификаторов с вытеснением самого старого"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._order = deque()
+        self._ids = set()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._ids
+
+    def add(self, item: Hashable) -> bool:
+        """
+        Добавление идентификатора
+
+        Args:
+            item: Идентификатор
+
+        Returns:
+            False, если идентификатор уже был в буфере
+        """
+        if item in self._ids:
+            return False
+
+        if len(self._order) >= self.max_size:
+            self._ids.discard(self._order.popleft())
+
+        self._order.append(item)
+        self._ids.add(item)
+        return True
+
+
+class UpdateDeduplicator:
+    """Проверка повторной доставки обновлений Telegram"""
+
+    def __init__(self, config):
+        self.config = config
+        self.shared = config.update_dedup_backend == "postgres"
+        self.ttl_hours = config.update_dedup_ttl_hours
+        self._recent = RecentIds(config.update_dedup_size)
+        # Статистика
+        self.duplicates = 0
+        self.shared_errors = 0
+
+    async def is_duplicate(self, update_id: int) -> bool:
+        """
+        Отмечает обновление как полученное
+
+        Args:
+            update_id: Идентификатор обновления Telegram
+
+        Returns:
+            True, если обновление уже было получено этой или другой репликой
+        """
+        if not self._recent.add(update_id):
+            self.duplicates += 1
+            return True
+
+        if not self.shared:
+            return False
+
+        try:
+            claimed = await self._claim(update_id)
+        except Exception as e:
+            # Недоступность БД не должна останавливать обработку обновлений
+            self.shared_errors += 1
+            logger.warning(f"Не удалось проверить обновление {update_id} в БД: {e}")
+            return False
+
+        if not claimed:
+            self.duplicates += 1
+            return True
+        return False
+
+    async def _claim(self, update_id: int) -> bool:
+        """Захват обновления в общей таблице (False - уже захвачено другой репликой)"""
+        async with database.async_session() as session:
+            result = await session.execute(
+                pg_insert(TelegramProcessedUpdate)
+                .values(update_id=update_id)
+                .on_conflict_do_nothing()
+                .returning(TelegramProcessedUpdate.update_id)
+            )
+            claimed = result.scalar_one_or_none() is not None
+            await session.commit()
+        return claimed
+
+    async def cleanup(self) -> int:
+        """
+        Удаление записей старше ttl_hours из общей таблицы
+
+        Returns:
+            Количество удаленных записей
+        """
+        cutoff = datetime.now(pytz.UTC) - timedelta(hours=self.ttl_hours)
+        try:
+            async with database.async_session() as session:
+                result = await session.execute(
+                    delete(TelegramProcessedUpdate)
+                    .where(TelegramProcessedUpdate.processed_at < cutoff)
+                )
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Ошибка очистки telegram_processed_updates: {e}")
+            return 0
+
+        if result.rowcount:
+            logger.info(f"Удалено записей telegram_processed_updates: {result.rowcount}")
+        return result.rowcount
@@ -0,0 +1,273 @@
+"""
+Обработка обновлений Telegram параллельными очередями чатов
+
+Webhook-обработчик только разбирает обновление, проверяет дубликат и ставит
+его в очередь, после чего сразу отвечает 200 - Telegram не ждет долгую
+обработку (например, построение табеля) и не повторяет доставку.
+В режиме long polling обновления пачки getUpdates раскладываются тем же пулом.
+
+У каждого чата своя очередь: обновления одного чата обрабатываются строго
+по порядку, очереди разных чатов - параллельно, не более UPDATE_WORKERS
+одновременно. Всего в пуле не более UPDATE_QUEUE_SIZE необработанных
+обновлений; сверх этого webhook обрабатывает обновление прямо в запросе
+(как без пула), если у его чата нет очереди, иначе ждет освобождения места,
+как и long polling.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Set
+
+import aiohttp
+from aiogram import Bot, Dispatcher, types
+
+logger = logging.getLogger(__name__)
+
+# Ожидаемые ошибки Telegram при долгой обработке - не требуют внимания
+BENIGN_ERRORS = (
+    "Query is too old",
+    "response timeout expired",
+    "Can't parse entities",
+    "character '.' is reserved",
+    "Message can't be edited",
+    "Message is not modified",
+)
+
+
+def get_update_chat_id(update: types.Update) -> int:
+    """
+    Ключ упорядочивания обновления: id чата, иначе id пользователя, иначе update_id
+
+    Args:
+        update: Обновление Telegram
+
+    Returns:
+        Идентификатор, по которому обновление закрепляется за воркером
+    """
+    message = (
+        update.message or update.edited_message
+        or update.channel_post or update.edited_channel_post
+    )
+    if message is not None:
+        return message.chat.id
+
+    if update.callback_query is not None:
+        if update.callback_query.message is not None:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+
+    for item in (update.inline_query, update.chosen_inline_result,
+                 update.shipping_query, update.pre_checkout_query,
+                 update.my_chat_member, update.chat_member, update.chat_join_request):
+        if item is not None:
+            chat = getattr(item, "chat", None)
+            return chat.id if chat is not None else item.from_user.id
+
+    return update.update_id
+
+
+class ChatOrderedWorkerPool:
+    """Пул обработки обновлений с сохранением порядка внутри чата"""
+
+    def __init__(self, config, dp: Dispatcher, bot: Bot):
+        self.config = config
+        self.dp = dp
+        self.bot = bot
+        self.max_concurrency = max(1, config.update_workers)
+        self.max_pending = max(1, config.update_queue_size)
+        # Очереди чатов; очередь существует, пока в ней есть необработанные обновления
+        self._lanes: Dict[int, Deque[types.Update]] = {}
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._pending = 0
+        self._polling = False
+        # Метрики
+        self.processed = 0
+        self.failed = 0
+        self.inline = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    def get_stats(self) -> dict:
+        """Метрики пула для экрана статуса"""
+        return {
+            'concurrency': self.max_concurrency,
+            'queue_depth': self._pending,
+            'active_chats': len(self._lanes),
+            'processed': self.processed,
+            'failed': self.failed,
+            'inline': self.inline,
+            'avg_ms': self.total_seconds / self.processed * 1000 if self.processed else 0.0,
+            'max_ms': self.max_seconds * 1000,
+        }
+
+    async def stop(self, timeout: float = 10):
+        """Остановка после обработки уже принятых обновлений (не дольше timeout)"""
+        self._polling = False
+        if not self._tasks:
+            return
+
+        _, not_done = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if not_done:
+            logger.warning(f"Не обработано обновлений при остановке: {self._pending}")
+            for task in not_done:
+                task.cancel()
+            await asyncio.gather(*not_done, return_exceptions=True)
+
+    async def submit(self, update: types.Update, wait: bool = False):
+        """
+        Постановка обновления в очередь его чата
+
+        Если пул заполнен, обновление чата без очереди обрабатывается в текущей
+        задаче; обновление чата, у которого уже есть необработанные обновления,
+        ждет места - иначе оно обогнало бы их.
+
+        Args:
+            update: Обновление Telegram
+            wait: Ждать места в заполненном пуле вместо обработки в текущей задаче
+        """
+        chat_id = get_update_chat_id(update)
+        if self._pending >= self.max_pending:
+            if not wait and chat_id not in self._lanes:
+                # Пул заполнен: обрабатываем в запросе, Telegram подождет ответа
+                self.inline += 1
+                logger.warning(f"Очередь обновлений заполнена, обновление {update.update_id} обрабатывается в запросе")
+                await self._process(update)
+                return
+
+            while self._pending >= self.max_pending:
+                self._not_full.clear()
+                await self._not_full.wait()
+
+        self._pending += 1
+        lane = self._lanes.get(chat_id)
+        if lane is not None:
+            lane.append(update)
+            return
+
+        self._lanes[chat_id] = deque([update])
+        task = asyncio.create_task(self._run_lane(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def run_polling(self, timeout: int = 20, relax: float = 0.1, error_sleep: int = 5):
+        """
+        Long polling с обработкой обновлений пулом (замена dp.start_polling)
+
+        Args:
+            timeout: Таймаут getUpdates в секундах
+            relax: Пауза между запросами getUpdates
+            error_sleep: Пауза после ошибки getUpdates
+        """
+        Bot.set_current(self.bot)
+        Dispatcher.set_current(self.dp)
+
+        # Как в dp.start_polling: таймаут HTTP-запроса больше таймаута getUpdates
+        request_timeout = None
+        if isinstance(self.bot.timeout, aiohttp.ClientTimeout) and self.bot.timeout.total:
+            request_timeout = aiohttp.ClientTimeout(total=self.bot.timeout.total + timeout)
+
+        logger.info(f"Long polling с пулом обработки обновлений (до {self.max_concurrency} чатов параллельно)")
+
+        self._polling = True
+        offset = None
+        while self._polling:
+            try:
+                with self.bot.request_timeout(request_timeout):
+                    updates = await self.bot.get_updates(offset=offset, timeout=timeout)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Ошибка получения обновлений: {e}")
+                await asyncio.sleep(error_sleep)
+                continue
+
+            for update in updates:
+                # Заполненный пул притормаживает получение следующей пачки
+                await self.submit(update, wait=True)
+                offset = update.update_id + 1
+
+            if relax:
+                await asyncio.sleep(relax)
+
+    async def _run_lane(self, chat_id: int):
+        """Последовательная обработка очереди чата"""
+        lane = self._lanes[chat_id]
+        try:
+            async with self._semaphore:
+                while lane:
+                    # Обновление остается в очереди до конца обработки:
+                    # новые обновления чата встают за ним, а не запускают вторую задачу
+                    try:
+                        await self._process(lane[0])
+                    finally:
+                        lane.popleft()
+                        self._pending -= 1
+                        self._not_full.set()
+        finally:
+            self._pending -= len(lane)
+            del self._lanes[chat_id]
+
+    async def _process(self, update: types.Update):
+        started = time.perf_counter()
+        try:
+            # Устанавливаем текущие экземпляры для aiogram
+            Bot.set_current(self.bot)
+            Dispatcher.set_current(self.dp)
+
+            await self.dp.process_update(update)
+        except Exception as e:
+            error_msg = str(e)
+            if any(marker in error_msg for marker in BENIGN_ERRORS):
+                logger.warning(f"Ошибка обработки обновления {update.update_id}: {error_msg}")
+            else:
+                self.failed += 1
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {error_msg}", exc_info=True)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.processed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+
+# Глобальный пул (None - обновления обрабатываются в webhook-запросе)
+update_worker_pool: Optional[ChatOrderedWorkerPool] = None
+
+
+def setup_update_workers(config, dp: Dispatcher, bot: Bot) -> Optional[ChatOrderedWorkerPool]:
+    """
+    Создание глобального пула обработки обновлений
+
+    Args:
+        config: Конфигурация бота
+        dp: Диспетчер бота
+        bot: Экземпляр бота
+
+    Returns:
+        Экземпляр ChatOrderedWorkerPool или None, если пул выключен
+    """
+    global update_worker_pool
+
+    if config.update_workers_enabled:
+        update_worker_pool = ChatOrderedWorkerPool(config, dp, bot)
+        logger.info(
+            f"Пул обработки обновлений включен (до {config.update_workers} чатов параллельно, "
+            f"очередь {config.update_queue_size})"
+        )
+    else:
+        update_worker_pool = None
+
+    return update_worker_pool
+
+
+def get_update_workers() -> Optional[ChatOrderedWorkerPool]:
+    """Глобальный пул обработки обновлений или None, если он выключен"""
+    return update_worker_pool
@@ -0,0 +1,338 @@
+"""
+Прием вебхуков GetCourse напрямую ботом (без n8n)
+
+Маршрут регистрируется на aiohttp-приложении бота. Проверки полей повторяют
+узел "Валидация данных" workflow n8n Getcourse_webhook_insert.
+
+Принятые события копятся в памяти и записываются в webhook_events
+многострочным INSERT раз в flush_interval мс или по набору max_rows событий.
+Ответ 200 отправляется только после коммита батча, в который попало событие;
+при ошибке записи отправляется 500, и GetCourse повторит запрос.
+Повторы уже записанных событий отбрасываются (ON CONFLICT DO NOTHING)
+и подтверждаются с id = None.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytz
+from aiohttp import web
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from bot.services import database
+from bot.services.database import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Обязательные поля согласно схеме PostgreSQL
+REQUIRED_FIELDS = ('eventDate', 'userId', 'userEmail', 'answerId')
+
+# Поле запроса -> колонка webhook_events (как в узле "Записать в БД" workflow n8n)
+STRING_FIELDS = {
+    'userEmail': 'user_email',
+    'userFirstName': 'user_first_name',
+    'userLastName': 'user_last_name',
+    'answerStatus': 'answer_status',
+    'answerText': 'answer_text',
+    'answerType': 'answer_type',
+}
+# Предел колонок INTEGER в PostgreSQL
+INT32_MAX = 2 ** 31 - 1
+
+INTEGER_FIELDS = {
+    'userId': 'user_id',
+    'answerId': 'answer_id',
+    'answerTrainingId': 'answer_training_id',
+    'answerLessonId': 'answer_lesson_id',
+    'answerTeacherId': 'answer_teacher_id',
+}
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == ''
+
+
+def _is_number(value: Any) -> bool:
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _parse_event_date(value: Any) -> Optional[datetime]:
+    """Разбор даты события (ISO 8601; без часового пояса - UTC, как в сессии БД)"""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else pytz.UTC.localize(parsed)
+
+
+def validate_webhook_payload(body: Dict[str, Any]) -> List[str]:
+    """
+    Проверка полей вебхука (как в узле "Валидация данных" n8n)
+
+    Args:
+        body: Тело вебхука
+
+    Returns:
+        Список ошибок (пустой, если данные корректны)
+    """
+    missing = [field for field in REQUIRED_FIELDS if _is_empty(body.get(field))]
+    if missing:
+        return [f"Отсутствуют обязательные поля: {', '.join(missing)}"]
+
+    errors = []
+
+    if not _is_number(body['userId']):
+        errors.append(f"userId должен быть числом, получено: {body['userId']}")
+
+    if not _is_number(body['answerId']):
+        errors.append(f"answerId должен быть числом, получено: {body['answerId']}")
+
+    if '@' not in str(body['userEmail']):
+        errors.append(f"userEmail должен быть валидным email, получено: {body['userEmail']}")
+
+    if _parse_event_date(body['eventDate']) is None:
+        errors.append(f"eventDate должен быть валидной датой, получено: {body['eventDate']}")
+
+    # Числовые поля должны помещаться в INTEGER-колонки: одна ошибочная строка
+    # не должна приводить к откату всего батча
+    for field in INTEGER_FIELDS:
+        value = body.get(field)
+        if _is_empty(value) or (field in REQUIRED_FIELDS and not _is_number(value)):
+            continue
+        if not _is_number(value) or not float(value).is_integer() or abs(float(value)) > INT32_MAX:
+            errors.append(f"{field} должен быть целым числом, получено: {value}")
+
+    return errors
+
+
+def build_webhook_row(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Строка webhook_events по проверенному телу вебхука
+
+    Args:
+        body: Тело вебхука (прошедшее validate_webhook_payload)
+
+    Returns:
+        Словарь значений колонок
+    """
+    row = {
+        'event_date': _parse_event_date(body['eventDate']),
+        'raw_payload': body,
+        'processed': False,
+    }
+    for field, column in STRING_FIELDS.items():
+        value = body.get(field)
+        row[column] = None if _is_empty(value) else str(value)
+    for field, column in INTEGER_FIELDS.items():
+        value = body.get(field)
+        row[column] = None if _is_empty(value) else int(float(value))
+    return row
+
+
+def _natural_key(row: Dict[str, Any]) -> Tuple:
+    """Естественный ключ события (как в уникальном индексе uq_webhook_events_natural_key)"""
+    return row['answer_id'], row['answer_status'] or '', row['event_date']
+
+
+class WebhookIngestBuffer:
+    """Буфер вебхуков с пакетной записью в webhook_events"""
+
+    def __init__(self, config):
+        self.config = config
+        self.flush_interval = config.ingest_flush_interval_ms / 1000
+        self.max_rows = config.ingest_flush_max_rows
+        self.max_pending = config.ingest_max_pending
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        # Принятые и еще не записанные строки: в буфере, в очереди на запись и в записи
+        self._inflight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = asyncio.Lock()
+        self._flush_tasks = set()
+        # Статистика
+        self.inserted = 0
+        self.duplicates = 0
+        self.flushes = 0
+        self.failed = 0
+
+    @property
+    def pending_count(self) -> int:
+        """Принятые строки, батч которых еще не закоммичен (включая ожидающие записи)"""
+        return self._inflight
+
+    def is_full(self, extra: int = 1) -> bool:
+        """
+        Переполнен ли буфер (новые события отклоняются с 503)
+
+        Учитываются и строки батчей, ожидающих записи: если БД не успевает,
+        батчи копятся в очереди на _flush_lock, и прием должен остановиться.
+        """
+        return self._inflight + extra > self.max_pending
+
+    def submit(self, rows: List[Dict[str, Any]]) -> List[asyncio.Future]:
+        """
+        Постановка строк в буфер
+
+        Args:
+            rows: Строки webhook_events
+
+        Returns:
+            Futures с id записей; завершаются после коммита батча
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for row in rows:
+            future = loop.create_future()
+            self._pending.append((row, future))
+            futures.append(future)
+        self._inflight += len(rows)
+
+        if len(self._pending) >= self.max_rows:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._start_flush)
+
+        return futures
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._flush(batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """Запись батча многострочным INSERT ... RETURNING id и подтверждение событий"""
+        try:
+            await self._write(batch)
+        finally:
+            self._inflight -= len(batch)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        # Батчи пишутся последовательно: порядок id совпадает с порядком приема
+        async with self._flush_lock:
+            try:
+                ids_by_key: Dict[Tuple, int] = {}
+                async with database.async_session() as session:
+                    # Чанками по 1000 строк (лимит параметров asyncpg), в одной транзакции.
+                    # Повторы уже записанных событий отбрасываются уникальным индексом
+                    # uq_webhook_events_natural_key
+                    for i in range(0, len(batch), 1000):
+                        result = await session.execute(
+                            pg_insert(WebhookEvent)
+                            .values([row for row, _ in batch[i:i + 1000]])
+                            .on_conflict_do_nothing()
+                            .returning(
+                                WebhookEvent.id,
+                                WebhookEvent.answer_id,
+                                WebhookEvent.answer_status,
+                                WebhookEvent.event_date
+                            )
+                        )
+                        for row_id, answer_id, answer_status, event_date in result.fetchall():
+                            ids_by_key[(answer_id, answer_status or '', event_date)] = row_id
+                    await session.commit()
+
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Ошибка записи батча вебхуков ({len(batch)} шт.): {e}", exc_info=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.inserted += len(ids_by_key)
+            self.duplicates += len(batch) - len(ids_by_key)
+            self.flushes += 1
+            logger.debug(f"Записано вебхуков: {len(ids_by_key)}, повторов: {len(batch) - len(ids_by_key)}")
+
+            # Повтор (уже записанное событие) подтверждается с id None - GetCourse не должен его повторять
+            for row, future in batch:
+                row_id = ids_by_key.pop(_natural_key(row), None)
+                if not future.done():
+                    future.set_result(row_id)
+
+    async def close(self):
+        """Запись оставшихся событий при остановке"""
+        self._start_flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+
+async def _read_body(request: web.Request) -> Any:
+    """Тело запроса: JSON (объект или список) либо форма"""
+    if request.content_type == 'application/json':
+        return await request.json()
+    return dict(await request.post())
+
+
+def register_ingest_routes(app: web.Application, config) -> WebhookIngestBuffer:
+    """
+    Регистрация маршрута приема вебхуков GetCourse
+
+    Args:
+        app: aiohttp-приложение бота
+        config: Конфигурация бота
+
+    Returns:
+        Буфер вебхуков (остаток записывается при остановке приложения)
+    """
+    buffer = WebhookIngestBuffer(config)
+
+    async def ingest_handler(request: web.Request) -> web.Response:
+        try:
+            body = await _read_body(request)
+        except Exception as e:
+            logger.warning(f"Вебхук GetCourse с некорректным телом: {e}")
+            return web.json_response({'error': 'Некорректное тело запроса'}, status=400)
+
+        # Один вебхук или список (пакетная отправка)
+        items = body if isinstance(body, list) else [body]
+        if not items or not all(isinstance(item, dict) for item in items):
+            return web.json_response({'error': 'Ожидается объект или список объектов'}, status=400)
+
+        errors = []
+        for index, item in enumerate(items):
+            for error in validate_webhook_payload(item):
+                errors.append(error if len(items) == 1 else f"[{index}] {error}")
+        if errors:
+            logger.warning(f"Ошибки валидации вебхука GetCourse: {'; '.join(errors)}")
+            return web.json_response({'errors': errors}, status=400)
+
+        if buffer.is_full(len(items)):
+            logger.warning(f"Буфер вебхуков переполнен ({buffer.pending_count}), запрос отклонен")
+            return web.json_response({'error': 'Буфер переполнен, повторите позже'}, status=503)
+
+        futures = buffer.submit([build_webhook_row(item) for item in items])
+        try:
+            ids = await asyncio.gather(*futures)
+        except Exception:
+            return web.json_response({'error': 'Ошибка записи в БД'}, status=500)
+
+        return web.json_response({'ids': ids})
+
+    async def on_cleanup(app):
+        await buffer.close()
+
+    app.router.add_post(config.ingest_path, ingest_handler)
+    app.on_cleanup.append(on_cleanup)
+    app['ingest_buffer'] = buffer
+
+    logger.info(
+        f"Прием вебхуков GetCourse: POST {config.ingest_path} "
+        f"(flush {config.ingest_flush_interval_ms} мс / {config.ingest_flush_max_rows} строк)"
+    )
+    return buffer
@@ -7,22 +7,90 @@
 
 import hashlib
 import logging
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
 
 import pytz
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, values, column, literal_column, and_, or_, func, BigInteger, Text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.services.database import (
-    get_session, WebhookEvent, Notification, Mentor, Student,
-    Training, Lesson, Mapping
+    get_session, WebhookEvent, Mentor, Student,
+    Training, Lesson, Mapping, StudentLessonFirstAnswer
 )
+from bot.services.gradebook_service import invalidate_mentor_summaries
 from bot.services.notification_calculator import NotificationCalculationService
+from bot.services.reference_cache import find_actual_in
 
 logger = logging.getLogger(__name__)
 
 
+class WebhookBatchContext:
+    """
+    Справочные данные, предзагруженные для батча вебхуков
+
+    Ключи словарей - GetCourse ID (как в таблицах справочников)
+    """
+
+    def __init__(self):
+        self.students: Dict[int, Student] = {}              # students.student_id -> Student
+        self.trainings: Dict[str, Training] = {}            # trainings.training_id -> Training
+        self.lessons: Dict[str, Lesson] = {}                # lessons.lesson_id -> Lesson
+        self.mappings: Dict[Tuple[int, int], Mapping] = {}  # (student_id, training_id) -> Mapping
+        self.mentors: Dict[int, Mentor] = {}                # mentors.mentor_id -> Mentor
+
+    def find_mentor(self, student_getcourse_id: int, training_getcourse_id: int) -> Optional[Mentor]:
+        """
+        Поиск наставника студента в тренинге (аналог find_mentor_for_student)
+
+        Args:
+            student_getcourse_id: ID студента из GetCourse
+            training_getcourse_id: ID тренинга из GetCourse
+
+        Returns:
+            Объект Mentor или None
+        """
+        student = self.students.get(student_getcourse_id)
+        if not student:
+            logger.warning(f"Студент с GetCourse ID {student_getcourse_id} не найден")
+            return None
+
+        training = self.trainings.get(str(training_getcourse_id))
+        if not training:
+            logger.warning(f"Тренинг {training_getcourse_id} не найден")
+            return None
+
+        mapping = self.mappings.get((student.student_id, training_getcourse_id))
+        if not mapping:
+            logger.warning(
+                f"Mapping не найден для студента {student.id} "
+                f"и тренинга {training.id}"
+            )
+            return None
+
+        return self.mentors.get(mapping.mentor_id)
+
+    def mentor_ids_for(self, webhooks: List[WebhookEvent]) -> Set[int]:
+        """
+        Внутренние ID наставников (Mentor.id) студентов из вебхуков, без логирования
+
+        Args:
+            webhooks: Вебхуки батча
+
+        Returns:
+            Множество Mentor.id
+        """
+        mentor_ids = set()
+        for webhook in webhooks:
+            mapping = self.mappings.get((webhook.user_id, webhook.answer_training_id))
+            mentor = self.mentors.get(mapping.mentor_id) if mapping else None
+            if mentor:
+                mentor_ids.add(mentor.id)
+        return mentor_ids
+
+
 class WebhookProcessingService:
     """Сервис обработки вебхуков от GetCourse"""
 
@@ -30,40 +98,60 @@ class WebhookProcessingService:
         self.config = config
         self.notification_calculator = NotificationCalculationService(config)
         self.moscow_tz = pytz.timezone('Europe/Moscow')
-
-    async def process_pending_webhooks(self):
+        # Счетчики точечных откатов (SAVEPOINT) с момента запуска
+        self.stats = {
+            'batch_fallbacks': 0,     # батчей, где пакетная вставка упала и выполнялась по событиям
+            'event_rollbacks': 0,     # событий, откаченных до своего SAVEPOINT
+            'rollbacks_avoided': 0,   # событий, сохраненных вместо отката всего батча
+        }
+
+    async def process_pending_webhooks(self) -> bool:
         """
         Главный метод обработки необработанных вебхуков
 
         Читает записи с processed = false и обрабатывает их
+
+        Returns:
+            True, если батч был полным и в очереди могут остаться вебхуки
         """
         try:
             async for session in get_session():
-                # Получаем необработанные вебхуки (батчами)
-                batch_size = self.config.webhook_batch_size
+                # Забираем в аренду батч необработанных вебхуков
+                webhook_ids = await self.claim_pending_webhooks(session)
+
+                if not webhook_ids:
+                    logger.debug("Нет необработанных вебхуков")
+                    return False
 
                 query = select(WebhookEvent).where(
-                    WebhookEvent.processed.is_(False)
-                ).order_by(WebhookEvent.created_at).limit(batch_size)
+                    WebhookEvent.id.in_(webhook_ids)
+                ).order_by(WebhookEvent.created_at)
 
                 result = await session.execute(query)
                 webhooks = result.scalars().all()
 
-                if not webhooks:
-                    logger.debug("Нет необработанных вебхуков")
-                    return
-
                 logger.info(f"Найдено {len(webhooks)} необработанных вебхуков")
 
-                # Обрабатываем каждый вебхук
+                # Справочные данные для всего батча - фиксированным числом запросов
+                context = await self.load_batch_context(session, webhooks)
+
+                # Обрабатываем каждый вебхук; итоги записываются в БД пакетно после цикла
                 processed_count = 0
                 error_count = 0
+                processed_ids: List[int] = []
+                errors: Dict[int, str] = {}
+                # Уведомления по вебхукам: при ошибке вставки откатывается только свой вебхук
+                notification_rows: Dict[int, List[Dict]] = {}
 
                 for webhook in webhooks:
                     try:
                         # Определяем тип события и обрабатываем
                         if webhook.answer_status and webhook.answer_status.lower() in ['new', 'accepted']:
-                            await self.process_answer_to_lesson(session, webhook)
+                            webhook_rows: List[Dict] = []
+                            await self.process_answer_to_lesson(
+                                session, webhook, context, pending_notifications=webhook_rows
+                            )
+                            notification_rows[webhook.id] = webhook_rows
                             processed_count += 1
                         else:
                             logger.warning(
@@ -72,29 +160,421 @@ class WebhookProcessingService:
                             )
 
                         # Помечаем вебхук как обработанный
-                        webhook.processed = True
-                        webhook.processed_at = datetime.now(pytz.UTC)
+                        processed_ids.append(webhook.id)
 
                     except Exception as e:
                         logger.error(f"Ошибка обработки webhook {webhook.id}: {e}", exc_info=True)
-                        webhook.error_message = str(e)[:500]  # Сохраняем ошибку
+                        errors[webhook.id] = str(e)[:500]  # Сохраняем ошибку
                         error_count += 1
 
+                # Новые уведомления - одним multi-row INSERT (при ошибке - по вебхукам в SAVEPOINT)
+                failed_count = await self.insert_batch_notifications(
+                    session, notification_rows, processed_ids, errors
+                )
+                processed_count -= failed_count
+                error_count += failed_count
+
+                # Статусы вебхуков - по одному UPDATE на вид результата
+                await self.mark_webhooks(session, processed_ids, errors)
+
+                # Обновляем первые ответы студентов на уроки (для табеля).
+                # Таблица производная (восполняется повторным запуском миграции 003), ее ошибка не откатывает батч
+                try:
+                    async with session.begin_nested():
+                        await self.record_first_answers(session, webhooks)
+                except SQLAlchemyError as e:
+                    logger.error(f"Ошибка обновления первых ответов студентов: {e}", exc_info=True)
+
                 # Коммитим все изменения
                 await session.commit()
 
+                # Новые ответы меняют табель наставников - сбрасываем их сводки
+                invalidate_mentor_summaries(context.mentor_ids_for(webhooks))
+
                 logger.info(
                     f"Обработка завершена: успешно={processed_count}, "
                     f"ошибок={error_count}"
                 )
 
+                return len(webhook_ids) >= self.config.webhook_batch_size
+
         except Exception as e:
             logger.error(f"Критическая ошибка при обработке вебхуков: {e}", exc_info=True)
 
+        return False
+
+    async def insert_batch_notifications(
+        self,
+        session: AsyncSession,
+        notification_rows: Dict[int, List[Dict]],
+        processed_ids: List[int],
+        errors: Dict[int, str]
+    ) -> int:
+        """
+        Вставка уведомлений батча с откатом только проблемных вебхуков
+
+        Сначала все уведомления вставляются одним multi-row INSERT в SAVEPOINT.
+        Если он падает (нарушение ограничения и т.п.), вставка повторяется
+        по вебхукам, каждый в своем SAVEPOINT: вебхук с ошибкой переносится
+        из processed_ids в errors, остальные сохраняются.
+        Не коммитит - коммит в вызывающем методе.
+
+        Args:
+            session: Сессия БД
+            notification_rows: {ID вебхука: строки notifications}
+            processed_ids: ID успешно обработанных вебхуков (изменяется)
+            errors: {ID вебхука: текст ошибки} (изменяется)
+
+        Returns:
+            Число вебхуков, перенесенных в ошибки
+        """
+        all_rows = [row for rows in notification_rows.values() for row in rows]
+        if not all_rows:
+            return 0
+
+        try:
+            async with session.begin_nested():
+                await self.notification_calculator.insert_notifications(session, all_rows)
+            return 0
+        except SQLAlchemyError as e:
+            logger.warning(
+                f"Пакетная вставка {len(all_rows)} уведомлений не удалась, "
+                f"повтор по вебхукам: {e}"
+            )
+            self.stats['batch_fallbacks'] += 1
+
+        failed_ids = set()
+        for webhook_id, rows in notification_rows.items():
+            if not rows:
+                continue
+            try:
+                async with session.begin_nested():
+                    await self.notification_calculator.insert_notifications(session, rows)
+            except SQLAlchemyError as e:
+                logger.error(f"Ошибка записи уведомлений для webhook {webhook_id}: {e}", exc_info=True)
+                errors[webhook_id] = str(e)[:500]
+                failed_ids.add(webhook_id)
+
+        processed_ids[:] = [webhook_id for webhook_id in processed_ids if webhook_id not in failed_ids]
+
+        self.stats['event_rollbacks'] += len(failed_ids)
+        self.stats['rollbacks_avoided'] += len(processed_ids)
+        logger.info(
+            f"Откат по SAVEPOINT: откачено вебхуков {len(failed_ids)}, сохранено {len(processed_ids)} "
+            f"(всего с запуска: откачено {self.stats['event_rollbacks']}, "
+            f"сохранено {self.stats['rollbacks_avoided']})"
+        )
+
+        return len(failed_ids)
+
+    async def mark_webhooks(
+        self,
+        session: AsyncSession,
+        processed_ids: List[int],
+        errors: Dict[int, str]
+    ):
+        """
+        Запись результатов обработки батча вебхуков
+
+        Обработанные помечаются одним UPDATE ... WHERE id IN, ошибки -
+        одним UPDATE ... FROM (VALUES ...). В обоих случаях снимается аренда.
+        Обновляются только строки, аренда которых еще у этого воркера: если
+        аренда истекла и вебхук забрала другая реплика, результат не пишется.
+        Вебхук с ошибкой получает следующую попытку через
+        webhook_retry_base_seconds * 2^(попытка-1) (не больше webhook_retry_max_seconds),
+        после webhook_max_attempts попыток - уходит в карантин (dead_lettered).
+        Не коммитит - коммит в вызывающем методе.
+
+        Args:
+            session: Сессия БД
+            processed_ids: ID успешно обработанных вебхуков
+            errors: {ID вебхука: текст ошибки}
+        """
+        if processed_ids:
+            result = await session.execute(
+                update(WebhookEvent)
+                .where(
+                    WebhookEvent.id.in_(processed_ids),
+                    WebhookEvent.locked_by == self.config.worker_id
+                )
+                .values(
+                    processed=True,
+                    processed_at=datetime.now(pytz.UTC),
+                    locked_by=None,
+                    locked_until=None
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != len(processed_ids):
+                logger.warning(
+                    f"Потеряна аренда {len(processed_ids) - result.rowcount} из {len(processed_ids)} "
+                    f"обработанных вебхуков: их забрала другая реплика"
+                )
+
+        if errors:
+            error_rows = values(
+                column('id', BigInteger),
+                column('error_message', Text),
+                name='webhook_errors'
+            ).data(list(errors.items()))
+
+            # В SET используются значения attempts до обновления
+            retry_delay = func.least(
+                self.config.webhook_retry_base_seconds * func.power(2, WebhookEvent.attempts),
+                self.config.webhook_retry_max_seconds
+            )
+
+            result = await session.execute(
+                update(WebhookEvent)
+                .where(
+                    WebhookEvent.id == error_rows.c.id,
+                    WebhookEvent.locked_by == self.config.worker_id
+                )
+                .values(
+                    error_message=error_rows.c.error_message,
+                    attempts=WebhookEvent.attempts + 1,
+                    next_attempt_at=func.now() + retry_delay * literal_column("interval '1 second'"),
+                    dead_lettered=WebhookEvent.attempts + 1 >= self.config.webhook_max_attempts,
+                    locked_by=None,
+                    locked_until=None
+                )
+                .returning(WebhookEvent.id, WebhookEvent.attempts, WebhookEvent.dead_lettered)
+                .execution_options(synchronize_session=False)
+            )
+
+            rows = result.all()
+            if len(rows) != len(errors):
+                lost_ids = set(errors) - {row[0] for row in rows}
+                logger.warning(
+                    f"Потеряна аренда вебхуков с ошибкой (забрала другая реплика): {sorted(lost_ids)}"
+                )
+
+            for webhook_id, attempts, dead_lettered in rows:
+                if dead_lettered:
+                    logger.error(
+                        f"Webhook {webhook_id} помещен в карантин после {attempts} попыток: "
+                        f"{errors[webhook_id]}"
+                    )
+
+    async def get_dead_lettered_webhooks(
+        self,
+        session: AsyncSession,
+        limit: int = 10
+    ) -> Tuple[int, List[WebhookEvent]]:
+        """
+        Вебхуки в карантине (для администратора)
+
+        Args:
+            session: Сессия БД
+            limit: Максимальное число возвращаемых вебхуков
+
+        Returns:
+            (общее число вебхуков в карантине, последние вебхуки)
+        """
+        total = await session.scalar(
+            select(func.count()).select_from(WebhookEvent).where(WebhookEvent.dead_lettered.is_(True))
+        )
+        result = await session.execute(
+            select(WebhookEvent)
+            .where(WebhookEvent.dead_lettered.is_(True))
+            .order_by(WebhookEvent.id.desc())
+            .limit(limit)
+        )
+        return total or 0, result.scalars().all()
+
+    async def requeue_dead_lettered_webhooks(
+        self,
+        session: AsyncSession,
+        webhook_ids: Optional[List[int]] = None
+    ) -> int:
+        """
+        Возврат вебхуков из карантина в очередь (счетчик попыток сбрасывается)
+
+        Args:
+            session: Сессия БД
+            webhook_ids: ID вебхуков (если None - все вебхуки в карантине)
+
+        Returns:
+            Число возвращенных вебхуков
+        """
+        conditions = [WebhookEvent.dead_lettered.is_(True), WebhookEvent.processed.is_(False)]
+        if webhook_ids is not None:
+            conditions.append(WebhookEvent.id.in_(webhook_ids))
+
+        result = await session.execute(
+            update(WebhookEvent)
+            .where(and_(*conditions))
+            .values(dead_lettered=False, attempts=0, next_attempt_at=None)
+            .returning(WebhookEvent.id)
+            .execution_options(synchronize_session=False)
+        )
+        requeued = len(result.all())
+        await session.commit()
+
+        logger.info(f"Возвращено в очередь вебхуков из карантина: {requeued}")
+        return requeued
+
+    async def record_first_answers(
+        self,
+        session: AsyncSession,
+        webhooks: List[WebhookEvent]
+    ):
+        """
+        Инкрементальное обновление student_lesson_first_answers по батчу вебхуков
+
+        Учитываются ответы со статусами new/accepted (как в табеле).
+        Один multi-row UPSERT, first_answer_at = LEAST(старое, новое).
+        Не коммитит - коммит в вызывающем методе.
+
+        Args:
+            session: Сессия БД
+            webhooks: Вебхуки батча
+        """
+        # Минимум внутри батча: одна строка на ключ для ON CONFLICT DO UPDATE
+        earliest: Dict[Tuple[str, int], datetime] = {}
+        for webhook in webhooks:
+            if (
+                webhook.answer_lesson_id is None
+                or not webhook.user_email
+                or webhook.answer_status not in ('new', 'accepted')
+            ):
+                continue
+            key = (webhook.user_email, webhook.answer_lesson_id)
+            if key not in earliest or webhook.event_date < earliest[key]:
+                earliest[key] = webhook.event_date
+
+        if not earliest:
+            return
+
+        stmt = pg_insert(StudentLessonFirstAnswer).values([
+            {
+                'user_email': user_email,
+                'answer_lesson_id': answer_lesson_id,
+                'first_answer_at': first_answer_at,
+            }
+            for (user_email, answer_lesson_id), first_answer_at in earliest.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_email', 'answer_lesson_id'],
+            set_={
+                'first_answer_at': func.least(
+                    StudentLessonFirstAnswer.first_answer_at,
+                    stmt.excluded.first_answer_at
+                ),
+                'updated_at': func.now(),
+            }
+        )
+        await session.execute(stmt)
+
+    async def claim_pending_webhooks(self, session: AsyncSession) -> List[int]:
+        """
+        Аренда батча необработанных вебхуков текущим экземпляром бота
+
+        Строки выбираются через FOR UPDATE SKIP LOCKED, поэтому параллельные
+        реплики получают непересекающиеся батчи. Вебхуки с истекшим сроком
+        аренды (экземпляр упал во время обработки) снова доступны для выбора.
+        Вебхуки в карантине и вебхуки, время повторной попытки которых
+        не наступило, пропускаются.
+        Аренда коммитится сразу, чтобы не держать блокировки во время обработки.
+
+        Args:
+            session: Сессия БД
+
+        Returns:
+            Список ID арендованных вебхуков
+        """
+        now_utc = datetime.now(pytz.UTC)
+
+        candidates = select(WebhookEvent.id).where(
+            and_(
+                WebhookEvent.processed.is_(False),
+                WebhookEvent.dead_lettered.is_(False),
+                # Вебхуки с ошибкой ждут своей попытки и не блокируют очередь
+                or_(
+                    WebhookEvent.next_attempt_at.is_(None),
+                    WebhookEvent.next_attempt_at <= now_utc,
+                ),
+                or_(
+                    WebhookEvent.locked_until.is_(None),
+                    WebhookEvent.locked_until < now_utc,
+                ),
+            )
+        ).order_by(
+            WebhookEvent.created_at
+        ).limit(
+            self.config.webhook_batch_size
+        ).with_for_update(skip_locked=True)
+
+        result = await session.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id.in_(candidates.scalar_subquery()))
+            .values(
+                locked_by=self.config.worker_id,
+                locked_until=now_utc + timedelta(seconds=self.config.webhook_lease_seconds),
+            )
+            .returning(WebhookEvent.id)
+            .execution_options(synchronize_session=False)
+        )
+        webhook_ids = [row[0] for row in result.all()]
+        await session.commit()
+
+        return webhook_ids
+
+    async def load_batch_context(
+        self,
+        session: AsyncSession,
+        webhooks: List[WebhookEvent]
+    ) -> "WebhookBatchContext":
+        """
+        Загрузка справочных данных для батча вебхуков
+
+        Собирает GetCourse ID студентов, тренингов и уроков всего батча
+        и загружает студентов, тренинги, уроки, mapping и менторов
+        пятью запросами IN (...) (или из кэша справочников)
+        вместо нескольких запросов на каждый вебхук.
+
+        Args:
+            session: Сессия БД
+            webhooks: Вебхуки батча
+
+        Returns:
+            WebhookBatchContext со словарями справочных данных
+        """
+        context = WebhookBatchContext()
+
+        student_ids = {w.user_id for w in webhooks if w.user_id is not None}
+        training_ids = {w.answer_training_id for w in webhooks if w.answer_training_id is not None}
+        lesson_ids = {str(w.answer_lesson_id) for w in webhooks if w.answer_lesson_id is not None}
+
+        # Справочники читаются через кэш (если включен), иначе запросами IN (...)
+        for student in await find_actual_in(session, Student, 'student_id', student_ids):
+            context.students.setdefault(student.student_id, student)
+
+        for training in await find_actual_in(
+            session, Training, 'training_id', [str(t) for t in training_ids]
+        ):
+            context.trainings.setdefault(training.training_id, training)
+
+        for lesson in await find_actual_in(session, Lesson, 'lesson_id', lesson_ids):
+            context.lessons.setdefault(lesson.lesson_id, lesson)
+
+        # В таблице mapping хранятся GetCourse ID студента, ментора и тренинга
+        for mapping in await find_actual_in(session, Mapping, 'student_id', list(context.students)):
+            if mapping.training_id in training_ids:
+                context.mappings.setdefault((mapping.student_id, mapping.training_id), mapping)
+
+        mentor_ids = {mapping.mentor_id for mapping in context.mappings.values()}
+        for mentor in await find_actual_in(session, Mentor, 'mentor_id', mentor_ids):
+            context.mentors.setdefault(mentor.mentor_id, mentor)
+
+        return context
+
     async def process_answer_to_lesson(
         self,
         session: AsyncSession,
-        webhook_event: WebhookEvent
+        webhook_event: WebhookEvent,
+        context: Optional["WebhookBatchContext"] = None,
+        pending_notifications: Optional[List[Dict]] = None
     ):
         """
         Обработка ответа на урок
@@ -104,13 +584,20 @@ class WebhookProcessingService:
         Args:
             session: Сессия БД
             webhook_event: Событие вебхука
+            context: Предзагруженные справочные данные батча
+                (если не передан - данные запрашиваются из БД)
+            pending_notifications: Список для накопления уведомлений батча
+                (см. create_notification)
         """
         # 1. Найти наставника для этого студента и тренинга
-        mentor = await self.find_mentor_for_student(
-            session,
-            webhook_event.user_id,
-            webhook_event.answer_training_id
-        )
+        if context is not None:
+            mentor = context.find_mentor(webhook_event.user_id, webhook_event.answer_training_id)
+        else:
+            mentor = await self.find_mentor_for_student(
+                session,
+                webhook_event.user_id,
+                webhook_event.answer_training_id
+            )
 
         if not mentor:
             logger.warning(
@@ -120,14 +607,20 @@ class WebhookProcessingService:
             return
 
         # 2. Получить информацию об уроке
-        lesson = await self.get_lesson_info(session, webhook_event.answer_lesson_id)
+        if context is not None:
+            lesson = context.lessons.get(str(webhook_event.answer_lesson_id))
+        else:
+            lesson = await self.get_lesson_info(session, webhook_event.answer_lesson_id)
 
         if not lesson:
             logger.warning(f"Не найден урок {webhook_event.answer_lesson_id}")
             return
 
         # 3. Получить информацию о тренинге
-        training = await self.get_training_info(session, webhook_event.answer_training_id)
+        if context is not None:
+            training = context.trainings.get(str(webhook_event.answer_training_id))
+        else:
+            training = await self.get_training_info(session, webhook_event.answer_training_id)
 
         if not training:
             logger.warning(f"Не найден тренинг {webhook_event.answer_training_id}")
@@ -144,13 +637,25 @@ class WebhookProcessingService:
             user_id=webhook_event.user_id
         )
 
-        # 5. Создать уведомление
+        # 5. Создать уведомление (повторная обработка того же ответа дает ту же сигнатуру
+        # и не создает второе уведомление)
+        message_hash = self.notification_calculator.calculate_message_signature({
+            'mentor_id': mentor.id,
+            'type': 'answerToLesson',
+            'lesson_id': webhook_event.answer_lesson_id,
+            'student_id': webhook_event.user_id,
+            'training_id': webhook_event.answer_training_id,
+            'event_key': f"{webhook_event.answer_id}|{webhook_event.answer_status}",
+        })
+
         await self.create_notification(
             session,
             mentor_id=mentor.id,
             notification_type='answerToLesson',
             message=message,
-            webhook_event_id=webhook_event.id
+            webhook_event_id=webhook_event.id,
+            pending=pending_notifications,
+            message_hash=message_hash
         )
 
         logger.info(
@@ -313,7 +818,9 @@ class WebhookProcessingService:
         mentor_id: int,
         notification_type: str,
         message: str,
-        webhook_event_id: Optional[int] = None
+        webhook_event_id: Optional[int] = None,
+        pending: Optional[List[Dict]] = None,
+        message_hash: Optional[str] = None
     ):
         """
         Создание уведомления в таблице notifications
@@ -324,28 +831,36 @@ class WebhookProcessingService:
             notification_type: Тип уведомления
             message: Текст сообщения
             webhook_event_id: ID вебхука-источника (опционально)
+            pending: Список для накопления строк батча; если передан,
+                уведомление вставляется вызывающим методом (multi-row INSERT)
+            message_hash: Сигнатура события (calculate_message_signature);
+                если не передана - считается по вебхуку и тексту сообщения
         """
         try:
-            # Вычисляем хеш сообщения для дедупликации
-            # Используем комбинацию полей, которые однозначно описывают событие
-            payload_for_hash = f"{mentor_id}|{notification_type}|{webhook_event_id}|{message}"
-            message_hash = hashlib.sha256(payload_for_hash.encode("utf-8")).hexdigest()
+            if message_hash is None:
+                # Вычисляем хеш сообщения для дедупликации
+                # Используем комбинацию полей, которые однозначно описывают событие
+                payload_for_hash = f"{mentor_id}|{notification_type}|{webhook_event_id}|{message}"
+                message_hash = hashlib.sha256(payload_for_hash.encode("utf-8")).hexdigest()
 
             now_utc = datetime.now(pytz.UTC)
 
-            notification = Notification(
-                mentor_id=mentor_id,
-                type=notification_type,
-                message=message,
-                status='pending',
-                webhook_event_id=webhook_event_id,
-                message_hash=message_hash,
-                created_at=now_utc
-            )
-
-            session.add(notification)
+            row = {
+                'mentor_id': mentor_id,
+                'type': notification_type,
+                'message': message,
+                'status': 'pending',
+                'webhook_event_id': webhook_event_id,
+                'message_hash': message_hash,
+                'created_at': now_utc,
+            }
+
+            if pending is not None:
+                pending.append(row)
+            else:
+                await self.notification_calculator.insert_notifications(session, [row])
             # Не коммитим здесь - коммит будет в основном методе
 
         except Exception as e:
             logger.error(f"Ошибка при создании уведомления: {e}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Ограниченный по размеру LRU-кэш с временем жизни записей"""
+
+    def __init__(self, max_size: int = 10000):
+        """
+        Args:
+            max_size: Максимальное число записей (при превышении вытесняются давно не использованные)
+        """
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Optional[Any]]:
+        """
+        Получение значения из кэша
+
+        Returns:
+            (найдено, значение)
+        """
+        item = self._data.get(key)
+        if item is not None:
+            value, expires_at = item
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._data[key]
+
+        self.misses += 1
+        return False, None
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """
+        Сохранение значения в кэш
+
+        Args:
+            key: Ключ
+            value: Значение
+            ttl: Время жизни записи в секундах
+        """
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Удаление записи из кэша (если есть)"""
+        self._data.pop(key, None)
+
+    def keys(self) -> list:
+        """Ключи записей (включая еще не удаленные просроченные)"""
+        return list(self._data.keys())
+
+    def clear(self):
+        """Очистка кэша (счетчики сохраняются)"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля попаданий в кэш"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
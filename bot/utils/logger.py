@@ -1,21 +1,70 @@
+import atexit
 import logging
 import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Optional, List
 import asyncio
 from aiogram import Bot
-from sqlalchemy import delete
+from sqlalchemy import delete, insert
 import bot.services.database as db
 
+# Фоновый поток записи логов в файлы и консоль
+log_listener: Optional[QueueListener] = None
+
+# Активный обработчик записи логов в БД (для статистики на экране статуса)
+db_log_handler = None
+
+# Уровни, которые дублируются в error_logs и вытесняются из очереди в последнюю очередь
+ERROR_LEVELS = ('WARNING', 'ERROR', 'CRITICAL')
+
 class DatabaseHandler(logging.Handler):
-    """Обработчик для записи логов в базу данных"""
+    """
+    Обработчик для записи логов в базу данных
+
+    Записи копятся в ограниченной очереди и пишутся пачками: по набору
+    batch_size записей или раз в flush_interval секунд, одним многострочным
+    INSERT на таблицу. При переполнении очереди вытесняется самая старая
+    запись DEBUG/INFO, а если таких нет - самая старая запись WARNING и выше.
+    """
 
-    def __init__(self, level=logging.NOTSET):
+    def __init__(self, level=logging.NOTSET, max_queue_size: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 5.0):
         super().__init__(level)
-        self._queue = asyncio.Queue()
+        self.max_queue_size = max(1, max_queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        # Две очереди: записи WARNING+ вытесняются только после DEBUG/INFO
+        self._regular = deque()
+        self._errors = deque()
         self._task = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        # Статистика
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._regular) + len(self._errors)
+
+    def get_stats(self) -> dict:
+        """Счетчики для экрана статуса"""
+        return {
+            'queued': self.queued,
+            'max_queue_size': self.max_queue_size,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes,
+        }
 
     def emit(self, record):
         """Добавляет запись в очередь для асинхронной записи в БД"""
@@ -37,88 +86,111 @@ class DatabaseHandler(logging.Handler):
                 'traceback': traceback
             }
 
-            # Добавляем в очередь (неблокирующе)
-            try:
-                self._queue.put_nowait(log_data)
-            except asyncio.QueueFull:
-                # Если очередь переполнена, просто игнорируем
-                pass
+            is_error = log_data['level'] in ERROR_LEVELS
+
+            # Очередь заполнена - вытесняем самую старую запись с наименьшим приоритетом
+            if self.queued >= self.max_queue_size:
+                if self._regular:
+                    self._regular.popleft()
+                elif is_error:
+                    self._errors.popleft()
+                else:
+                    # В очереди только ошибки - отбрасываем новую запись DEBUG/INFO
+                    self.dropped += 1
+                    return
+                self.dropped += 1
+
+            (self._errors if is_error else self._regular).append(log_data)
+
+            # Набралась пачка - будим запись, не дожидаясь интервала
+            if self.queued >= self.batch_size and self._loop is not None:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
 
         except Exception:
             # Не логируем ошибки логирования
             pass
 
+    def _take_batch(self) -> List[dict]:
+        """Извлечение пачки записей из очереди (сначала WARNING и выше)"""
+        batch = []
+        for pending in (self._errors, self._regular):
+            while pending and len(batch) < self.batch_size:
+                batch.append(pending.popleft())
+        return batch
+
+    async def _write_batch(self, batch: List[dict]):
+        """Запись пачки: один многострочный INSERT в application_logs и один в error_logs"""
+        app_rows = []
+        error_rows = []
+        for log_data in batch:
+            row = {
+                'timestamp': log_data['timestamp'],
+                'level': log_data['level'],
+                'logger_name': log_data['logger_name'],
+                'message': log_data['message'],
+                'module': log_data['module'],
+                'function': log_data['function'],
+                'line': log_data['line'],
+            }
+            app_rows.append(row)
+
+            # Ошибки дублируются в отдельную таблицу
+            if log_data['level'] in ERROR_LEVELS:
+                error_rows.append({**row, 'traceback': log_data['traceback']})
+
+        async with db.async_session() as session:
+            # Чанками по 1000 строк (лимит параметров asyncpg)
+            for i in range(0, len(app_rows), 1000):
+                await session.execute(insert(db.ApplicationLog).values(app_rows[i:i + 1000]))
+            for i in range(0, len(error_rows), 1000):
+                await session.execute(insert(db.ErrorLog).values(error_rows[i:i + 1000]))
+            await session.commit()
+
+    async def write_pending(self):
+        """Запись всех накопленных записей в БД"""
+        if db.async_session is None:
+            return
+
+        async with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                try:
+                    await self._write_batch(batch)
+                except Exception as db_error:
+                    # Пачка теряется: повторная запись могла бы зациклиться на ошибочной записи
+                    self.failed += len(batch)
+                    print(f"Ошибка записи в БД: {db_error}", file=sys.stderr)
+                    return
+                self.written += len(batch)
+                self.flushes += 1
+
     async def _write_to_db(self):
-        """Асинхронная запись логов в БД"""
+        """Асинхронная запись логов в БД по набору пачки или по интервалу"""
         while True:
             try:
-                # Проверяем, что async_session инициализирован
-                if db.async_session is None:
-                    await asyncio.sleep(5)
-                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
 
-                # Получаем все записи из очереди
-                logs_to_write = []
-                errors_to_write = []
-
-                # Собираем записи (максимум 100 за раз)
-                for _ in range(100):
-                    try:
-                        log_data = self._queue.get_nowait()
-                        logs_to_write.append(log_data)
-
-                        # Если это ошибка, добавляем и в таблицу ошибок
-                        if log_data['level'] in ['WARNING', 'ERROR', 'CRITICAL']:
-                            errors_to_write.append(log_data)
-
-                    except asyncio.QueueEmpty:
-                        break
-
-                if logs_to_write:
-                    try:
-                        async with db.async_session() as session:
-                            # Записываем все логи
-                            for log_data in logs_to_write:
-                                app_log = db.ApplicationLog(
-                                    timestamp=log_data['timestamp'],
-                                    level=log_data['level'],
-                                    logger_name=log_data['logger_name'],
-                                    message=log_data['message'],
-                                    module=log_data['module'],
-                                    function=log_data['function'],
-                                    line=log_data['line']
-                                )
-                                session.add(app_log)
-
-                            # Записываем ошибки отдельно
-                            for log_data in errors_to_write:
-                                error_log = db.ErrorLog(
-                                    timestamp=log_data['timestamp'],
-                                    level=log_data['level'],
-                                    logger_name=log_data['logger_name'],
-                                    message=log_data['message'],
-                                    traceback=log_data['traceback'],
-                                    module=log_data['module'],
-                                    function=log_data['function'],
-                                    line=log_data['line']
-                                )
-                                session.add(error_log)
-
-                            await session.commit()
-                    except Exception as db_error:
-                        print(f"Ошибка записи в БД: {db_error}", file=sys.stderr)
-
-                # Пауза перед следующей проверкой
-                await asyncio.sleep(5)
+                await self.write_pending()
 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 # Логируем ошибки записи в БД в stderr
                 print(f"Ошибка записи логов в БД: {e}", file=sys.stderr)
-                await asyncio.sleep(10)
+                await asyncio.sleep(self.flush_interval)
 
     def start(self):
         """Запускает асинхронную задачу записи в БД"""
         if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
             self._task = asyncio.create_task(self._write_to_db())
 
     def stop(self):
@@ -127,6 +199,19 @@ class DatabaseHandler(logging.Handler):
             self._task.cancel()
             self._task = None
 
+    async def shutdown(self):
+        """Останавливает задачу записи и записывает остаток очереди"""
+        task, self._task = self._task, None
+        if task is None:
+            return
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await self.write_pending()
+
 class DailyRotatingFileHandler(logging.FileHandler):
     """Обработчик для ротации файлов по дням"""
 
@@ -149,19 +234,49 @@ class DailyRotatingFileHandler(logging.FileHandler):
             self._open()
         super().emit(record)
 
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Постановка записей в очередь потока QueueListener
+
+    Цикл событий только форматирует текст сообщения и кладет запись в очередь;
+    строка лога собирается, пишется на диск и ротируется в фоновом потоке.
+    При переполнении очереди запись отбрасывается, а не блокирует цикл событий.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def stop_log_listener():
+    """Останавливает фоновый поток записи логов, дописав очередь"""
+    global log_listener
+    if log_listener is None:
+        return
+
+    log_listener.stop()
+    for handler in log_listener.handlers:
+        handler.close()
+    log_listener = None
+
+def get_log_dir() -> Path:
+    """Директория файлов логов: /data/logs в prod, иначе data/logs в папке проекта"""
+    if os.getenv("SERVER_ENV", "dev") == "prod":
+        return Path("/data/logs")
+    # Логи должны храниться в папке проекта (getcourse_bot), а не в текущем CWD
+    app_root = Path(__file__).resolve().parents[1]
+    return app_root / "data" / "logs"
+
 def setup_logging():
     """Настройка системы логирования"""
 
-    # Определение директории для логов
-    env = os.getenv("SERVER_ENV", "dev")
-    if env == "prod":
-        log_dir = Path("/data/logs")
-    else:
-        # Логи должны храниться в папке проекта (getcourse_bot), а не в текущем CWD
-        app_root = Path(__file__).resolve().parents[1]
-        log_dir = app_root / "data" / "logs"
-
-    # Создание директории, если не существует
+    # Создание директории для логов, если не существует
+    log_dir = get_log_dir()
     log_dir.mkdir(parents=True, exist_ok=True)
 
     # Получение уровней логирования из переменных окружения
@@ -190,28 +305,52 @@ def setup_logging():
     bot_log_pattern = str(log_dir / "bot_{date}.log")
     bot_handler = DailyRotatingFileHandler(bot_log_pattern, level=log_level)
     bot_handler.setFormatter(log_format)
-    root_logger.addHandler(bot_handler)
 
     # Обработчик для ошибок (ежедневная ротация)
     errors_log_pattern = str(log_dir / "errors_{date}.log")
     errors_handler = DailyRotatingFileHandler(errors_log_pattern, level=error_log_level)
     errors_handler.setFormatter(log_format)
-    root_logger.addHandler(errors_handler)
 
     # Обработчик для вывода в консоль
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(log_format)
-    root_logger.addHandler(console_handler)
+
+    # Файловые и консольный обработчики работают в фоновом потоке,
+    # в корневом логгере остается только постановка записи в очередь
+    global log_listener
+    if log_listener is None:
+        atexit.register(stop_log_listener)
+    else:
+        stop_log_listener()
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "100000")))
+    log_listener = QueueListener(
+        log_queue, bot_handler, errors_handler, console_handler,
+        respect_handler_level=True
+    )
+    log_listener.start()
+
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.setLevel(min(log_level, error_log_level))
+    root_logger.addHandler(queue_handler)
 
     # Обработчик для записи в БД
-    db_handler = DatabaseHandler(level=logging.DEBUG)
+    db_handler = DatabaseHandler(
+        level=logging.DEBUG,
+        max_queue_size=int(os.getenv("DB_LOG_QUEUE_SIZE", "10000")),
+        batch_size=int(os.getenv("DB_LOG_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("DB_LOG_FLUSH_INTERVAL_SECONDS", "5")),
+    )
     db_handler.setFormatter(log_format)
     root_logger.addHandler(db_handler)
 
     # Запускаем асинхронную запись в БД
     db_handler.start()
 
+    global db_log_handler
+    db_log_handler = db_handler
+
     # Установка уровня логирования для некоторых модулей
     logging.getLogger("aiogram").setLevel(logging.INFO)
     logging.getLogger("aiohttp").setLevel(logging.INFO)
@@ -247,13 +386,7 @@ async def cleanup_old_logs():
         db_log_retention_days = int(os.getenv("DB_LOG_RETENTION_DAYS", "30"))
 
         # Очистка старых файлов логов
-        env = os.getenv("SERVER_ENV", "dev")
-        if env == "prod":
-            log_dir = Path("/data/logs")
-        else:
-            app_root = Path(__file__).resolve().parents[1]
-            log_dir = app_root / "data" / "logs"
-
+        log_dir = get_log_dir()
         if log_dir.exists():
             cutoff_date = datetime.now() - timedelta(days=log_retention_days)
             for log_file in log_dir.glob("*.log"):
@@ -0,0 +1,61 @@
+-- ============================================
+-- Миграция 001: журнал дедупликации уведомлений о дедлайнах
+-- ============================================
+-- Создает таблицу deadline_notification_ledger и заполняет ее
+-- по уже отправленным уведомлениям deadlineApproaching.
+--
+-- Раньше дубликаты искались подстроками в notifications.message
+-- (имя студента, название урока, дедлайн в формате dd-MM-yyyy HH:mm по МСК).
+-- Backfill использует те же признаки, чтобы журнал совпал со старой проверкой.
+--
+-- Повторный запуск безопасен (IF NOT EXISTS / ON CONFLICT DO NOTHING).
+-- ============================================
+
+SET search_path TO public;
+
+CREATE TABLE IF NOT EXISTS deadline_notification_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    mentor_id BIGINT NOT NULL,
+    lesson_id VARCHAR(50) NOT NULL,
+    student_id BIGINT NOT NULL,
+    deadline_date TIMESTAMPTZ NOT NULL,
+    notification_id BIGINT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_deadline_ledger_key
+    ON deadline_notification_ledger(mentor_id, lesson_id, student_id, deadline_date);
+
+COMMENT ON TABLE deadline_notification_ledger IS 'Студенты, о которых наставник уже уведомлен по уроку и дедлайну (дедупликация deadlineApproaching)';
+
+-- Backfill из существующих уведомлений.
+-- Кандидаты ограничены студентами, которые закреплены за наставником
+-- уведомления в тренинге урока (mapping хранит GetCourse ID).
+INSERT INTO deadline_notification_ledger (
+    mentor_id, lesson_id, student_id, deadline_date, notification_id, created_at
+)
+SELECT DISTINCT ON (n.mentor_id, l.lesson_id, s.student_id, l.deadline_date)
+    n.mentor_id,
+    l.lesson_id,
+    s.student_id,
+    l.deadline_date,
+    n.id,
+    n.created_at
+FROM notifications n
+JOIN mentors me ON me.id = n.mentor_id
+JOIN mapping mp ON mp.mentor_id = me.mentor_id
+JOIN lessons l ON l.training_id = mp.training_id::TEXT
+JOIN students s ON s.student_id = mp.student_id
+WHERE n.type = 'deadlineApproaching'
+  AND l.deadline_date IS NOT NULL
+  AND strpos(
+        n.message,
+        'Дедлайн ' || to_char(l.deadline_date AT TIME ZONE 'Europe/Moscow', 'DD-MM-YYYY HH24:MI')
+      ) > 0
+  AND strpos(n.message, COALESCE(l.lesson_title, 'Не указано')) > 0
+  AND strpos(
+        n.message,
+        '👤 ' || COALESCE(s.first_name, '') || ' ' || COALESCE(s.last_name, '') || E'\n'
+      ) > 0
+ORDER BY n.mentor_id, l.lesson_id, s.student_id, l.deadline_date, n.id
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,16 @@
+-- ============================================
+-- Миграция 002: аренда вебхуков для нескольких реплик бота
+-- ============================================
+-- Добавляет в webhook_events поля locked_by / locked_until.
+-- Бот забирает батч через UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED),
+-- поэтому параллельные экземпляры обрабатывают непересекающиеся вебхуки.
+--
+-- Повторный запуск безопасен.
+-- ============================================
+
+SET search_path TO public;
+
+ALTER TABLE webhook_events ADD COLUMN IF NOT EXISTS locked_by VARCHAR(100);
+ALTER TABLE webhook_events ADD COLUMN IF NOT EXISTS locked_until TIMESTAMPTZ;
+
+COMMENT ON COLUMN webhook_events.locked_until IS 'Срок аренды вебхука обработчиком locked_by (claim через FOR UPDATE SKIP LOCKED)';
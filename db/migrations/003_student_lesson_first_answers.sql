@@ -0,0 +1,35 @@
+-- ============================================
+-- Миграция 003: первые ответы студентов на уроки (табель)
+-- ============================================
+-- Создает таблицу student_lesson_first_answers и заполняет ее
+-- по всем webhook_events со статусами new/accepted.
+-- Дальше таблица поддерживается ботом при обработке вебхуков.
+--
+-- Скрипт можно запускать повторно как backfill: добавляются
+-- недостающие пары, значения first_answer_at только уменьшаются (LEAST).
+-- Строки, которых больше нет в webhook_events, не удаляются; для полного
+-- перестроения очистите таблицу (TRUNCATE student_lesson_first_answers)
+-- и запустите скрипт заново.
+-- ============================================
+
+SET search_path TO public;
+
+CREATE TABLE IF NOT EXISTS student_lesson_first_answers (
+    user_email VARCHAR(255) NOT NULL,
+    answer_lesson_id INTEGER NOT NULL,
+    first_answer_at TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_email, answer_lesson_id)
+);
+
+COMMENT ON TABLE student_lesson_first_answers IS 'Дата первого ответа студента на урок для табеля (материализация webhook_events)';
+
+INSERT INTO student_lesson_first_answers (user_email, answer_lesson_id, first_answer_at)
+SELECT user_email, answer_lesson_id, MIN(event_date)
+FROM webhook_events
+WHERE answer_lesson_id IS NOT NULL
+  AND answer_status IN ('new', 'accepted')
+GROUP BY user_email, answer_lesson_id
+ON CONFLICT (user_email, answer_lesson_id) DO UPDATE
+SET first_answer_at = LEAST(student_lesson_first_answers.first_answer_at, EXCLUDED.first_answer_at),
+    updated_at = NOW();
@@ -0,0 +1,30 @@
+-- ============================================
+-- Миграция 004: NOTIFY о новых вебхуках и уведомлениях
+-- ============================================
+-- Триггеры AFTER INSERT (FOR EACH STATEMENT) на webhook_events и notifications
+-- отправляют pg_notify в каналы webhook_events_inserted / notifications_inserted.
+-- Бот с DB_NOTIFY_ENABLED=true слушает каналы и запускает обработку сразу,
+-- не дожидаясь WEBHOOK_PROCESSING_INTERVAL / NOTIFICATION_SEND_INTERVAL.
+--
+-- Повторный запуск безопасен.
+-- ============================================
+
+SET search_path TO public;
+
+CREATE OR REPLACE FUNCTION notify_rows_inserted()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify(TG_ARGV[0], TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notify_webhook_events_inserted ON webhook_events;
+CREATE TRIGGER notify_webhook_events_inserted AFTER INSERT ON webhook_events
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_rows_inserted('webhook_events_inserted');
+
+DROP TRIGGER IF EXISTS notify_notifications_inserted ON notifications;
+CREATE TRIGGER notify_notifications_inserted AFTER INSERT ON notifications
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_rows_inserted('notifications_inserted');
+
+COMMENT ON FUNCTION notify_rows_inserted() IS 'NOTIFY о вставке записей; бот запускает обработку без ожидания интервала';
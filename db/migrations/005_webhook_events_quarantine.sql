@@ -0,0 +1,26 @@
+-- ============================================
+-- Миграция 005: повторные попытки и карантин вебхуков
+-- ============================================
+-- Добавляет в webhook_events счетчик попыток attempts, время следующей
+-- попытки next_attempt_at (экспоненциальная задержка) и флаг карантина
+-- dead_lettered. Вебхуки с ошибкой больше не выбираются первыми в каждом
+-- запуске и не блокируют очередь; после WEBHOOK_MAX_ATTEMPTS попыток
+-- они уходят в карантин до ручного возврата через /alerts.
+--
+-- Частичный индекс idx_webhook_events_processed пересоздается
+-- без вебхуков в карантине.
+--
+-- Повторный запуск безопасен.
+-- ============================================
+
+SET search_path TO public;
+
+ALTER TABLE webhook_events ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE webhook_events ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ;
+ALTER TABLE webhook_events ADD COLUMN IF NOT EXISTS dead_lettered BOOLEAN NOT NULL DEFAULT FALSE;
+
+DROP INDEX IF EXISTS idx_webhook_events_processed;
+CREATE INDEX idx_webhook_events_processed ON webhook_events(created_at) WHERE processed = FALSE AND dead_lettered = FALSE;
+CREATE INDEX IF NOT EXISTS idx_webhook_events_dead_lettered ON webhook_events(id) WHERE dead_lettered = TRUE;
+
+COMMENT ON COLUMN webhook_events.dead_lettered IS 'Карантин после WEBHOOK_MAX_ATTEMPTS неудачных попыток; возврат в очередь через /alerts';
@@ -0,0 +1,29 @@
+-- ============================================
+-- Миграция 006: уникальность notifications.message_hash
+-- ============================================
+-- Бот заполняет message_hash для всех типов уведомлений и вставляет их
+-- через INSERT ... ON CONFLICT (message_hash) DO NOTHING, поэтому повторно
+-- обработанный или продублированный вебхук не создает второе уведомление.
+--
+-- У существующих дубликатов хеш сохраняется только у самой ранней записи.
+-- Обычный индекс idx_notifications_message_hash заменяется уникальным.
+--
+-- Повторный запуск безопасен.
+-- ============================================
+
+SET search_path TO public;
+
+UPDATE notifications n
+SET message_hash = NULL
+FROM (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY message_hash ORDER BY id) AS rn
+    FROM notifications
+    WHERE message_hash IS NOT NULL
+) d
+WHERE n.id = d.id AND d.rn > 1;
+
+DROP INDEX IF EXISTS idx_notifications_message_hash;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_notifications_message_hash
+    ON notifications(message_hash) WHERE message_hash IS NOT NULL;
+
+COMMENT ON COLUMN notifications.message_hash IS 'SHA256 сигнатура события (NotificationCalculationService.calculate_message_signature); уникальна, повторное уведомление не создается';
@@ -0,0 +1,38 @@
+-- ============================================
+-- Миграция 007: уникальность событий webhook_events
+-- ============================================
+-- GetCourse и n8n повторяют запросы при таймаутах, поэтому в webhook_events
+-- накапливаются дубликаты одного события (answer_id, answer_status, event_date).
+--
+-- 1. Удаляет дубликаты, оставляя самую раннюю запись (минимальный id).
+-- 2. Создает уникальный индекс по естественному ключу события.
+--    answer_status может быть NULL и приводится к '' (работает на любой версии PostgreSQL).
+--
+-- После миграции вставка в webhook_events выполняется с ON CONFLICT DO NOTHING
+-- (нода "Записать в БД" workflow n8n - опция Skip on Conflict, прием вебхуков ботом).
+--
+-- Повторный запуск безопасен.
+-- ============================================
+
+SET search_path TO public;
+
+BEGIN;
+
+DELETE FROM webhook_events w
+USING (
+    SELECT id,
+           ROW_NUMBER() OVER (
+               PARTITION BY answer_id, COALESCE(answer_status, ''), event_date
+               ORDER BY id
+           ) AS rn
+    FROM webhook_events
+) d
+WHERE w.id = d.id AND d.rn > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_webhook_events_natural_key
+    ON webhook_events(answer_id, (COALESCE(answer_status, '')), event_date);
+
+COMMIT;
+
+-- Освобождение места после удаления дубликатов (вне транзакции)
+VACUUM ANALYZE webhook_events;
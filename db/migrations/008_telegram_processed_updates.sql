@@ -0,0 +1,22 @@
+-- ============================================
+-- Миграция 008: общая дедупликация обновлений Telegram
+-- ============================================
+-- Таблица захвата update_id для режима webhook с несколькими репликами
+-- бота (UPDATE_DEDUP_BACKEND=postgres). Реплика, первой вставившая
+-- update_id, обрабатывает обновление; остальные его пропускают.
+-- Записи старше UPDATE_DEDUP_TTL_HOURS удаляются ботом.
+--
+-- Повторный запуск безопасен.
+-- ============================================
+
+SET search_path TO public;
+
+CREATE TABLE IF NOT EXISTS telegram_processed_updates (
+    update_id BIGINT PRIMARY KEY,
+    processed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_telegram_processed_updates_processed_at
+    ON telegram_processed_updates(processed_at);
+
+COMMENT ON TABLE telegram_processed_updates IS 'Дедупликация повторных доставок webhook Telegram (UPDATE_DEDUP_BACKEND=postgres); записи старше UPDATE_DEDUP_TTL_HOURS удаляются ботом';
@@ -0,0 +1,24 @@
+-- ============================================
+-- Миграция 009: хранилище состояний FSM
+-- ============================================
+-- Таблица fsm_states для PostgresStorage (FSM_STORAGE=postgres):
+-- состояние регистрации переживает перезапуск и доступно всем репликам бота.
+-- Записи без изменений дольше FSM_STATE_TTL_HOURS удаляются ботом.
+--
+-- Повторный запуск безопасен.
+-- ============================================
+
+SET search_path TO public;
+
+CREATE TABLE IF NOT EXISTS fsm_states (
+    chat_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    state VARCHAR(255),
+    data JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (chat_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at ON fsm_states(updated_at);
+
+COMMENT ON TABLE fsm_states IS 'Хранилище FSM aiogram (FSM_STORAGE=postgres); записи без изменений дольше FSM_STATE_TTL_HOURS удаляются ботом';
@@ -0,0 +1,29 @@
+-- ============================================
+-- Миграция 010: аренда уведомлений при отправке
+-- ============================================
+-- Бот забирает батч уведомлений через UPDATE ... SET status = 'sending'
+-- WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) и коммитит аренду до
+-- отправки, поэтому строки не заблокированы на время обращений к Telegram.
+-- Итоги отправки пишутся отдельной транзакцией. Уведомления в статусе
+-- 'sending' с истекшим locked_until снова доступны для отправки.
+--
+-- Ограничение статуса дополняется 'sending' и 'no_telegram_id'
+-- (статус уведомлений менторов без telegram_id, который уже пишет бот).
+--
+-- Повторный запуск безопасен.
+-- ============================================
+
+SET search_path TO public;
+
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS locked_by VARCHAR(100);
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS locked_until TIMESTAMPTZ;
+
+ALTER TABLE notifications DROP CONSTRAINT IF EXISTS notifications_status_check;
+ALTER TABLE notifications ADD CONSTRAINT notifications_status_check
+    CHECK (status IN ('pending', 'sending', 'sent', 'failed', 'no_telegram_id'));
+
+-- Поиск уведомлений с истекшей арендой
+CREATE INDEX IF NOT EXISTS idx_notifications_sending_lease
+    ON notifications(locked_until) WHERE status = 'sending';
+
+COMMENT ON COLUMN notifications.locked_until IS 'Срок аренды уведомления отправителем locked_by (status = sending)';
@@ -199,6 +199,15 @@ CREATE TABLE IF NOT EXISTS webhook_events (
     processed_at TIMESTAMPTZ,                     -- Когда обработан
     error_message TEXT,                           -- Ошибка при обработке (если была)
 
+    -- Аренда вебхука обработчиком (несколько реплик бота)
+    locked_by VARCHAR(100),                       -- ID обработчика, забравшего вебхук
+    locked_until TIMESTAMPTZ,                     -- Срок аренды; после истечения вебхук снова доступен
+
+    -- Повторные попытки и карантин вебхуков, обработка которых падает
+    attempts INTEGER NOT NULL DEFAULT 0,          -- Число неудачных попыток обработки
+    next_attempt_at TIMESTAMPTZ,                  -- Не раньше этого времени вебхук берется повторно
+    dead_lettered BOOLEAN NOT NULL DEFAULT FALSE, -- Карантин: попытки исчерпаны, нужен ручной возврат в очередь
+
     -- Аудит
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW() -- Время получения вебхука
 );
@@ -208,16 +217,23 @@ CREATE INDEX idx_webhook_events_answer_id ON webhook_events(answer_id);
 CREATE INDEX idx_webhook_events_user_id ON webhook_events(user_id);
 CREATE INDEX idx_webhook_events_user_email ON webhook_events(user_email);
 CREATE INDEX idx_webhook_events_training_lesson ON webhook_events(answer_training_id, answer_lesson_id);
-CREATE INDEX idx_webhook_events_processed ON webhook_events(processed, created_at) WHERE processed = FALSE;
+CREATE INDEX idx_webhook_events_processed ON webhook_events(created_at) WHERE processed = FALSE AND dead_lettered = FALSE;
+CREATE INDEX idx_webhook_events_dead_lettered ON webhook_events(id) WHERE dead_lettered = TRUE;
 CREATE INDEX idx_webhook_events_event_date ON webhook_events(event_date DESC);
 CREATE INDEX idx_webhook_events_created_at ON webhook_events(created_at DESC);
 
+-- Естественный ключ события: повторы GetCourse/n8n отбрасываются при вставке (ON CONFLICT DO NOTHING).
+-- answer_status может быть NULL - приводится к '' (аналог NULLS NOT DISTINCT для любой версии PostgreSQL)
+CREATE UNIQUE INDEX uq_webhook_events_natural_key ON webhook_events(answer_id, (COALESCE(answer_status, '')), event_date);
+
 -- GIN индекс для поиска по JSONB
 CREATE INDEX idx_webhook_events_raw_payload ON webhook_events USING GIN (raw_payload);
 
 COMMENT ON TABLE webhook_events IS 'Вебхуки от GetCourse (автоматически заполняется через n8n)';
 COMMENT ON COLUMN webhook_events.processed IS 'FALSE = требует обработки ботом';
 COMMENT ON COLUMN webhook_events.raw_payload IS 'Полный JSON вебхука для отладки и восстановления';
+COMMENT ON COLUMN webhook_events.locked_until IS 'Срок аренды вебхука обработчиком locked_by (claim через FOR UPDATE SKIP LOCKED)';
+COMMENT ON COLUMN webhook_events.dead_lettered IS 'Карантин после WEBHOOK_MAX_ATTEMPTS неудачных попыток; возврат в очередь через /alerts';
 
 
 -- Таблица уведомлений (заполняется ботом)
@@ -226,7 +242,7 @@ CREATE TABLE IF NOT EXISTS notifications (
     mentor_id BIGINT NOT NULL,                    -- ID наставника из таблицы mentors
     type VARCHAR(50) NOT NULL,                    -- Тип: answerToLesson, deadlineApproaching, etc.
     message TEXT NOT NULL,                        -- Текст уведомления для отправки
-    status VARCHAR(20) DEFAULT 'pending',         -- pending, sent, failed
+    status VARCHAR(20) DEFAULT 'pending',         -- pending, sending, sent, failed, no_telegram_id
 
     -- Связь с вебхуком-источником (если применимо)
     webhook_event_id BIGINT,                      -- Ссылка на webhook_events.id
@@ -241,19 +257,81 @@ CREATE TABLE IF NOT EXISTS notifications (
     -- Telegram метаданные
     telegram_message_id VARCHAR(50),              -- ID сообщения в Telegram
 
-    CONSTRAINT notifications_status_check CHECK (status IN ('pending', 'sent', 'failed'))
+    -- Аренда при отправке (несколько реплик бота)
+    locked_by VARCHAR(100),                       -- ID отправителя, забравшего уведомление
+    locked_until TIMESTAMPTZ,                     -- Срок аренды; после истечения уведомление снова доступно
+
+    CONSTRAINT notifications_status_check CHECK (status IN ('pending', 'sending', 'sent', 'failed', 'no_telegram_id'))
 );
 
 -- Индексы для таблицы notifications
 CREATE INDEX idx_notifications_mentor_id ON notifications(mentor_id);
 CREATE INDEX idx_notifications_status ON notifications(status, created_at) WHERE status = 'pending';
+CREATE INDEX idx_notifications_sending_lease ON notifications(locked_until) WHERE status = 'sending';
 CREATE INDEX idx_notifications_type ON notifications(type);
 CREATE INDEX idx_notifications_created_at ON notifications(created_at DESC);
-CREATE INDEX idx_notifications_message_hash ON notifications(message_hash) WHERE message_hash IS NOT NULL;
+CREATE UNIQUE INDEX uq_notifications_message_hash ON notifications(message_hash) WHERE message_hash IS NOT NULL;
 CREATE INDEX idx_notifications_webhook_event_id ON notifications(webhook_event_id) WHERE webhook_event_id IS NOT NULL;
 
 COMMENT ON TABLE notifications IS 'Уведомления для наставников (автоматически создаются ботом)';
-COMMENT ON COLUMN notifications.message_hash IS 'SHA256 хеш для предотвращения дубликатов уведомлений';
+COMMENT ON COLUMN notifications.locked_until IS 'Срок аренды уведомления отправителем locked_by (status = sending)';
+COMMENT ON COLUMN notifications.message_hash IS 'SHA256 сигнатура события (NotificationCalculationService.calculate_message_signature); уникальна, повторное уведомление не создается';
+
+
+-- Журнал дедупликации уведомлений о дедлайнах (заполняется ботом)
+CREATE TABLE IF NOT EXISTS deadline_notification_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    mentor_id BIGINT NOT NULL,                    -- ID наставника из таблицы mentors
+    lesson_id VARCHAR(50) NOT NULL,               -- GetCourse ID урока (lessons.lesson_id)
+    student_id BIGINT NOT NULL,                   -- GetCourse ID студента (students.student_id)
+    deadline_date TIMESTAMPTZ NOT NULL,           -- Дедлайн, о котором уведомили
+    notification_id BIGINT,                       -- Ссылка на notifications.id
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Индексы для таблицы deadline_notification_ledger
+CREATE UNIQUE INDEX uq_deadline_ledger_key
+    ON deadline_notification_ledger(mentor_id, lesson_id, student_id, deadline_date);
+
+COMMENT ON TABLE deadline_notification_ledger IS 'Студенты, о которых наставник уже уведомлен по уроку и дедлайну (дедупликация deadlineApproaching)';
+
+
+-- Самый ранний ответ студента на урок (заполняется ботом при обработке вебхуков)
+CREATE TABLE IF NOT EXISTS student_lesson_first_answers (
+    user_email VARCHAR(255) NOT NULL,             -- Email студента (webhook_events.user_email)
+    answer_lesson_id INTEGER NOT NULL,            -- GetCourse ID урока
+    first_answer_at TIMESTAMPTZ NOT NULL,         -- min(event_date) по ответам new/accepted
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_email, answer_lesson_id)
+);
+
+COMMENT ON TABLE student_lesson_first_answers IS 'Дата первого ответа студента на урок для табеля (материализация webhook_events)';
+
+
+-- Обновления Telegram, принятые ботом (общая дедупликация webhook для нескольких реплик)
+CREATE TABLE IF NOT EXISTS telegram_processed_updates (
+    update_id BIGINT PRIMARY KEY,                 -- update_id из Telegram
+    processed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_telegram_processed_updates_processed_at ON telegram_processed_updates(processed_at);
+
+COMMENT ON TABLE telegram_processed_updates IS 'Дедупликация повторных доставок webhook Telegram (UPDATE_DEDUP_BACKEND=postgres); записи старше UPDATE_DEDUP_TTL_HOURS удаляются ботом';
+
+
+-- Состояния FSM бота (регистрация и другие диалоги; общие для реплик)
+CREATE TABLE IF NOT EXISTS fsm_states (
+    chat_id BIGINT NOT NULL,                      -- ID чата Telegram
+    user_id BIGINT NOT NULL,                      -- ID пользователя Telegram
+    state VARCHAR(255),                           -- Состояние (например, Registration:waiting_for_email)
+    data JSONB NOT NULL DEFAULT '{}'::jsonb,      -- Данные диалога
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (chat_id, user_id)
+);
+
+CREATE INDEX idx_fsm_states_updated_at ON fsm_states(updated_at);
+
+COMMENT ON TABLE fsm_states IS 'Хранилище FSM aiogram (FSM_STORAGE=postgres); записи без изменений дольше FSM_STATE_TTL_HOURS удаляются ботом';
 
 
 -- ============================================
@@ -337,6 +415,31 @@ CREATE TRIGGER update_mapping_updated_at BEFORE UPDATE ON mapping
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 
+-- ============================================
+-- ТРИГГЕРЫ NOTIFY ДЛЯ НЕМЕДЛЕННОЙ ОБРАБОТКИ
+-- ============================================
+
+-- Уведомление бота о новых записях (канал передается аргументом триггера).
+-- Триггер уровня оператора: пакетная вставка дает одно уведомление
+CREATE OR REPLACE FUNCTION notify_rows_inserted()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify(TG_ARGV[0], TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notify_webhook_events_inserted ON webhook_events;
+CREATE TRIGGER notify_webhook_events_inserted AFTER INSERT ON webhook_events
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_rows_inserted('webhook_events_inserted');
+
+DROP TRIGGER IF EXISTS notify_notifications_inserted ON notifications;
+CREATE TRIGGER notify_notifications_inserted AFTER INSERT ON notifications
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_rows_inserted('notifications_inserted');
+
+COMMENT ON FUNCTION notify_rows_inserted() IS 'NOTIFY о вставке записей; бот запускает обработку без ожидания интервала';
+
+
 -- ============================================
 -- ФУНКЦИИ ДЛЯ РАБОТЫ С АКТУАЛЬНЫМИ ЗАПИСЯМИ
 -- ============================================
@@ -17,7 +17,9 @@ from bot.config import Config
 from bot.handlers import register_all_handlers
 from bot.middlewares import setup_middlewares
 from bot.services.database import setup_database
-from bot.utils.logger import setup_logger_with_alerts
+from bot.services.reference_cache import setup_reference_cache
+from bot.services.update_workers import get_update_workers, setup_update_workers
+from bot.utils.logger import setup_logger_with_alerts, stop_log_listener
 from bot.utils.alerts import AlertHandler
 
 # Задержка для предотвращения проблем с дублирующимися экземплярами бота на сервере
@@ -31,10 +33,6 @@ alert_handler: Optional[AlertHandler] = None
 db_log_handler = None
 logger = None
 
-# Кэш для предотвращения повторной обработки дублирующихся обновлений
-processed_updates = set()
-MAX_PROCESSED_UPDATES = 1000  # Максимальное количество хранимых update_id
-
 # Создание директорий для данных перенесено на конфигурацию (чтобы dev не зависел от CWD)
 
 async def on_startup(dp):
@@ -57,9 +55,16 @@ async def main():
         # Инициализация базы данных
         await setup_database(config)
 
+        # Кэш справочных таблиц (mentors, students, trainings, lessons, mapping)
+        setup_reference_cache(config)
+
         # Инициализация бота и диспетчера
         bot = Bot(token=config.bot_token, parse_mode="MarkdownV2")
-        storage = MemoryStorage()
+        if config.fsm_storage == "postgres":
+            from bot.services.fsm_storage import PostgresStorage
+            storage = PostgresStorage(config)
+        else:
+            storage = MemoryStorage()
         dp = Dispatcher(bot, storage=storage)
 
         # Настройка логирования без отправки алертов в Telegram
@@ -88,9 +93,23 @@ async def main():
         reminder_service = ReminderService(config)
         notification_sender = NotificationSenderService(config, bot)
 
+        # Задачи-одиночки при нескольких репликах выполняет только лидер (advisory lock)
+        leader = None
+        if config.leader_election_enabled:
+            from bot.services.leader_election import LeaderElector
+            leader = LeaderElector(config)
+
+        def singleton(job_id, job):
+            return leader.guard(job_id, job) if leader else job
+
+        # Задачи-очереди: повторяются, пока батч полный; NOTIFY из БД будит их сразу
+        from bot.services.db_listener import WakeableJob
+        webhook_job = WakeableJob(webhook_processor.process_pending_webhooks)
+        notification_job = WakeableJob(notification_sender.send_pending_notifications)
+
         # Задача 1: Обработка вебхуков (каждые 30 секунд)
         scheduler.add_job(
-            webhook_processor.process_pending_webhooks,
+            webhook_job.run,
             'interval',
             seconds=config.webhook_processing_interval,
             id='process_webhooks'
@@ -98,7 +117,7 @@ async def main():
 
         # Задача 2: Проверка дедлайнов (каждый час)
         scheduler.add_job(
-            deadline_checker.check_deadlines,
+            singleton('check_deadlines', deadline_checker.check_deadlines),
             'interval',
             minutes=config.deadline_check_interval_minutes,
             id='check_deadlines'
@@ -106,7 +125,7 @@ async def main():
 
         # Задача 3: Отправка уведомлений (каждые 15 секунд)
         scheduler.add_job(
-            notification_sender.send_pending_notifications,
+            notification_job.run,
             'interval',
             seconds=config.notification_send_interval,
             id='send_notifications'
@@ -114,34 +133,67 @@ async def main():
 
         # Задача 4: Напоминания о непроверенных ответах (раз в день в 12:00 MSK)
         scheduler.add_job(
-            reminder_service.process_reminder_notifications,
+            singleton('process_reminders', reminder_service.process_reminder_notifications),
             'cron',
             hour=config.reminder_trigger_hour,
             timezone='Europe/Moscow',
             id='process_reminders'
         )
 
+        # Очистка брошенных состояний FSM
+        if config.fsm_storage == "postgres":
+            scheduler.add_job(
+                singleton('cleanup_fsm_states', storage.cleanup),
+                'interval',
+                hours=1,
+                id='cleanup_fsm_states'
+            )
+
         # Добавление задачи очистки старых логов
         cleanup_interval_hours = int(os.getenv("LOG_CLEANUP_INTERVAL_HOURS", "24"))
         from bot.utils.logger import cleanup_old_logs
         scheduler.add_job(
-            cleanup_old_logs,
+            singleton('cleanup_old_logs', cleanup_old_logs),
             'interval',
             hours=cleanup_interval_hours,
             id='cleanup_old_logs'
         )
 
+        # Немедленный запуск обработки по NOTIFY из БД (интервальные задачи остаются страховкой)
+        db_listener = None
+        if config.db_notify_enabled:
+            from bot.services.db_listener import (
+                DbEventListener, CHANNEL_WEBHOOK_EVENTS, CHANNEL_NOTIFICATIONS
+            )
+
+            db_listener = DbEventListener(config)
+            db_listener.register(CHANNEL_WEBHOOK_EVENTS, webhook_job.wake)
+            db_listener.register(CHANNEL_NOTIFICATIONS, notification_job.wake)
+
         # Обработчик сигналов для корректного завершения
         async def on_shutdown(signal, frame):
             logger.info("Завершение работы бота...")
 
+            # Обработка уже принятых обновлений Telegram
+            update_workers = get_update_workers()
+            if update_workers:
+                await update_workers.stop()
+
+            # Освобождение лидерства (другая реплика подхватит задачи-одиночки)
+            if leader:
+                await leader.stop()
+
+            # Остановка слушателя событий БД
+            if db_listener:
+                await db_listener.stop()
+
             # Остановка обработчика алертов
             if alert_handler:
                 alert_handler.stop()
 
             # Остановка обработчика логов БД
             if db_log_handler:
-                db_log_handler.stop()
+                await db_log_handler.shutdown()
 
             # Остановка планировщика
             scheduler.shutdown(wait=False)
@@ -149,6 +201,8 @@ async def main():
             await dp.storage.close()
             await dp.storage.wait_closed()
             await bot.session.close()
+            # Дописываем очередь логов в файлы
+            stop_log_listener()
             sys.exit(0)
 
         # Регистрация обработчиков сигналов
@@ -161,6 +215,15 @@ async def main():
         # Запуск планировщика
         scheduler.start()
 
+        if db_listener:
+            db_listener.start()
+
+        if leader:
+            leader.start()
+
+        # Пул воркеров: обновления одного чата по порядку, разных чатов - параллельно
+        update_workers = setup_update_workers(config, dp, bot)
+
         # Запуск бота в режиме long polling или webhook в зависимости от конфигурации
         if config.env == "prod" and config.webhook_host:
             try:
@@ -172,6 +235,17 @@ async def main():
                 # Запуск web-сервера для обработки webhook-запросов
                 from aiohttp import web
 
+                # Дедупликация повторных доставок обновлений Telegram
+                from bot.services.update_dedup import UpdateDeduplicator
+                update_dedup = UpdateDeduplicator(config)
+                if update_dedup.shared:
+                    scheduler.add_job(
+                        singleton('cleanup_processed_updates', update_dedup.cleanup),
+                        'interval',
+                        hours=1,
+                        id='cleanup_processed_updates'
+                    )
+
                 app = web.Application()
                 app['bot'] = bot  # Сохраняем bot
                 app['dp'] = dp    # Сохраняем dp
@@ -183,21 +257,15 @@ async def main():
                         update = aiogram.types.Update(**update_dict)
                         logger.debug(f"Создан объект Update: {update}")
 
-                        # Проверяем, не обрабатывали ли мы уже это обновление
+                        # Проверяем, не обрабатывали ли мы (или другая реплика) уже это обновление
                         update_id = update.update_id
-                        if update_id in processed_updates:
+                        if await update_dedup.is_duplicate(update_id):
                             logger.warning(f"Пропускаем дублирующееся обновление: {update_id}")
                             return web.Response()  # Возвращаем 200, чтобы Telegram не повторял запрос
 
-                        # Добавляем update_id в кэш
-                        processed_updates.add(update_id)
-
-                        # Ограничиваем размер кэша
-                        if len(processed_updates) > MAX_PROCESSED_UPDATES:
-                            # Удаляем самые старые записи (простая стратегия)
-                            oldest_updates = list(processed_updates)[:100]
-                            for old_id in oldest_updates:
-                                processed_updates.discard(old_id)
+                        if update_workers:
+                            await update_workers.submit(update)
+                            return web.Response()
 
                         # Получаем экземпляры Bot и Dispatcher из состояния приложения
                         current_bot = request.app['bot']
@@ -240,6 +308,11 @@ async def main():
 
                 app.router.add_post(config.webhook_path, webhook_handler)
 
+                # Прием вебхуков GetCourse (вместо workflow n8n)
+                if config.ingest_enabled:
+                    from bot.services.webhook_ingest import register_ingest_routes
+                    register_ingest_routes(app, config)
+
                 runner = web.AppRunner(app)
                 await runner.setup()
                 site = web.TCPSite(runner, '0.0.0.0', config.webhook_port)
@@ -256,10 +329,25 @@ async def main():
         else:
             # Запуск в режиме long polling
             logger.info("Запуск бота в режиме long polling")
+            # Прием вебхуков GetCourse требует HTTP-сервера: поднимаем отдельный
+            if config.ingest_enabled:
+                from aiohttp import web
+                from bot.services.webhook_ingest import register_ingest_routes
+
+                ingest_app = web.Application()
+                register_ingest_routes(ingest_app, config)
+                ingest_runner = web.AppRunner(ingest_app)
+                await ingest_runner.setup()
+                await web.TCPSite(ingest_runner, '0.0.0.0', config.webhook_port).start()
+                logger.info(f"Сервер приема вебхуков GetCourse запущен на порту {config.webhook_port}")
+
             # Пропускаем накопившиеся обновления
             await bot.delete_webhook(drop_pending_updates=True)
             # Запускаем поллинг
-            await dp.start_polling()
+            if update_workers:
+                await update_workers.run_polling()
+            else:
+                await dp.start_polling()
 
     except (KeyboardInterrupt, SystemExit):
         logger.info("Бот остановлен")
@@ -0,0 +1,147 @@
+"""Заглушка AsyncSession: запоминает выполненные запросы и отдает заданные результаты"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BooleanClauseList
+
+
+class FakeResult:
+    def __init__(self, rows: Optional[List[Any]] = None, rowcount: Optional[int] = None):
+        self._rows = list(rows or [])
+        self.rowcount = len(self._rows) if rowcount is None else rowcount
+
+    def all(self):
+        return list(self._rows)
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def one(self):
+        assert len(self._rows) == 1
+        return self._rows[0]
+
+    def scalar_one_or_none(self):
+        return self._rows[0][0] if self._rows else None
+
+    def scalars(self):
+        return FakeResult([row[0] if isinstance(row, tuple) else row for row in self._rows])
+
+
+class FakeSession:
+    """
+    Args:
+        respond: statement -> FakeResult (по умолчанию пустой результат);
+            может выбросить исключение, чтобы сымитировать ошибку БД
+        delay: Задержка каждого запроса в секундах (медленная БД)
+    """
+
+    def __init__(self, respond: Callable[[Any], FakeResult] = None, delay: float = 0):
+        self.respond = respond or (lambda statement: FakeResult())
+        self.delay = delay
+        self.statements: List[Any] = []
+        self.savepoints = 0
+        self.rolled_back_savepoints = 0
+        self.commits = 0
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.respond(statement)
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        self.savepoints += 1
+        try:
+            yield
+        except Exception:
+            self.rolled_back_savepoints += 1
+            raise
+
+    async def commit(self):
+        self.commits += 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def compile_sql(statement) -> str:
+    """SQL запроса в диалекте PostgreSQL"""
+    return str(statement.compile(dialect=postgresql.asyncpg.dialect()))
+
+
+class FakeTables:
+    """
+    Ответы на SELECT по строкам таблиц в памяти (responder для FakeSession)
+
+    Учитываются условия колонка = значение и колонка IN (...); остальные
+    (valid_from/valid_to и т.п.) считаются выполненными. Строки отдаются
+    в порядке списка таблицы.
+
+    Args:
+        tables: {имя таблицы: список строк (объектов модели)}
+    """
+
+    def __init__(self, tables: Dict[str, List[Any]]):
+        self.tables = tables
+        self._indexes: Dict[tuple, Dict[Any, List[Any]]] = {}
+        self._positions = {
+            table: {id(row): position for position, row in enumerate(rows)}
+            for table, rows in tables.items()
+        }
+
+    def _index(self, table: str, column: str) -> Dict[Any, List[Any]]:
+        key = (table, column)
+        if key not in self._indexes:
+            index: Dict[Any, List[Any]] = {}
+            for row in self.tables[table]:
+                index.setdefault(getattr(row, column), []).append(row)
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    @classmethod
+    def _conditions(cls, clause):
+        if isinstance(clause, BooleanClauseList):
+            for nested in clause.clauses:
+                yield from cls._conditions(nested)
+        elif isinstance(clause, BinaryExpression) and clause.operator in (operators.eq, operators.in_op):
+            value = clause.right.value
+            yield clause.left.key, set(value) if clause.operator is operators.in_op else {value}
+
+    def __call__(self, statement) -> FakeResult:
+        table = statement.get_final_froms()[0].name
+        conditions = list(self._conditions(statement.whereclause))
+
+        if conditions:
+            column, values = conditions[0]
+            index = self._index(table, column)
+            candidates = [row for value in values for row in index.get(value, [])]
+            if len(values) > 1:
+                positions = self._positions[table]
+                candidates.sort(key=lambda row: positions[id(row)])
+        else:
+            candidates = self.tables[table]
+
+        rows = [
+            row for row in candidates
+            if all(getattr(row, column) in values for column, values in conditions[1:])
+        ]
+
+        descriptions = statement.column_descriptions
+        if len(descriptions) == 1 and descriptions[0]['expr'] is descriptions[0]['entity']:
+            return FakeResult(rows)
+
+        selected = [tuple(getattr(row, d['name']) for d in descriptions) for row in rows]
+        if statement._distinct:
+            selected = list(dict.fromkeys(selected))
+        return FakeResult(selected)
@@ -0,0 +1,168 @@
+import asyncio
+
+from bot.config import Config
+from bot.services import db_listener
+from bot.services.db_listener import CHANNEL_NOTIFICATIONS, DbEventListener, WakeableJob
+
+
+class QueueJob:
+    """Задача-очередь: каждый запуск разбирает один батч из backlog"""
+
+    def __init__(self, backlog: int = 0, batch_size: int = 10, duration: float = 0.05):
+        self.backlog = backlog
+        self.batch_size = batch_size
+        self.duration = duration
+        self.calls = 0
+        self.active = 0
+        self.overlaps = 0
+        self.started = asyncio.Event()
+
+    async def __call__(self) -> bool:
+        self.calls += 1
+        self.active += 1
+        if self.active > 1:
+            self.overlaps += 1
+        self.started.set()
+        await asyncio.sleep(self.duration)
+        self.active -= 1
+        claimed = min(self.backlog, self.batch_size)
+        self.backlog -= claimed
+        return claimed >= self.batch_size
+
+
+async def _until_idle(job: WakeableJob, timeout: float = 1):
+    await asyncio.sleep(0)
+    await asyncio.wait_for(asyncio.gather(*job._tasks), timeout=timeout)
+    assert not job.running
+
+
+async def test_wake_runs_idle_job_at_once():
+    queue_job = QueueJob()
+    job = WakeableJob(queue_job)
+
+    job.wake()
+    await _until_idle(job)
+
+    assert queue_job.calls == 1
+
+
+async def test_wake_during_run_reruns_right_after():
+    queue_job = QueueJob(duration=0.05)
+    job = WakeableJob(queue_job)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    job.wake()
+    await queue_job.started.wait()
+    # Новые записи появились, пока задача уже выполнялась
+    job.wake()
+    job.wake()
+    await _until_idle(job)
+
+    # Несколько пробуждений во время выполнения - один повтор, без ожидания интервала
+    assert queue_job.calls == 2
+    assert queue_job.overlaps == 0
+    assert loop.time() - started < 0.2
+
+
+async def test_scheduled_run_during_woken_run_is_coalesced():
+    queue_job = QueueJob(duration=0.05)
+    job = WakeableJob(queue_job)
+
+    job.wake()
+    await queue_job.started.wait()
+    # Запуск планировщика во время выполнения не запускает вторую копию
+    await job.run()
+    await _until_idle(job)
+
+    assert queue_job.calls == 2
+    assert queue_job.overlaps == 0
+
+
+async def test_full_batches_are_drained_in_one_wake():
+    queue_job = QueueJob(backlog=35, batch_size=10, duration=0.001)
+    job = WakeableJob(queue_job)
+
+    job.wake()
+    await _until_idle(job)
+
+    assert queue_job.backlog == 0
+    assert queue_job.calls == 4
+    assert job.runs == 4
+
+
+async def test_failing_job_does_not_block_later_wakes():
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise RuntimeError("db down")
+
+    job = WakeableJob(failing)
+    job.wake()
+    await asyncio.sleep(0.01)
+    job.wake()
+    await asyncio.sleep(0.01)
+
+    assert len(calls) == 2
+    assert not job.running
+
+
+class FakeListenConnection:
+    """Соединение asyncpg для LISTEN; hung - сервер перестал отвечать (полуоткрытый TCP)"""
+
+    def __init__(self, hung: bool):
+        self.hung = hung
+        self.channels = []
+        self.closed = False
+        self.pings = 0
+
+    def add_termination_listener(self, callback):
+        pass
+
+    async def add_listener(self, channel, callback):
+        self.channels.append(channel)
+
+    async def fetchval(self, query, timeout=None):
+        self.pings += 1
+        if self.hung:
+            await asyncio.sleep(timeout)
+            raise asyncio.TimeoutError()
+        return 1
+
+    def terminate(self):
+        self.closed = True
+
+    async def close(self, timeout=None):
+        self.closed = True
+
+
+async def test_listener_reconnects_when_connection_stops_answering(monkeypatch):
+    config = Config()
+    config.db_notify_debounce_seconds = 0
+    config.db_notify_reconnect_seconds = 0
+    config.db_notify_healthcheck_seconds = 0.02
+    opened = []
+
+    async def connect(dsn, **kwargs):
+        opened.append(FakeListenConnection(hung=not opened))
+        return opened[-1]
+
+    monkeypatch.setattr(db_listener.asyncpg, "connect", connect)
+    wakes = []
+    listener = DbEventListener(config)
+    listener.register(CHANNEL_NOTIFICATIONS, lambda: wakes.append(1))
+
+    listener.start()
+    try:
+        await asyncio.sleep(0.2)
+    finally:
+        await listener.stop()
+
+    # Первое соединение не ответило на SELECT 1 и было закрыто; второе живо и проверяется
+    assert len(opened) == 2
+    assert opened[0].closed
+    assert opened[1].channels == [CHANNEL_NOTIFICATIONS]
+    assert opened[1].pings >= 2
+    # После переподключения задачи будятся: уведомления могли быть пропущены
+    assert len(wakes) == 2
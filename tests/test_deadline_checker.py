@@ -0,0 +1,111 @@
+import pytest
+
+from bot.config import Config
+from bot.services import reference_cache
+from bot.services.database import Lesson, Mapping, Mentor, Student, Training, WebhookEvent
+from bot.services.deadline_checker import DeadlineCheckService
+from tests.fake_session import FakeSession, FakeTables
+
+
+def _tables():
+    """
+    Тренинги 500 и 600; урок 31 - тренинга без записи в trainings.
+    Студент 107 есть только в mapping, у ментора 999 нет записи в mentors.
+    """
+    return {
+        'trainings': [Training(id=1, training_id='500'), Training(id=2, training_id='600')],
+        'lessons': [
+            Lesson(id=1, lesson_id='11', training_id='500'),
+            Lesson(id=2, lesson_id='12', training_id='500'),
+            Lesson(id=3, lesson_id='21', training_id='600'),
+            Lesson(id=4, lesson_id='31', training_id='700'),
+        ],
+        'students': [
+            Student(
+                id=i,
+                student_id=100 + i,
+                user_email=f"student{i}@example.com",
+                first_name=None if i == 5 else 'Студент',
+                last_name=str(i),
+            )
+            for i in range(1, 7)
+        ],
+        'mapping': [
+            Mapping(id=1, student_id=101, training_id=500, mentor_id=901),
+            Mapping(id=2, student_id=102, training_id=500, mentor_id=901),
+            Mapping(id=3, student_id=103, training_id=500, mentor_id=902),
+            Mapping(id=4, student_id=104, training_id=500, mentor_id=902),
+            Mapping(id=5, student_id=105, training_id=500, mentor_id=901),
+            Mapping(id=6, student_id=107, training_id=500, mentor_id=901),
+            Mapping(id=7, student_id=101, training_id=600, mentor_id=903),
+            Mapping(id=8, student_id=106, training_id=600, mentor_id=999),
+            Mapping(id=9, student_id=102, training_id=700, mentor_id=901),
+        ],
+        'mentors': [
+            Mentor(id=1, mentor_id=901),
+            Mentor(id=2, mentor_id=902),
+            Mentor(id=3, mentor_id=903),
+        ],
+        'webhook_events': [
+            WebhookEvent(id=1, answer_lesson_id=11, user_id=101, answer_status='new'),
+            WebhookEvent(id=2, answer_lesson_id=11, user_id=102, answer_status='accepted'),
+            WebhookEvent(id=3, answer_lesson_id=11, user_id=102, answer_status='new'),
+            # Отклоненный ответ не считается ответом
+            WebhookEvent(id=4, answer_lesson_id=11, user_id=103, answer_status='rejected'),
+            WebhookEvent(id=5, answer_lesson_id=12, user_id=104, answer_status='new'),
+        ],
+    }
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # Без кэша справочников каждый find_actual_in - запрос к БД
+    monkeypatch.setattr(reference_cache, "reference_cache", None)
+    return DeadlineCheckService(Config())
+
+
+async def _per_lesson_groups(service, session, lesson):
+    """mentor_groups построчного варианта check_deadlines"""
+    students = await service.get_students_without_answers(session, lesson.lesson_id)
+    if not students:
+        return {}
+    return await service.group_students_by_mentor(session, students, lesson.training_id)
+
+
+async def test_bulk_groups_match_per_lesson_groups(service):
+    tables = FakeTables(_tables())
+    lessons = tables.tables['lessons']
+
+    per_lesson_session = FakeSession(tables)
+    per_lesson = {
+        lesson.lesson_id: await _per_lesson_groups(service, per_lesson_session, lesson)
+        for lesson in lessons
+    }
+    bulk_session = FakeSession(tables)
+    bulk = await service.get_mentor_groups_bulk(bulk_session, lessons)
+
+    assert {lesson_id: groups for lesson_id, groups in per_lesson.items() if groups} == bulk
+    assert bulk['11'] == {
+        1: [{'id': 5, 'student_id': 105, 'email': 'student5@example.com', 'first_name': '', 'last_name': '5'}],
+        2: [
+            {'id': 3, 'student_id': 103, 'email': 'student3@example.com', 'first_name': 'Студент', 'last_name': '3'},
+            {'id': 4, 'student_id': 104, 'email': 'student4@example.com', 'first_name': 'Студент', 'last_name': '4'},
+        ],
+    }
+    assert list(bulk['21']) == [3]
+    assert '31' not in bulk
+
+
+async def test_bulk_groups_use_fixed_number_of_queries(service):
+    directory = _tables()
+    tables = FakeTables(directory)
+    per_lesson_session = FakeSession(tables)
+    for lesson in directory['lessons']:
+        await _per_lesson_groups(service, per_lesson_session, lesson)
+
+    bulk_session = FakeSession(tables)
+    await service.get_mentor_groups_bulk(bulk_session, directory['lessons'])
+
+    # Ответы, тренинги, mapping, студенты, наставники - независимо от числа уроков и студентов
+    assert len(bulk_session.statements) == 5
+    assert len(per_lesson_session.statements) > 5 * len(directory['lessons'])
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+from aiogram import Bot, Dispatcher
+
+from bot.config import Config
+from bot.services import database
+from bot.services.fsm_storage import PostgresStorage
+from tests.fake_session import FakeResult, FakeSession, compile_sql
+
+
+class FakeFsmTable:
+    """
+    Таблица fsm_states в памяти, общая для реплик
+
+    Разбирает запросы PostgresStorage: SELECT по ключу, UPSERT с одним из
+    вариантов SET и DELETE по ключу.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.selects = 0
+
+    def session(self) -> FakeSession:
+        return FakeSession(self.respond)
+
+    def respond(self, statement) -> FakeResult:
+        sql = compile_sql(statement)
+        params = statement.compile().params
+
+        if sql.startswith("SELECT"):
+            self.selects += 1
+            row = self.rows.get((params['chat_id_1'], params['user_id_1']))
+            return FakeResult([SimpleNamespace(state=row[0], data=row[1])] if row else [])
+
+        if sql.startswith("DELETE"):
+            self.rows.pop((params['chat_id_1'], params['user_id_1']), None)
+            return FakeResult()
+
+        key = (params['chat_id'], params['user_id'])
+        existing = self.rows.get(key)
+        if existing is None:
+            row = (params['state'], params['data'])
+        elif "SET state = excluded.state" in sql:
+            row = (params['state'], existing[1])
+        elif "SET state = " in sql:
+            row = (None, existing[1])
+        elif "fsm_states.data || excluded.data" in sql:
+            row = (existing[0], {**existing[1], **params['data']})
+        else:
+            row = (existing[0], params['data'])
+        self.rows[key] = row
+        return FakeResult([row])
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = FakeFsmTable()
+    monkeypatch.setattr(database, "async_session", table.session)
+    return table
+
+
+def _replica(cache_ttl: int = 60) -> Dispatcher:
+    config = Config()
+    config.fsm_cache_ttl_seconds = cache_ttl
+    return Dispatcher(Bot("123456:TEST"), storage=PostgresStorage(config))
+
+
+async def test_state_set_on_one_replica_is_visible_on_another(table):
+    replica_a, replica_b = _replica(), _replica()
+    state_a = replica_a.current_state(chat=1, user=1)
+    state_b = replica_b.current_state(chat=1, user=1)
+
+    # Реплика B видит пользователя без состояния
+    assert await state_b.get_state() is None
+
+    await state_a.set_state("Registration:waiting_email")
+
+    # Отсутствие состояния не кэшируется - B сразу видит новое состояние
+    assert await state_b.get_state() == "Registration:waiting_email"
+
+
+async def test_found_state_is_served_from_cache(table):
+    state = _replica().current_state(chat=1, user=1)
+    await state.set_state("Registration:waiting_email")
+    await state.update_data(email="mentor@example.com")
+    selects = table.selects
+
+    assert await state.get_state() == "Registration:waiting_email"
+    assert await state.get_data() == {"email": "mentor@example.com"}
+    assert table.selects == selects
+
+
+async def test_missing_state_is_read_from_db_every_time(table):
+    state = _replica().current_state(chat=1, user=1)
+
+    await state.get_state()
+    await state.get_state()
+
+    assert table.selects == 2
+
+
+async def test_reset_state_removes_record_and_cache_entry(table):
+    replica_a, replica_b = _replica(), _replica()
+    state_a = replica_a.current_state(chat=1, user=1)
+    await state_a.set_state("Registration:waiting_email")
+    await state_a.reset_state()
+
+    assert table.rows == {}
+    assert await state_a.get_state() is None
+
+    await replica_b.current_state(chat=1, user=1).set_state("Registration:waiting_code")
+
+    assert await state_a.get_state() == "Registration:waiting_code"
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from bot.services import gradebook_service, reference_cache
+from bot.services.database import Lesson, Mapping, Mentor, Student, StudentLessonFirstAnswer
+from bot.services.gradebook_service import _build_students_summary, build_mentor_overview, get_admin_summaries
+from tests.fake_session import FakeSession, FakeTables
+
+
+def _tables():
+    """
+    Наставник 903 без студентов; у наставника 902 студенты в двух тренингах.
+    Уроки: прошедший дедлайн, будущий дедлайн, без дедлайна, еще не открытый.
+    """
+    now = datetime.now(pytz.UTC)
+    students = [
+        Student(id=i, student_id=100 + i, user_email=f"student{i}@example.com", first_name='Студент', last_name=str(i))
+        for i in range(1, 6)
+    ]
+    lessons = []
+    for training_id in ('500', '600'):
+        base = int(training_id) * 10
+        lessons.extend([
+            Lesson(id=base + 1, lesson_id=str(base + 1), training_id=training_id,
+                   opening_date=now - timedelta(days=10), deadline_date=now - timedelta(days=1)),
+            Lesson(id=base + 2, lesson_id=str(base + 2), training_id=training_id,
+                   opening_date=now - timedelta(days=2), deadline_date=now + timedelta(days=3)),
+            Lesson(id=base + 3, lesson_id=str(base + 3), training_id=training_id,
+                   opening_date=now - timedelta(days=2), deadline_date=None),
+            Lesson(id=base + 4, lesson_id=str(base + 4), training_id=training_id,
+                   opening_date=now + timedelta(days=5), deadline_date=now + timedelta(days=9)),
+        ])
+    return {
+        'mentors': [Mentor(id=1, mentor_id=901), Mentor(id=2, mentor_id=902), Mentor(id=3, mentor_id=903)],
+        'mapping': [
+            Mapping(id=1, student_id=101, training_id=500, mentor_id=901),
+            Mapping(id=2, student_id=102, training_id=500, mentor_id=901),
+            Mapping(id=3, student_id=103, training_id=500, mentor_id=902),
+            Mapping(id=4, student_id=104, training_id=600, mentor_id=902),
+            Mapping(id=5, student_id=105, training_id=600, mentor_id=902),
+        ],
+        'students': students,
+        'lessons': lessons,
+        'student_lesson_first_answers': [
+            # Вовремя, с опозданием и ответ на урок без дедлайна
+            StudentLessonFirstAnswer(user_email='student1@example.com', answer_lesson_id=5001,
+                                     first_answer_at=now - timedelta(days=3)),
+            StudentLessonFirstAnswer(user_email='student3@example.com', answer_lesson_id=5001,
+                                     first_answer_at=now - timedelta(hours=2)),
+            StudentLessonFirstAnswer(user_email='student4@example.com', answer_lesson_id=6003,
+                                     first_answer_at=now - timedelta(days=1)),
+            StudentLessonFirstAnswer(user_email='student5@example.com', answer_lesson_id=6002,
+                                     first_answer_at=now - timedelta(hours=1)),
+        ],
+    }
+
+
+@pytest.fixture(autouse=True)
+def no_caches(monkeypatch):
+    # Каждый find_actual_in - запрос к БД, сводки не кэшируются
+    monkeypatch.setattr(reference_cache, "reference_cache", None)
+    monkeypatch.setattr(gradebook_service, "_summary_cache", None)
+
+
+def _comparable(overview):
+    """Сводка без учета порядка items (порядок уроков зависит от запроса)"""
+    return {
+        **overview,
+        "items": sorted(overview["items"], key=lambda item: (item["student_id"], item["lesson_id"])),
+    }
+
+
+@pytest.mark.parametrize("include_not_started", [False, True])
+async def test_admin_summaries_match_per_mentor_overviews(include_not_started):
+    tables = FakeTables(_tables())
+
+    summaries = await get_admin_summaries(FakeSession(tables), include_not_started=include_not_started)
+
+    assert [mentor.id for mentor, _ in summaries] == [1, 2, 3]
+    for mentor, summary in summaries:
+        expected = _build_students_summary(await build_mentor_overview(
+            FakeSession(tables), mentor_id=mentor.id, include_not_started=include_not_started
+        ))
+        assert _comparable(summary.overview) == _comparable(expected.overview)
+        assert summary.students == expected.students
+        assert summary.per_student == expected.per_student
+        assert summary.ordered_ids == expected.ordered_ids
+
+    assert summaries[1][1].overview["counts"]
+    assert summaries[2][1].overview == {"total_students": 0, "counts": {}, "by_lesson": {}, "by_student": {}, "items": []}
+
+
+async def test_admin_summaries_use_fixed_number_of_queries():
+    directory = _tables()
+    tables = FakeTables(directory)
+
+    session = FakeSession(tables)
+    await get_admin_summaries(session)
+
+    per_mentor_session = FakeSession(tables)
+    for mentor in directory['mentors']:
+        await build_mentor_overview(per_mentor_session, mentor_id=mentor.id)
+
+    # Наставники, mapping, студенты, уроки, первые ответы - на всех наставников сразу
+    assert len(session.statements) == 5
+    # По наставнику: 7 запросов, без студентов - 2
+    assert len(per_mentor_session.statements) == 7 + 7 + 2
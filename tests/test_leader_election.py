@@ -0,0 +1,258 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from bot.config import Config
+from bot.services import leader_election
+from bot.services.leader_election import LEADER_LOCK_KEY, LeaderElector
+
+
+class FakeConnection:
+    """Соединение asyncpg: pg_try_advisory_lock отдает lock_result"""
+
+    def __init__(self, lock_result: bool = True):
+        self.lock_result = lock_result
+        self.queries = []
+        self.closed = False
+        self.listeners = []
+
+    def add_termination_listener(self, callback):
+        self.listeners.append(callback)
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def fetchval(self, query, *args, timeout=None):
+        self.queries.append((query, args))
+        if "pg_try_advisory_lock" in query:
+            return self.lock_result
+        return 1
+
+    async def close(self, timeout=None):
+        self.closed = True
+
+    def terminate(self):
+        """Обрыв соединения: asyncpg вызывает termination listeners"""
+        self.closed = True
+        for callback in self.listeners:
+            callback(self)
+
+
+class AdvisoryLocks:
+    """Сервер БД: сессионный advisory lock, общий для соединений всех реплик"""
+
+    def __init__(self):
+        self.holder = None
+
+    async def connect(self, dsn, **kwargs):
+        return SharedLockConnection(self)
+
+
+class SharedLockConnection(FakeConnection):
+    """Соединение, которое захватывает общую блокировку; закрытие соединения ее снимает"""
+
+    def __init__(self, locks: AdvisoryLocks):
+        super().__init__()
+        self.locks = locks
+
+    async def fetchval(self, query, *args, timeout=None):
+        self.queries.append((query, args))
+        if "pg_try_advisory_lock" in query:
+            if self.locks.holder is None:
+                self.locks.holder = self
+            return self.locks.holder is self
+        return 1
+
+    def _release(self):
+        if self.locks.holder is self:
+            self.locks.holder = None
+
+    async def close(self, timeout=None):
+        await super().close(timeout)
+        self._release()
+
+    def terminate(self):
+        super().terminate()
+        self._release()
+
+
+@pytest.fixture
+def config():
+    config = Config()
+    config.worker_id = "worker-a"
+    config.leader_check_interval_seconds = 0.01
+    config.db_connect_timeout = 3
+    return config
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Соединения, открытые выборами; следующее берется из очереди lock_results"""
+    opened = []
+    connect_kwargs = []
+    lock_results = []
+
+    async def connect(dsn, **kwargs):
+        connect_kwargs.append(kwargs)
+        connection = FakeConnection(lock_results.pop(0) if lock_results else True)
+        opened.append(connection)
+        return connection
+
+    monkeypatch.setattr(leader_election.asyncpg, "connect", connect)
+    return opened, connect_kwargs, lock_results
+
+
+async def _wait_for(predicate, timeout: float = 1):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline, "условие не выполнено"
+        await asyncio.sleep(0.005)
+
+
+async def test_guard_runs_job_only_on_leader(config):
+    elector = LeaderElector(config)
+    calls = []
+
+    async def check_deadlines():
+        calls.append("run")
+        return "done"
+
+    guarded = elector.guard("check_deadlines", check_deadlines)
+
+    assert await guarded() is None
+    assert calls == []
+
+    elector._set_leader(True, "тест")
+
+    assert await guarded() == "done"
+    assert calls == ["run"]
+    assert guarded.__name__ == "check_deadlines"
+
+
+def test_set_leader_logs_only_transitions(config, caplog):
+    elector = LeaderElector(config)
+
+    with caplog.at_level(logging.INFO, logger=leader_election.__name__):
+        elector._set_leader(False, "повтор")
+        elector._set_leader(True, "блокировка захвачена")
+        elector._set_leader(True, "повтор")
+        elector._set_leader(False, "соединение с БД закрыто")
+
+    assert [record.levelno for record in caplog.records] == [logging.INFO, logging.WARNING]
+    assert elector.is_leader is False
+
+
+async def test_replica_becomes_leader_with_db_connect_timeout(config, connections):
+    opened, connect_kwargs, _ = connections
+    elector = LeaderElector(config)
+
+    elector.start()
+    try:
+        await _wait_for(lambda: elector.is_leader)
+    finally:
+        await elector.stop()
+
+    assert connect_kwargs[0]["timeout"] == 3
+    assert opened[0].queries[0] == ("SELECT pg_try_advisory_lock($1)", (LEADER_LOCK_KEY,))
+    # Остановка снимает лидерство и закрывает соединение (а с ним и блокировку)
+    assert elector.is_leader is False
+    assert opened[0].closed
+
+
+async def test_replica_without_lock_stays_follower(config, connections):
+    opened, _, lock_results = connections
+    lock_results.append(False)
+    elector = LeaderElector(config)
+
+    elector.start()
+    try:
+        await _wait_for(lambda: opened and len(opened[0].queries) >= 3)
+    finally:
+        await elector.stop()
+
+    assert elector.is_leader is False
+    assert all("pg_try_advisory_lock" in query for query, _ in opened[0].queries)
+
+
+async def test_lost_connection_drops_leadership_and_reconnects(config, connections):
+    opened, _, lock_results = connections
+    # После переподключения блокировку уже держит другая реплика
+    lock_results.extend([True, False])
+    elector = LeaderElector(config)
+
+    elector.start()
+    try:
+        await _wait_for(lambda: elector.is_leader)
+        opened[0].terminate()
+
+        assert elector.is_leader is False
+        await _wait_for(lambda: len(opened) == 2 and opened[1].queries)
+        assert elector.is_leader is False
+    finally:
+        await elector.stop()
+
+
+async def test_concurrent_replicas_run_singleton_job_once_per_interval(monkeypatch):
+    interval = 0.1
+    locks = AdvisoryLocks()
+    monkeypatch.setattr(leader_election.asyncpg, "connect", locks.connect)
+    loop = asyncio.get_running_loop()
+    runs = []
+
+    electors = []
+    schedulers = []
+    start_date = datetime.now(pytz.UTC) + timedelta(seconds=interval)
+    for worker_id in ("worker-a", "worker-b", "worker-c"):
+        config = Config()
+        config.worker_id = worker_id
+        config.leader_check_interval_seconds = 0.01
+        config.db_connect_timeout = 3
+        elector = LeaderElector(config)
+
+        async def check_deadlines(worker_id=worker_id):
+            runs.append((worker_id, loop.time()))
+
+        scheduler = AsyncIOScheduler()
+        scheduler.add_job(
+            elector.guard("check_deadlines", check_deadlines),
+            'interval', seconds=interval, start_date=start_date, id="check_deadlines"
+        )
+        electors.append(elector)
+        schedulers.append(scheduler)
+
+    try:
+        for elector in electors:
+            elector.start()
+        await _wait_for(lambda: locks.holder is not None)
+        for scheduler in schedulers:
+            scheduler.start()
+
+        await _wait_for(lambda: len(runs) >= 4, timeout=2)
+        # Обрыв соединения лидера: PostgreSQL снимает блокировку, ее захватывает одна из реплик
+        locks.holder.terminate()
+        await _wait_for(lambda: len(runs) >= 8, timeout=2)
+
+        # Остановка реплики-лидера: лидером становится другая реплика
+        stopped = next(index for index, elector in enumerate(electors) if elector.is_leader)
+        schedulers[stopped].shutdown(wait=False)
+        await electors[stopped].stop()
+        await _wait_for(lambda: len(runs) >= 12, timeout=2)
+    finally:
+        for scheduler in schedulers:
+            if scheduler.running:
+                scheduler.shutdown(wait=False)
+        for elector in electors:
+            await elector.stop()
+
+    assert not any(elector.is_leader for elector in electors)
+    assert locks.holder is None
+    assert runs[-1][0] != electors[stopped].worker_id
+    # Ровно один запуск на интервал: реплики срабатывают одновременно, выполняет только лидер
+    started = runs[0][1]
+    slots = [round((run_at - started) / interval) for _, run_at in runs]
+    assert slots == list(range(len(runs)))
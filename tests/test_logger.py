@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from datetime import datetime
+
+import pytest
+
+import bot.services.database as db
+import bot.utils.logger as logger_module
+from bot.utils.logger import DatabaseHandler, setup_logging, stop_log_listener
+from tests.fake_session import FakeSession, compile_sql
+
+
+def _record(level: int, message: str) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, message, None, None)
+
+
+def _messages(handler: DatabaseHandler):
+    return [log_data['message'] for log_data in handler._take_batch()]
+
+
+def test_full_queue_sheds_oldest_info_before_errors():
+    handler = DatabaseHandler(max_queue_size=3, batch_size=10)
+    handler.emit(_record(logging.INFO, "info-1"))
+    handler.emit(_record(logging.ERROR, "error-1"))
+    handler.emit(_record(logging.INFO, "info-2"))
+    handler.emit(_record(logging.WARNING, "warning-1"))
+
+    assert handler.dropped == 1
+    assert _messages(handler) == ["error-1", "warning-1", "info-2"]
+
+
+def test_queue_of_errors_drops_new_info():
+    handler = DatabaseHandler(max_queue_size=2, batch_size=10)
+    handler.emit(_record(logging.ERROR, "error-1"))
+    handler.emit(_record(logging.ERROR, "error-2"))
+    handler.emit(_record(logging.INFO, "info-1"))
+
+    assert handler.dropped == 1
+    assert _messages(handler) == ["error-1", "error-2"]
+
+
+def test_queue_of_errors_sheds_oldest_error_for_new_error():
+    handler = DatabaseHandler(max_queue_size=2, batch_size=10)
+    handler.emit(_record(logging.ERROR, "error-1"))
+    handler.emit(_record(logging.ERROR, "error-2"))
+    handler.emit(_record(logging.CRITICAL, "critical-1"))
+
+    assert handler.dropped == 1
+    assert _messages(handler) == ["error-2", "critical-1"]
+
+
+async def test_write_pending_inserts_batches_with_errors_first(monkeypatch):
+    sessions = []
+
+    def session_factory():
+        session = FakeSession()
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(db, "async_session", session_factory)
+    handler = DatabaseHandler(max_queue_size=10, batch_size=2)
+    handler._flush_lock = asyncio.Lock()
+    handler.emit(_record(logging.INFO, "info-1"))
+    handler.emit(_record(logging.INFO, "info-2"))
+    handler.emit(_record(logging.ERROR, "error-1"))
+
+    await handler.write_pending()
+
+    assert handler.written == 3
+    assert handler.flushes == 2
+    assert handler.queued == 0
+    # Первая пачка: ошибка (application_logs + error_logs) и самая старая INFO
+    first = [compile_sql(statement) for statement in sessions[0].statements]
+    assert len(first) == 2
+    assert "application_logs" in first[0]
+    assert "error_logs" in first[1]
+    assert [len(session.statements) for session in sessions] == [2, 1]
+    assert all(session.commits == 1 for session in sessions)
+
+
+@pytest.fixture
+def root_logger(monkeypatch, tmp_path):
+    """setup_logging с логами в tmp_path; обработчики корневого логгера восстанавливаются"""
+    monkeypatch.setattr(logger_module, "get_log_dir", lambda: tmp_path)
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    monkeypatch.setenv("ERROR_LOG_LEVEL", "WARNING")
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    stop_log_listener()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+async def test_listener_writes_files_and_drains_queue_on_stop(root_logger, tmp_path):
+    db_handler = setup_logging()
+    listener = logger_module.log_listener
+    bot_handler = listener.handlers[0]
+    log = logging.getLogger("bench")
+
+    # Файл занят: записи копятся в очереди, цикл событий не ждет диск
+    bot_handler.acquire()
+    try:
+        for i in range(1000):
+            log.info("line %d", i)
+        log.warning("disk is slow")
+        assert listener.queue.qsize() >= 1000
+    finally:
+        bot_handler.release()
+
+    # Остановка дописывает всю очередь в файлы и закрывает их
+    stop_log_listener()
+    await db_handler.shutdown()
+
+    assert logger_module.log_listener is None
+    assert listener.queue.empty()
+    date = datetime.now().strftime('%Y%m%d')
+    bot_lines = (tmp_path / f"bot_{date}.log").read_text(encoding='utf-8').splitlines()
+    error_lines = (tmp_path / f"errors_{date}.log").read_text(encoding='utf-8').splitlines()
+    assert [line.rsplit("| ", 1)[1] for line in bot_lines] == [f"line {i}" for i in range(1000)] + ["disk is slow"]
+    assert len(error_lines) == 1 and "WARNING" in error_lines[0]
+    assert bot_handler.stream is None
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from bot.services.notification_dispatcher import NotificationDispatcher
+
+
+async def test_paused_chat_does_not_hold_send_slot():
+    dispatcher = NotificationDispatcher(global_rate=1000, per_chat_interval=0, max_concurrency=1)
+    dispatcher.pause_chat("slow", 0.5)
+    finished = {}
+    started = time.monotonic()
+
+    async def send(chat_id, item):
+        await dispatcher.acquire(chat_id)
+        async with dispatcher.slot():
+            await asyncio.sleep(0.01)
+        finished[chat_id] = time.monotonic() - started
+
+    await dispatcher.dispatch([("slow", 1), ("fast", 2)], send)
+
+    assert finished["fast"] < 0.2
+    assert finished["slow"] >= 0.5
+
+
+async def test_chat_order_is_preserved():
+    dispatcher = NotificationDispatcher(global_rate=1000, per_chat_interval=0, max_concurrency=2)
+    sent = []
+
+    async def send(chat_id, item):
+        await dispatcher.acquire(chat_id)
+        async with dispatcher.slot():
+            await asyncio.sleep(0.001 * (5 - item))
+            sent.append((chat_id, item))
+
+    await dispatcher.dispatch([(1, 1), (2, 1), (1, 2), (1, 3), (2, 2)], send)
+
+    assert [item for chat_id, item in sent if chat_id == 1] == [1, 2, 3]
+    assert [item for chat_id, item in sent if chat_id == 2] == [1, 2]
+
+
+async def test_expired_chat_deadlines_are_pruned():
+    dispatcher = NotificationDispatcher(global_rate=1000, per_chat_interval=0.01, max_concurrency=5)
+
+    async def send(chat_id, item):
+        await dispatcher.acquire(chat_id)
+
+    await dispatcher.dispatch([(chat_id, None) for chat_id in range(100)], send)
+    assert len(dispatcher._chat_ready_at) == 100
+
+    await asyncio.sleep(0.02)
+    await dispatcher.dispatch([("other", None)], send)
+    assert list(dispatcher._chat_ready_at) == ["other"]
+
+
+async def test_chat_interval_counts_from_send_slot():
+    dispatcher = NotificationDispatcher(global_rate=1000, per_chat_interval=0.05, max_concurrency=1)
+    requested = []
+
+    async def send(chat_id, item):
+        await dispatcher.acquire(chat_id)
+        async with dispatcher.slot(chat_id):
+            requested.append((chat_id, time.monotonic()))
+            await asyncio.sleep(0.04 if chat_id == "busy" else 0.001)
+
+    # Первое сообщение чата ждет слот, занятый другим чатом: пауза до второго не сокращается
+    await dispatcher.dispatch([("busy", 1), ("chat", 1), ("chat", 2)], send)
+
+    first, second = [at for chat_id, at in requested if chat_id == "chat"]
+    assert second - first >= 0.05
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from bot.config import Config
+from bot.services import notification_sender
+from bot.services.database import Mentor
+from bot.services.notification_sender import NotificationSenderService
+from tests.fake_session import FakeResult, FakeSession, compile_sql
+
+
+class StubBot:
+    """Bot с send_message, запоминающим число коммитов сессии на момент отправки"""
+
+    def __init__(self, session: FakeSession):
+        self.session = session
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text, self.session.commits, len(self.session.statements)))
+        return SimpleNamespace(message_id=len(self.sent))
+
+
+def _claimed(notification_id: int, mentor_id: int, created_at: datetime):
+    return SimpleNamespace(id=notification_id, mentor_id=mentor_id, message=f"Ответ {notification_id}", created_at=created_at)
+
+
+@pytest.fixture
+def config():
+    config = Config()
+    config.worker_id = "worker-a"
+    config.notification_per_chat_interval = 0
+    config.notification_global_rate = 1000
+    return config
+
+
+@pytest.fixture
+def session(monkeypatch):
+    started = datetime(2024, 5, 1, 10, 0)
+    claimed = [
+        _claimed(2, mentor_id=1, created_at=started + timedelta(seconds=1)),
+        _claimed(1, mentor_id=1, created_at=started),
+        _claimed(3, mentor_id=2, created_at=started),
+    ]
+    mentors = [Mentor(id=1, mentor_id=901, email="mentor@example.com", telegram_id=555)]
+
+    def respond(statement):
+        sql = compile_sql(statement)
+        if sql.startswith("UPDATE") and "RETURNING" in sql:
+            return FakeResult(claimed)
+        if sql.startswith("SELECT"):
+            return FakeResult(mentors)
+        # Итоги: одно из двух отправленных уведомлений уже забрала другая реплика
+        return FakeResult(rowcount=1)
+
+    session = FakeSession(respond)
+
+    async def get_session():
+        yield session
+
+    monkeypatch.setattr(notification_sender, "get_session", get_session)
+    return session
+
+
+async def test_claim_marks_batch_as_sending_with_lease(config, session):
+    service = NotificationSenderService(config, StubBot(session))
+
+    await service.claim_pending_notifications(session)
+
+    sql = compile_sql(session.statements[0])
+    assert sql.startswith("UPDATE notifications SET status=")
+    assert "locked_by=" in sql and "locked_until=" in sql
+    assert "FOR UPDATE SKIP LOCKED" in sql
+    assert "notifications.locked_until < " in sql
+
+
+async def test_claim_is_committed_before_send_and_outcomes_after(config, session, caplog):
+    bot = StubBot(session)
+    service = NotificationSenderService(config, bot)
+
+    await service.send_pending_notifications()
+
+    # Отправка только после коммита аренды, транзакция с итогами - после отправки
+    assert [commits for _, _, commits, _ in bot.sent] == [1, 1]
+    assert session.commits == 2
+    # Внутри чата - в порядке создания, несмотря на порядок RETURNING
+    assert [(chat_id, text) for chat_id, text, _, _ in bot.sent] == [(555, "Ответ 1"), (555, "Ответ 2")]
+
+    outcome_statements = session.statements[bot.sent[-1][3]:]
+    assert len(outcome_statements) == 2
+    for statement in outcome_statements:
+        where = compile_sql(statement).split(" WHERE ", 1)[1]
+        assert "notifications.status = " in where
+        assert "notifications.locked_by = " in where
+
+    assert any("Потеряна аренда 1 из 2" in record.getMessage() for record in caplog.records)
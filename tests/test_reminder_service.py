@@ -0,0 +1,53 @@
+import pytest
+
+from bot.config import Config
+from bot.services import reference_cache
+from bot.services.database import Mapping, Mentor, Student, Training
+from bot.services.reminder_service import ReminderService
+from tests.fake_session import FakeResult, FakeSession
+
+
+def _directory(pair_count: int):
+    """Справочники: у каждого студента свой ментор на тренинге 500"""
+    return {
+        'students': [Student(id=i, student_id=100 + i) for i in range(pair_count)],
+        'trainings': [Training(id=1, training_id='500')],
+        'mapping': [Mapping(id=i, student_id=100 + i, training_id=500, mentor_id=900 + i) for i in range(pair_count)],
+        'mentors': [Mentor(id=i, mentor_id=900 + i, first_name='Ментор', last_name=str(i)) for i in range(pair_count)],
+    }
+
+
+def _session(directory):
+    def respond(statement):
+        table = statement.get_final_froms()[0].name
+        return FakeResult(directory[table])
+    return FakeSession(respond)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # Без кэша справочников каждый find_actual_in - запрос к БД
+    monkeypatch.setattr(reference_cache, "reference_cache", None)
+    return ReminderService(Config())
+
+
+@pytest.mark.parametrize("pair_count", [1, 50])
+async def test_resolve_mentors_uses_fixed_number_of_queries(service, pair_count):
+    session = _session(_directory(pair_count))
+    pairs = [(100 + i, '500') for i in range(pair_count)]
+
+    resolved = await service.resolve_mentors_for_answers(session, pairs)
+
+    assert len(session.statements) == 4
+    assert len(resolved) == pair_count
+    assert resolved[(100, '500')] == (0, 'Ментор 0')
+
+
+async def test_resolve_mentors_skips_pairs_without_mapping(service):
+    directory = _directory(2)
+    directory['mapping'] = directory['mapping'][:1]
+    session = _session(directory)
+
+    resolved = await service.resolve_mentors_for_answers(session, [(100, '500'), (101, '500')])
+
+    assert list(resolved) == [(100, '500')]
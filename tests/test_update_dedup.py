@@ -0,0 +1,51 @@
+from bot.config import Config
+from bot.services.update_dedup import RecentIds, UpdateDeduplicator
+
+
+def test_recent_ids_rejects_repeated_id():
+    recent = RecentIds(3)
+
+    assert recent.add(1) is True
+    assert recent.add(1) is False
+    assert len(recent) == 1
+
+
+def test_recent_ids_evicts_oldest_first():
+    recent = RecentIds(3)
+    for update_id in (1, 2, 3, 4):
+        recent.add(update_id)
+
+    assert 1 not in recent
+    assert [update_id in recent for update_id in (2, 3, 4)] == [True, True, True]
+
+    recent.add(5)
+
+    assert 2 not in recent
+    assert len(recent) == 3
+
+
+def test_recent_ids_repeat_does_not_refresh_position():
+    recent = RecentIds(2)
+    recent.add(1)
+    recent.add(2)
+    # Повтор не продлевает жизнь id: вытесняется по порядку первого получения
+    recent.add(1)
+    recent.add(3)
+
+    assert 1 not in recent
+    assert 2 in recent
+
+
+async def test_deduplicator_counts_duplicates_without_shared_backend():
+    config = Config()
+    config.update_dedup_backend = "memory"
+    config.update_dedup_size = 2
+    dedup = UpdateDeduplicator(config)
+
+    assert await dedup.is_duplicate(10) is False
+    assert await dedup.is_duplicate(10) is True
+    assert await dedup.is_duplicate(11) is False
+    assert await dedup.is_duplicate(12) is False
+    # 10 вытеснен из буфера - повтор уже не распознается
+    assert await dedup.is_duplicate(10) is False
+    assert dedup.duplicates == 1
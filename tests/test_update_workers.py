@@ -0,0 +1,192 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram import Bot, Dispatcher, types
+
+from bot.services.update_workers import ChatOrderedWorkerPool, get_update_chat_id
+
+
+def _update(update_id: int, chat_id: int) -> types.Update:
+    return types.Update(**{
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Ментор'},
+            'text': str(update_id),
+        },
+    })
+
+
+class StubDispatcher(Dispatcher):
+    """Диспетчер, у которого process_update только записывает обработку"""
+
+    def __init__(self, bot: Bot, delays=None):
+        super().__init__(bot)
+        self.delays = delays or {}
+        self.started = []
+        self.finished = []
+        self.active = {}
+        self.max_active = 0
+        self.overlaps = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def process_update(self, update: types.Update):
+        chat_id = get_update_chat_id(update)
+        self.started.append(update.update_id)
+        self.active[chat_id] = self.active.get(chat_id, 0) + 1
+        if self.active[chat_id] > 1:
+            self.overlaps += 1
+        self.max_active = max(self.max_active, sum(self.active.values()))
+        try:
+            await self.release.wait()
+            await asyncio.sleep(self.delays.get(update.update_id, 0.001))
+            if update.message.text == 'fail':
+                raise RuntimeError("handler failed")
+        finally:
+            self.active[chat_id] -= 1
+        self.finished.append((chat_id, update.update_id))
+
+
+@pytest.fixture
+def bot():
+    return Bot("123456:TEST")
+
+
+def _pool(dp, bot, workers=4, queue_size=100):
+    return ChatOrderedWorkerPool(SimpleNamespace(update_workers=workers, update_queue_size=queue_size), dp, bot)
+
+
+async def test_updates_of_one_chat_are_processed_in_order(bot):
+    # Первое обновление чата самое медленное: порядок не должен нарушиться
+    dp = StubDispatcher(bot, delays={1: 0.05, 2: 0.02})
+    pool = _pool(dp, bot)
+
+    for update_id in range(1, 6):
+        await pool.submit(_update(update_id, chat_id=7))
+    await pool.stop()
+
+    assert [update_id for _, update_id in dp.finished] == [1, 2, 3, 4, 5]
+    assert dp.overlaps == 0
+
+
+async def test_different_chats_are_processed_concurrently(bot):
+    dp = StubDispatcher(bot, delays={update_id: 0.1 for update_id in range(1, 5)})
+    pool = _pool(dp, bot, workers=4)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    for update_id in range(1, 5):
+        await pool.submit(_update(update_id, chat_id=update_id))
+    await pool.stop()
+
+    assert dp.max_active == 4
+    assert loop.time() - started < 0.3
+
+
+async def test_concurrency_is_bounded_by_update_workers(bot):
+    dp = StubDispatcher(bot, delays={update_id: 0.02 for update_id in range(1, 11)})
+    pool = _pool(dp, bot, workers=3)
+
+    for update_id in range(1, 11):
+        await pool.submit(_update(update_id, chat_id=update_id))
+    await pool.stop()
+
+    assert dp.max_active == 3
+    assert len(dp.finished) == 10
+
+
+async def test_full_pool_processes_update_inline(bot):
+    dp = StubDispatcher(bot)
+    dp.release.clear()
+    pool = _pool(dp, bot, workers=1, queue_size=2)
+
+    await pool.submit(_update(1, chat_id=1))
+    await pool.submit(_update(2, chat_id=2))
+    assert pool.queue_depth == 2
+
+    dp.release.set()
+    # Пул заполнен: обновление обрабатывается в вызывающей задаче, до возврата из submit
+    await pool.submit(_update(3, chat_id=3))
+
+    assert (3, 3) in dp.finished
+    assert pool.inline == 1
+    await pool.stop()
+    assert pool.queue_depth == 0
+
+
+async def test_polling_submit_waits_for_free_slot(bot):
+    dp = StubDispatcher(bot)
+    dp.release.clear()
+    pool = _pool(dp, bot, workers=1, queue_size=1)
+
+    await pool.submit(_update(1, chat_id=1))
+    waiting = asyncio.create_task(pool.submit(_update(2, chat_id=2), wait=True))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    dp.release.set()
+    await asyncio.wait_for(waiting, timeout=1)
+    await pool.stop()
+
+    assert pool.inline == 0
+    assert [update_id for _, update_id in dp.finished] == [1, 2]
+
+
+async def test_pending_is_released_when_lanes_are_cancelled(bot):
+    dp = StubDispatcher(bot)
+    dp.release.clear()
+    pool = _pool(dp, bot, workers=1)
+
+    for update_id, chat_id in ((1, 1), (2, 1), (3, 2)):
+        await pool.submit(_update(update_id, chat_id))
+    await asyncio.sleep(0)
+    assert pool.queue_depth == 3
+
+    await pool.stop(timeout=0.05)
+
+    assert dp.finished == []
+    assert pool.queue_depth == 0
+    assert pool.get_stats()['active_chats'] == 0
+
+
+async def test_stats_reflect_processed_and_failed_updates(bot):
+    dp = StubDispatcher(bot, delays={1: 0.02})
+    pool = _pool(dp, bot)
+    failing = _update(2, chat_id=1)
+    failing.message.text = 'fail'
+
+    await pool.submit(_update(1, chat_id=1))
+    await pool.submit(failing)
+    await pool.stop()
+
+    stats = pool.get_stats()
+    assert stats['processed'] == 2
+    assert stats['failed'] == 1
+    assert stats['queue_depth'] == 0
+    assert stats['max_ms'] >= 20
+    assert 0 < stats['avg_ms'] <= stats['max_ms']
+
+
+async def test_full_pool_does_not_run_update_ahead_of_its_chat_lane(bot):
+    dp = StubDispatcher(bot)
+    dp.release.clear()
+    pool = _pool(dp, bot, workers=1, queue_size=2)
+
+    await pool.submit(_update(1, chat_id=1))
+    await pool.submit(_update(2, chat_id=1))
+    # Пул заполнен, но у чата 1 есть очередь: обновление 3 ждет места, а не обрабатывается сразу
+    submitting = asyncio.create_task(pool.submit(_update(3, chat_id=1)))
+    await asyncio.sleep(0.01)
+    assert not submitting.done()
+
+    dp.release.set()
+    await asyncio.wait_for(submitting, timeout=1)
+    await pool.stop()
+
+    assert [update_id for _, update_id in dp.finished] == [1, 2, 3]
+    assert pool.inline == 0
+    assert dp.overlaps == 0
@@ -0,0 +1,184 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.config import Config
+from bot.services import database
+from bot.services.webhook_ingest import (
+    INT32_MAX,
+    WebhookIngestBuffer,
+    build_webhook_row,
+    register_ingest_routes,
+    validate_webhook_payload,
+)
+from tests.fake_session import FakeResult, FakeSession
+
+
+def _payload(**overrides):
+    body = {
+        'eventDate': '2024-05-01T10:00:00',
+        'userId': '42',
+        'userEmail': 'student@example.com',
+        'answerId': '1001',
+        'answerStatus': 'new',
+    }
+    body.update(overrides)
+    return body
+
+
+def _returning(rows):
+    """Ответ INSERT ... RETURNING: все строки записаны, id по порядку"""
+    return FakeResult([
+        (index + 1, row['answer_id'], row['answer_status'], row['event_date'])
+        for index, row in enumerate(rows)
+    ])
+
+
+@pytest.fixture
+def config():
+    config = Config()
+    config.ingest_path = "/getcoursebd"
+    config.ingest_flush_interval_ms = 50
+    config.ingest_flush_max_rows = 3
+    config.ingest_max_pending = 4
+    return config
+
+
+class _Sessions(list):
+    """Сессии, открытые буфером; rows - строки, которые вернет INSERT ... RETURNING"""
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    created = _Sessions()
+    created.rows = []
+
+    def session_factory():
+        session = FakeSession(lambda statement: _returning(created.rows))
+        created.append(session)
+        return session
+
+    monkeypatch.setattr(database, "async_session", session_factory)
+    return created
+
+
+def test_valid_payload_has_no_errors():
+    assert validate_webhook_payload(_payload()) == []
+
+
+@pytest.mark.parametrize("field", ['userId', 'answerId', 'answerLessonId', 'answerTeacherId'])
+def test_integer_field_out_of_int32_range_is_rejected(field):
+    errors = validate_webhook_payload(_payload(**{field: str(INT32_MAX + 1)}))
+
+    assert errors == [f"{field} должен быть целым числом, получено: {INT32_MAX + 1}"]
+
+
+def test_int32_bounds_are_accepted():
+    assert validate_webhook_payload(_payload(userId=str(INT32_MAX), answerLessonId=-INT32_MAX)) == []
+
+
+def test_fractional_integer_field_is_rejected():
+    assert validate_webhook_payload(_payload(answerTrainingId='1.5')) == [
+        "answerTrainingId должен быть целым числом, получено: 1.5"
+    ]
+
+
+@pytest.mark.parametrize("value", ['2024-13-01', 'вчера', 20240501])
+def test_invalid_event_date_is_rejected(value):
+    errors = validate_webhook_payload(_payload(eventDate=value))
+
+    assert errors == [f"eventDate должен быть валидной датой, получено: {value}"]
+
+
+def test_event_date_without_timezone_is_utc():
+    row = build_webhook_row(_payload(eventDate='2024-05-01T10:00:00'))
+
+    assert row['event_date'].utcoffset().total_seconds() == 0
+
+
+async def test_buffer_flushes_when_max_rows_reached(config, sessions):
+    config.ingest_flush_interval_ms = 60_000
+    buffer = WebhookIngestBuffer(config)
+    rows = [build_webhook_row(_payload(answerId=str(1000 + i))) for i in range(3)]
+    sessions.rows.extend(rows)
+
+    futures = buffer.submit(rows)
+    ids = await asyncio.wait_for(asyncio.gather(*futures), timeout=1)
+
+    assert ids == [1, 2, 3]
+    assert len(sessions) == 1
+    assert sessions[0].commits == 1
+    assert buffer.flushes == 1
+    assert buffer.pending_count == 0
+
+
+async def test_buffer_flushes_on_timer(config, sessions):
+    buffer = WebhookIngestBuffer(config)
+    row = build_webhook_row(_payload())
+    sessions.rows.append(row)
+
+    futures = buffer.submit([row])
+    await asyncio.sleep(0)
+    # До истечения интервала батч не записывается
+    assert sessions == []
+
+    ids = await asyncio.wait_for(asyncio.gather(*futures), timeout=1)
+
+    assert ids == [1]
+    assert len(sessions) == 1
+
+
+async def test_buffer_fails_futures_when_insert_fails(config, monkeypatch):
+    def failing(statement):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(database, "async_session", lambda: FakeSession(failing))
+    buffer = WebhookIngestBuffer(config)
+
+    futures = buffer.submit([build_webhook_row(_payload())])
+    await buffer.close()
+
+    with pytest.raises(RuntimeError):
+        futures[0].result()
+    assert buffer.failed == 1
+
+
+async def test_ingest_returns_503_when_buffer_is_full(config, sessions):
+    config.ingest_flush_interval_ms = 60_000
+    config.ingest_flush_max_rows = 100
+    app = web.Application()
+    buffer = register_ingest_routes(app, config)
+
+    async with TestClient(TestServer(app)) as client:
+        buffer.submit([build_webhook_row(_payload(answerId=str(1000 + i))) for i in range(3)])
+
+        response = await client.post(config.ingest_path, json=[_payload(answerId='1'), _payload(answerId='2')])
+
+        assert response.status == 503
+        assert buffer.pending_count == 3
+
+
+async def test_ingest_returns_503_when_db_falls_behind(config, monkeypatch):
+    # Батчи уходят из буфера сразу, но БД записывает их медленнее, чем они приходят
+    config.ingest_flush_max_rows = 1
+    config.ingest_max_pending = 3
+    monkeypatch.setattr(database, "async_session", lambda: FakeSession(delay=0.2))
+    app = web.Application()
+    buffer = register_ingest_routes(app, config)
+
+    async with TestClient(TestServer(app)) as client:
+        requests = [
+            asyncio.create_task(client.post(config.ingest_path, json=_payload(answerId=str(1000 + i))))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        assert buffer.pending_count == 3
+
+        response = await client.post(config.ingest_path, json=_payload(answerId='2000'))
+        assert response.status == 503
+
+        statuses = [(await request).status for request in requests]
+        assert statuses == [200, 200, 200]
+        assert buffer.pending_count == 0
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from bot.config import Config
+from bot.services.database import WebhookEvent
+from bot.services.webhook_processor import WebhookProcessingService
+from tests.fake_session import FakeResult, FakeSession, compile_sql
+
+
+@pytest.fixture
+def service():
+    config = Config()
+    config.worker_id = "worker-a"
+    return WebhookProcessingService(config)
+
+
+def _where_clause(statement) -> str:
+    return compile_sql(statement).split(" WHERE ", 1)[1]
+
+
+async def test_mark_webhooks_updates_only_rows_leased_by_this_worker(service):
+    def respond(statement):
+        if "RETURNING" in compile_sql(statement):
+            return FakeResult([(3, 1, False)])
+        return FakeResult(rowcount=2)
+
+    session = FakeSession(respond)
+    await service.mark_webhooks(session, [1, 2], {3: "boom"})
+
+    assert len(session.statements) == 2
+    for statement in session.statements:
+        assert "webhook_events.locked_by = " in _where_clause(statement)
+
+
+async def test_mark_webhooks_logs_lost_leases(service, caplog):
+    def respond(statement):
+        if "RETURNING" in compile_sql(statement):
+            return FakeResult([(3, 1, False)])
+        return FakeResult(rowcount=1)
+
+    with caplog.at_level(logging.WARNING):
+        await service.mark_webhooks(FakeSession(respond), [1, 2], {3: "boom", 4: "boom"})
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("Потеряна аренда 1 из 2" in message for message in messages)
+    assert any("[4]" in message for message in messages)
+
+
+@pytest.mark.parametrize("processed, failed, expected", [
+    (0, 0, 0),
+    (250, 0, 1),
+    (0, 40, 1),
+    (250, 40, 2),
+])
+async def test_mark_webhooks_statement_count_does_not_grow_with_batch(service, processed, failed, expected):
+    error_ids = range(1000, 1000 + failed)
+
+    def respond(statement):
+        if "RETURNING" in compile_sql(statement):
+            return FakeResult([(webhook_id, 1, False) for webhook_id in error_ids])
+        return FakeResult(rowcount=processed)
+
+    session = FakeSession(respond)
+    await service.mark_webhooks(
+        session,
+        list(range(processed)),
+        {webhook_id: "boom" for webhook_id in error_ids}
+    )
+
+    assert len(session.statements) == expected
+
+
+def _notification(message_hash: str) -> dict:
+    return {'mentor_id': 1, 'type': 'new_answer', 'message': 'msg', 'status': 'pending', 'message_hash': message_hash}
+
+
+def _failing_on(message_hash: str):
+    """Ошибка БД на любом чанке INSERT, содержащем уведомление с message_hash"""
+    def respond(statement):
+        if message_hash in statement.compile().params.values():
+            raise IntegrityError("INSERT INTO notifications", {}, Exception("constraint violation"))
+        return FakeResult()
+    return respond
+
+
+async def test_insert_batch_notifications_rolls_back_only_failed_webhook(service):
+    session = FakeSession(_failing_on("hash-bad"))
+    notification_rows = {
+        1: [_notification("hash-1")],
+        2: [_notification("hash-bad")],
+        3: [_notification("hash-3"), _notification("hash-4")],
+        4: [],
+    }
+    processed_ids = [1, 2, 3, 4]
+    errors = {}
+
+    failed = await service.insert_batch_notifications(session, notification_rows, processed_ids, errors)
+
+    assert failed == 1
+    assert processed_ids == [1, 3, 4]
+    assert list(errors) == [2]
+    # Пакетный SAVEPOINT + по одному на каждый вебхук с уведомлениями
+    assert session.savepoints == 4
+    assert session.rolled_back_savepoints == 2
+    assert service.stats['batch_fallbacks'] == 1
+
+
+async def test_insert_batch_notifications_uses_single_savepoint_without_errors(service):
+    session = FakeSession(_failing_on("hash-bad"))
+    processed_ids = [1, 2]
+    errors = {}
+
+    failed = await service.insert_batch_notifications(
+        session,
+        {1: [_notification("hash-1")], 2: [_notification("hash-2")]},
+        processed_ids,
+        errors
+    )
+
+    assert failed == 0
+    assert processed_ids == [1, 2]
+    assert errors == {}
+    assert session.savepoints == 1
+    assert len(session.statements) == 1
+
+
+async def test_insert_batch_notifications_keeps_good_events_at_five_percent_failures(service):
+    failing = {f"hash-{webhook_id}" for webhook_id in range(1, 1001) if webhook_id % 20 == 0}
+    inserted = []
+
+    def respond(statement):
+        hashes = [value for key, value in statement.compile().params.items() if key.startswith('message_hash')]
+        if failing.intersection(hashes):
+            raise IntegrityError("INSERT INTO notifications", {}, Exception("constraint violation"))
+        inserted.extend(hashes)
+        return FakeResult()
+
+    session = FakeSession(respond)
+    notification_rows = {webhook_id: [_notification(f"hash-{webhook_id}")] for webhook_id in range(1, 1001)}
+    processed_ids = list(notification_rows)
+    errors = {}
+
+    failed = await service.insert_batch_notifications(session, notification_rows, processed_ids, errors)
+
+    assert failed == 50
+    assert len(processed_ids) == 950
+    assert sorted(errors) == sorted(int(message_hash.split("-")[1]) for message_hash in failing)
+    # В БД остаются уведомления всех 950 успешных событий (пакетный INSERT откатился целиком)
+    assert sorted(inserted) == sorted(f"hash-{webhook_id}" for webhook_id in processed_ids)
+    assert service.stats['rollbacks_avoided'] == 950
+    assert service.stats['event_rollbacks'] == 50
+    # Один пакетный INSERT и не больше одного INSERT на вебхук - без повторов и роста сверх батча
+    assert len(session.statements) == 1 + 1000
+    assert session.rolled_back_savepoints == 1 + 50
+
+
+class LeaseTable:
+    """
+    Таблица webhook_events в памяти для запроса аренды claim_pending_webhooks
+
+    Строки, выбранные транзакцией, заблокированы до ее коммита: чужой
+    FOR UPDATE SKIP LOCKED их пропускает. Аренда (locked_by, locked_until)
+    видна другим транзакциям только после коммита.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.row_locks = {}
+
+    def session(self, delay: float) -> FakeSession:
+        table = self
+        pending = {}
+
+        class LeaseSession(FakeSession):
+            async def commit(self):
+                await asyncio.sleep(delay)
+                await super().commit()
+                for row, (locked_by, locked_until) in pending.items():
+                    row.locked_by = locked_by
+                    row.locked_until = locked_until
+                    table.row_locks.pop(row.id, None)
+                pending.clear()
+
+        def respond(statement):
+            sql = compile_sql(statement)
+            assert "FOR UPDATE SKIP LOCKED" in sql, "без SKIP LOCKED запрос ждал бы чужую транзакцию"
+            params = statement.compile(dialect=postgresql.asyncpg.dialect()).params
+            now_utc = params['locked_until_1']
+            candidates = sorted(
+                (
+                    row for row in table.rows
+                    if not row.processed and not row.dead_lettered
+                    and (row.next_attempt_at is None or row.next_attempt_at <= now_utc)
+                    and (row.locked_until is None or row.locked_until < now_utc)
+                    and table.row_locks.get(row.id, session) is session
+                ),
+                key=lambda row: row.created_at
+            )[:params['param_1']]
+            for row in candidates:
+                table.row_locks[row.id] = session
+                pending[row] = (params['locked_by'], params['locked_until'])
+            return FakeResult([(row.id,) for row in candidates])
+
+        session = LeaseSession(respond, delay=delay)
+        return session
+
+
+async def test_concurrent_claims_get_disjoint_batches_and_reclaim_expired_leases():
+    now = datetime.now(pytz.UTC)
+    rows = [
+        WebhookEvent(
+            id=webhook_id, created_at=now - timedelta(minutes=60 - webhook_id),
+            processed=False, dead_lettered=False, next_attempt_at=None, locked_by=None, locked_until=None,
+        )
+        for webhook_id in range(1, 31)
+    ]
+    # Аренда упавшей реплики истекла, аренда живой реплики - нет
+    for row in rows[0:3]:
+        row.locked_by, row.locked_until = "worker-dead", now - timedelta(minutes=1)
+    for row in rows[3:5]:
+        row.locked_by, row.locked_until = "worker-c", now + timedelta(minutes=4)
+    rows[5].next_attempt_at = now + timedelta(minutes=1)
+    rows[6].processed = True
+    table = LeaseTable(rows)
+
+    services = []
+    for worker_id in ("worker-a", "worker-b"):
+        config = Config()
+        config.worker_id = worker_id
+        config.webhook_batch_size = 10
+        services.append(WebhookProcessingService(config))
+
+    async def claim_round():
+        return await asyncio.gather(*(
+            service.claim_pending_webhooks(table.session(delay=0.01)) for service in services
+        ))
+
+    first_a, first_b = await claim_round()
+    second_a, second_b = await claim_round()
+    assert await claim_round() == [[], []]
+
+    assert len(first_a) == len(first_b) == 10
+    claimed = first_a + first_b + second_a + second_b
+    assert len(claimed) == len(set(claimed)) == 30 - 4
+    # Вебхуки с истекшей арендой забраны заново, с действующей - нет
+    assert {1, 2, 3} <= set(first_a + first_b)
+    assert not {4, 5, 6, 7} & set(claimed)
+    by_id = {row.id: row for row in rows}
+    for worker_id, webhook_ids in (("worker-a", first_a + second_a), ("worker-b", first_b + second_b)):
+        assert {by_id[webhook_id].locked_by for webhook_id in webhook_ids} == {worker_id}
+    assert {by_id[webhook_id].locked_by for webhook_id in (4, 5)} == {"worker-c"}
+    assert table.row_locks == {}